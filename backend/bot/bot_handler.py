@@ -2,7 +2,8 @@ from botbuilder.core import ActivityHandler, TurnContext, MessageFactory
 from botbuilder.schema import ChannelAccount, Activity, ActivityTypes
 from langchain_core.messages import HumanMessage, SystemMessage
 from config import settings
-from graph.agent_graph import build_graph
+from graph.agent_graph import get_graph
+from graph.budget import new_budget
 from prompts import SYSTEM_PROMPT
 import logging
 import json
@@ -12,7 +13,7 @@ logger = logging.getLogger(__name__)
 class LegalBotHandler(ActivityHandler):
     def __init__(self):
         super().__init__()
-        self.graph = build_graph()
+        self.graph = get_graph()
         logger.info("Legal Bot Handler initialized")
 
     async def on_message_activity(self, turn_context: TurnContext):
@@ -21,7 +22,7 @@ class LegalBotHandler(ActivityHandler):
         """
         try:
             user_message = turn_context.activity.text
-            logger.info(f"Received message: {user_message[:100]}...")
+            logger.info("Received message", extra={"chars": len(user_message)})
 
             # Validate input message
             if not user_message or not user_message.strip():
@@ -38,7 +39,8 @@ class LegalBotHandler(ActivityHandler):
             initial_state = {
                 "messages": msgs,
                 "top_k": 6,
-                "filters": None
+                "filters": None,
+                **new_budget()
             }
             
             # Show typing indicator
@@ -71,7 +73,7 @@ class LegalBotHandler(ActivityHandler):
                 await turn_context.send_activity(MessageFactory.text(str(final_msg.content)))
                 
         except Exception as e:
-            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            logger.error("Error processing message: %s", e, exc_info=True)
             error_message = (
                 "Lo siento, ha ocurrido un error procesando tu consulta. "
                 "Por favor, inténtalo de nuevo más tarde."
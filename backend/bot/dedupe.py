@@ -0,0 +1,68 @@
+"""
+Suppression of Bot Framework redeliveries.
+
+The channel retries an activity it did not see acknowledged in time, with
+the same activity id. Activities are remembered by (conversation id,
+activity id) in a bounded TTL cache: a redelivery of a turn that is still
+running or already finished is acknowledged with a plain 200 without
+running it again: no second graph run and no second message to the user
+(the reply was already sent through the connector). settle() records the
+turn's own outcome from its lane (bot/lanes.py), so a turn that outlives a
+cancelled request stays claimed, and only a turn that failed is forgotten
+so a redelivery retries it. Dedupe is per worker process.
+"""
+import asyncio
+from typing import Optional, Tuple
+
+from observability.metrics import BOT_DUPLICATES
+from providers.cache import TTLCache
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+_RUNNING = object()
+_DONE = object()
+
+
+class ActivityDeduper:
+    def __init__(self, maxsize: int, ttl: float):
+        self._seen = TTLCache("bot_activities", maxsize, ttl)
+
+    @staticmethod
+    def key(activity: dict) -> Optional[Tuple[str, str]]:
+        activity_id = activity.get("id")
+        conversation_id = (activity.get("conversation") or {}).get("id")
+        if not activity_id or not conversation_id:
+            return None
+        return conversation_id, activity_id
+
+    def claim(self, key: Tuple[str, str]) -> Optional[str]:
+        """
+        None if the activity is new (now marked as running); otherwise
+        IN_PROGRESS or COMPLETED. Call from the event loop only: there is no
+        await between the lookup and the mark.
+        """
+        entry = self._seen.get(key)
+        if entry is None:
+            self._seen.set(key, _RUNNING)
+            return None
+        state = IN_PROGRESS if entry is _RUNNING else COMPLETED
+        BOT_DUPLICATES.labels(state=state).inc()
+        return state
+
+    def complete(self, key: Tuple[str, str]):
+        self._seen.set(key, _DONE)
+
+    def release(self, key: Tuple[str, str]):
+        """Forget a failed turn so a redelivery can retry it"""
+        self._seen.pop(key)
+
+    def settle(self, key: Tuple[str, str], future: asyncio.Future):
+        """Done callback for the turn's lane future: complete on success, release on failure"""
+        if future.cancelled() or future.exception() is not None:
+            self.release(key)
+        else:
+            self.complete(key)
+
+    def stats(self) -> dict:
+        return self._seen.stats()
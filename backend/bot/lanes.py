@@ -0,0 +1,120 @@
+"""
+Keyed mailbox for the Bot Framework path.
+
+Each conversation gets a lane: a FIFO queue drained by its own asyncio task,
+so turns of one conversation run strictly in arrival order (history append,
+graph run and reply) while different conversations proceed in parallel. A
+lane whose queue stays empty for `idle_s` seconds is removed and its task
+exits; the next message for that conversation starts a new one.
+
+A turn keeps running when its caller goes away (the HTTP request is
+cancelled): `on_done` sees the turn's own outcome, not the caller's.
+"""
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from observability.metrics import BOT_LANES, BOT_LANE_WAIT
+
+
+@dataclass
+class _Lane:
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    task: Optional[asyncio.Task] = None
+
+
+class ConversationLanes:
+    def __init__(self, idle_s: float = 60.0):
+        self.idle_s = idle_s
+        self._lanes: Dict[str, _Lane] = {}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]],
+                  on_done: Optional[Callable[[asyncio.Future], None]] = None) -> Any:
+        """Queue `fn` on the lane for `key` and wait for its result; `on_done(future)` runs when the turn ends"""
+        future = asyncio.get_running_loop().create_future()
+        if on_done is not None:
+            future.add_done_callback(on_done)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+            lane.task = asyncio.create_task(self._drain(key, lane))
+            BOT_LANES.inc()
+        # Keep the caller's context (trace span, deadline) for the queued turn
+        lane.queue.put_nowait((fn, future, contextvars.copy_context(), time.perf_counter()))
+        return await asyncio.shield(future)
+
+    async def _drain(self, key: str, lane: _Lane):
+        try:
+            while True:
+                try:
+                    fn, future, ctx, queued_at = await asyncio.wait_for(lane.queue.get(), timeout=self.idle_s)
+                except asyncio.TimeoutError:
+                    # No await between the check and the removal, so nothing can slip in
+                    if lane.queue.empty():
+                        return
+                    continue
+                BOT_LANE_WAIT.observe(time.perf_counter() - queued_at)
+                try:
+                    result = await asyncio.create_task(fn(), context=ctx)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            if self._lanes.get(key) is lane:
+                del self._lanes[key]
+            # Lane cancelled (shutdown): turns still queued will never run
+            while not lane.queue.empty():
+                lane.queue.get_nowait()[1].cancel()
+            BOT_LANES.dec()
+
+    def stats(self) -> dict:
+        return {
+            "lanes": len(self._lanes),
+            "queued": sum(lane.queue.qsize() for lane in self._lanes.values()),
+        }
+
+
+if __name__ == "__main__":
+    # Self-check (python -m bot.lanes): a redelivery while the turn is still running is suppressed
+    # even after the first request was cancelled, and only a failed turn can run again
+    from functools import partial
+    from bot.dedupe import ActivityDeduper, IN_PROGRESS, COMPLETED
+
+    async def _check():
+        lanes, deduper, runs = ConversationLanes(), ActivityDeduper(100, 60), []
+
+        async def turn(fail=False):
+            runs.append(fail)
+            await asyncio.sleep(0.05)
+            if fail:
+                raise RuntimeError("turn failed")
+            return "reply"
+
+        key = ("c1", "a1")
+        assert deduper.claim(key) is None
+        request = asyncio.create_task(lanes.run("c1", turn, on_done=partial(deduper.settle, key)))
+        await asyncio.sleep(0.01)
+        request.cancel()  # client disconnect mid-turn
+        await asyncio.sleep(0)
+        assert deduper.claim(key) == IN_PROGRESS, "redelivery must not start a second run"
+        await asyncio.sleep(0.1)
+        assert deduper.claim(key) == COMPLETED and runs == [False]
+
+        key = ("c1", "a2")
+        deduper.claim(key)
+        try:
+            await lanes.run("c1", partial(turn, True), on_done=partial(deduper.settle, key))
+        except RuntimeError:
+            pass
+        assert deduper.claim(key) is None, "a failed turn is released for the redelivery"
+
+    asyncio.run(_check())
+    print("lanes: ok")
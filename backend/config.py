@@ -10,13 +10,23 @@ class Settings(BaseSettings):
     PORT: int = os.getenv("PORT", 8000)
     CORS_ALLOW_ORIGINS: str = os.getenv("CORS_ALLOW_ORIGINS", "")
 
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    GEMINI_API_KEY: str | None = os.getenv("GEMINI_API_KEY")
     GEMINI_CHAT_MODEL: str = os.getenv("GEMINI_CHAT_MODEL", "gemini-2.0-flash")
     GEMINI_EMBED_MODEL: str = os.getenv("GEMINI_EMBED_MODEL", "text-embedding-004")
     EMBED_DIM: int = os.getenv("EMBED_DIM", 768)
+    # Query-time oversampling for a compressed (VECTOR_COMPRESSION=scalar) index; 0 = index default
+    VECTOR_QUERY_OVERSAMPLING: float = os.getenv("VECTOR_QUERY_OVERSAMPLING", 0)
 
-    AZURE_SEARCH_ENDPOINT: str = os.getenv("AZURE_SEARCH_ENDPOINT")
-    AZURE_SEARCH_INDEX: str = os.getenv("AZURE_SEARCH_INDEX")
+    # Client-side Gemini quota per worker process (see providers/rate_limiter.py)
+    GEMINI_CHAT_RPM: float = os.getenv("GEMINI_CHAT_RPM", 1000)
+    GEMINI_CHAT_TPM: float = os.getenv("GEMINI_CHAT_TPM", 2000000)
+    GEMINI_EMBED_RPM: float = os.getenv("GEMINI_EMBED_RPM", 1500)
+    GEMINI_EMBED_TPM: float = os.getenv("GEMINI_EMBED_TPM", 1000000)
+    GEMINI_MAX_CONCURRENCY: int = os.getenv("GEMINI_MAX_CONCURRENCY", 16)
+    GEMINI_BULK_RESERVE: float = os.getenv("GEMINI_BULK_RESERVE", 0.2)
+
+    AZURE_SEARCH_ENDPOINT: str | None = os.getenv("AZURE_SEARCH_ENDPOINT")
+    AZURE_SEARCH_INDEX: str | None = os.getenv("AZURE_SEARCH_INDEX")
     AZURE_SEARCH_API_KEY: str | None = os.getenv("AZURE_SEARCH_API_KEY")
     AZURE_SEARCH_USE_MSI: bool = os.getenv("AZURE_SEARCH_USE_MSI", False)
 
@@ -30,6 +40,87 @@ class Settings(BaseSettings):
     SEMANTIC_CONFIG_NAME: str = "legal-semantic"
     SEMANTIC_LANGUAGE: str = "es-es"
 
+    # Upstream providers: live | fake | record | replay (see providers/fake_providers.py)
+    PROVIDER_MODE: str = os.getenv("PROVIDER_MODE", "live")
+    FAKE_LATENCY_MS: float = os.getenv("FAKE_LATENCY_MS", 0)
+    # Per-provider latency specs, e.g. "lognormal:6.5,0.4" or "uniform:40,120" (ms)
+    FAKE_CHAT_LATENCY: str = os.getenv("FAKE_CHAT_LATENCY", "")
+    FAKE_EMBED_LATENCY: str = os.getenv("FAKE_EMBED_LATENCY", "")
+    FAKE_SEARCH_LATENCY: str = os.getenv("FAKE_SEARCH_LATENCY", "")
+    FAKE_SEED: int = os.getenv("FAKE_SEED", 0)
+    FAKE_CORPUS_SIZE: int = os.getenv("FAKE_CORPUS_SIZE", 3000)
+    FAKE_CASSETTE_PATH: str = os.getenv("FAKE_CASSETTE_PATH", "provider_cassette.jsonl")
+
+    # Startup warm-up (runs in the FastAPI lifespan before the worker serves traffic)
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", True)
+    WARMUP_QUERY: str = os.getenv("WARMUP_QUERY", "")  # if set, one dry-run search is executed
+
+    # Per-request budget for the agent loop (keep below gunicorn's worker timeout)
+    REQUEST_TIMEOUT_S: float = os.getenv("REQUEST_TIMEOUT_S", 60)
+    MAX_TOOL_ROUNDS: int = os.getenv("MAX_TOOL_ROUNDS", 4)
+    # Speculative retrieval (graph/speculation.py): search the raw question while the first LLM call runs;
+    # the result is reused when the search_cases call's query has at least this word overlap with it
+    SPECULATIVE_RETRIEVAL: bool = os.getenv("SPECULATIVE_RETRIEVAL", False)
+    SPECULATION_MIN_SIMILARITY: float = os.getenv("SPECULATION_MIN_SIMILARITY", 0.6)
+    SPECULATION_THREADS: int = os.getenv("SPECULATION_THREADS", 8)
+    DEADLINE_EXECUTOR_THREADS: int = os.getenv("DEADLINE_EXECUTOR_THREADS", 16)
+
+    # Query-time caches (providers/cache.py)
+    EMBED_CACHE_SIZE: int = os.getenv("EMBED_CACHE_SIZE", 2048)
+    SEARCH_CACHE_SIZE: int = os.getenv("SEARCH_CACHE_SIZE", 512)
+    SEARCH_CACHE_TTL_S: float = os.getenv("SEARCH_CACHE_TTL_S", 300)
+
+    # search_cases post-processing (tools/postprocess.py): fetch top_k * factor candidates,
+    # merge adjacent chunks, then MMR (1.0 = pure relevance, lower = more diverse)
+    SEARCH_POSTPROCESS: bool = os.getenv("SEARCH_POSTPROCESS", True)
+    SEARCH_CANDIDATE_FACTOR: int = os.getenv("SEARCH_CANDIDATE_FACTOR", 3)
+    SEARCH_MMR_LAMBDA: float = os.getenv("SEARCH_MMR_LAMBDA", 0.7)
+    # Select the chunk vectors for MMR (word overlap when the index has VECTOR_STORED=false);
+    # false skips the top_k * factor vectors in every search response
+    SEARCH_MMR_VECTORS: bool = os.getenv("SEARCH_MMR_VECTORS", True)
+
+    # GET /suggest (providers/suggestions.py): results per prefix (trie nodes keep this many),
+    # facet values read when there is no summary index, Azure autocomplete for unknown prefixes
+    SUGGEST_MAX_RESULTS: int = os.getenv("SUGGEST_MAX_RESULTS", 10)
+    SUGGEST_MAX_TERMS: int = os.getenv("SUGGEST_MAX_TERMS", 20000)
+    SUGGEST_FALLBACK: bool = os.getenv("SUGGEST_FALLBACK", True)
+
+    # /chat/batch
+    BATCH_MAX_CONCURRENCY: int = os.getenv("BATCH_MAX_CONCURRENCY", 8)
+    BATCH_MAX_ITEMS: int = os.getenv("BATCH_MAX_ITEMS", 500)
+
+    # Blue/green reindexing: AZURE_SEARCH_INDEX may be an alias; how often to re-resolve it
+    INDEX_REFRESH_S: float = os.getenv("INDEX_REFRESH_S", 30)
+    # Per-providence summaries written at ingestion live in `<index><suffix>` (providers/providence_summaries.py)
+    SUMMARY_INDEX_SUFFIX: str = os.getenv("SUMMARY_INDEX_SUFFIX", "-summaries")
+
+    # Bot path: per-conversation lanes are dropped after this many idle seconds
+    BOT_LANE_IDLE_S: float = os.getenv("BOT_LANE_IDLE_S", 60)
+    # Redelivered activities are recognised for this long (bounded by size)
+    BOT_DEDUPE_SIZE: int = os.getenv("BOT_DEDUPE_SIZE", 10000)
+    BOT_DEDUPE_TTL_S: float = os.getenv("BOT_DEDUPE_TTL_S", 600)
+
+    # Metrics: how often in-memory gauges (conversations, limiter queues) are sampled
+    METRICS_REFRESH_S: float = os.getenv("METRICS_REFRESH_S", 15)
+
+    # Logging (observability/logging_config.py)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "httpx=WARNING")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_PAYLOAD_SAMPLE_RATE: float = os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0.01)
+    LOG_PAYLOAD_MAX_CHARS: int = os.getenv("LOG_PAYLOAD_MAX_CHARS", 500)
+
+    # Profiling endpoints under /admin (observability/admin.py), off unless both are set
+    ADMIN_ENABLED: bool = os.getenv("ADMIN_ENABLED", False)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    ADMIN_MAX_PROFILE_S: float = os.getenv("ADMIN_MAX_PROFILE_S", 120)
+
+    # Tracing (observability/tracing.py): none | console | file | otlp
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none")
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SAMPLE_RATIO: float = os.getenv("TRACE_SAMPLE_RATIO", 0.1)
+
     # Bot Framework settings
     MICROSOFT_APP_ID: str = os.getenv("MICROSOFT_APP_ID", "")
     MICROSOFT_APP_PASSWORD: str = os.getenv("MICROSOFT_APP_PASSWORD", "")
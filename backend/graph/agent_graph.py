@@ -1,18 +1,22 @@
 from typing import List
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import lru_cache
+import ast
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 from tools.search_cases import search_cases
 from tools.search_by_providence import search_by_providence, get_providence_summary, list_providences
 from prompts import SYSTEM_PROMPT
 from config import settings
 from .state import GraphState
+from .budget import deadline_scope, is_expired, call_with_deadline, upstream_timeout, DeadlineExceeded
+from . import speculation as speculative
+from providers.gemini_provider import chat_limiter
+from providers.rate_limiter import estimate_tokens, INTERACTIVE, RateLimitExceeded
+from observability.metrics import observe, timed_node, record_token_usage, TOOL_LATENCY, UPSTREAM_LATENCY
+from observability.tracing import span, traced_node
+from observability.logging_config import payload
 
 # Create a custom tool node that can access state
 class StatefulToolNode:
@@ -29,11 +33,24 @@ class StatefulToolNode:
         # Get search parameters from state
         top_k = state.get("top_k", 6)
         filters = state.get("filters", None)
+        speculation = state.get("speculation")
+        if speculation is not None and not any(c["name"] == "search_cases" for c in last_message.tool_calls):
+            speculation.settle("unused")
         
         tool_messages = []
         for tool_call in last_message.tool_calls:
             tool_name = tool_call["name"]
             tool_args = tool_call["args"].copy()
+
+            # Cooperative cancellation: do not start new tool work past the deadline
+            if is_expired(state.get("deadline")):
+                tool_messages.append(
+                    ToolMessage(
+                        content=f"Herramienta {tool_name} omitida: se agotó el tiempo de la solicitud",
+                        tool_call_id=tool_call["id"]
+                    )
+                )
+                continue
             
             # Inject state parameters for search tools
             if tool_name == "search_cases":
@@ -49,7 +66,12 @@ class StatefulToolNode:
             
             if tool_name in self.tools:
                 try:
-                    result = self.tools[tool_name].invoke(tool_args)
+                    with deadline_scope(state.get("deadline")), span(f"tool.{tool_name}", tool=tool_name), \
+                            observe(TOOL_LATENCY, tool=tool_name):
+                        # The first search may already be running since the first LLM call
+                        result = speculation.take(tool_args) if speculation and tool_name == "search_cases" else None
+                        if result is None:
+                            result = self.tools[tool_name].invoke(tool_args)
                     tool_messages.append(
                         ToolMessage(
                             content=str(result),
@@ -57,7 +79,7 @@ class StatefulToolNode:
                         )
                     )
                 except Exception as e:
-                    logger.error(f"Error executing tool {tool_name}: {str(e)}")
+                    logger.error("Error executing tool %s: %s", tool_name, e)
                     tool_messages.append(
                         ToolMessage(
                             content=f"Error ejecutando herramienta {tool_name}: {str(e)}",
@@ -68,22 +90,76 @@ class StatefulToolNode:
         return {
             "messages": messages + tool_messages,
             "top_k": state.get("top_k"),
-            "filters": state.get("filters")
+            "filters": state.get("filters"),
+            "tool_rounds": state.get("tool_rounds", 0) + 1
         }
 
 tools = [search_cases, search_by_providence, get_providence_summary, list_providences]
 tool_node = StatefulToolNode(tools)
 
-def _model():
-    return ChatGoogleGenerativeAI(
+@lru_cache(maxsize=2)
+def _model(allow_tool_calls: bool = True):
+    if settings.PROVIDER_MODE != "live":
+        from providers import fake_providers
+        return fake_providers.chat_model(_live_model, allow_tool_calls, tools)
+    return _live_model(allow_tool_calls)
+
+def _live_model(allow_tool_calls: bool):
+    # Built once per process; langchain_google_genai is imported lazily to keep startup light
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    llm = ChatGoogleGenerativeAI(
         model=settings.GEMINI_CHAT_MODEL,
         temperature=0.2,
         max_output_tokens=1024,
-        google_api_key=settings.GEMINI_API_KEY
-    ).bind_tools(tools)
+        google_api_key=settings.GEMINI_API_KEY,
+        max_retries=1  # retries are scheduled by chat_limiter()
+    )
+    # Tools stay declared so the tool-call history remains valid, but "none" forces a text answer
+    return llm.bind_tools(tools) if allow_tool_calls else llm.bind_tools(tools, tool_choice="none")
+
+def _tool_rounds_left(state: GraphState) -> bool:
+    max_rounds = state.get("max_tool_rounds")
+    return max_rounds is None or state.get("tool_rounds", 0) < max_rounds
+
+def _partial_answer(messages: List) -> AIMessage:
+    """Best answer available when the request runs out of time"""
+    # Only look at the current turn (after the last user message)
+    turn = []
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            break
+        turn.append(msg)
+
+    for msg in turn:
+        if isinstance(msg, AIMessage) and msg.content and str(msg.content).strip():
+            return AIMessage(content=str(msg.content))
+
+    titles = []
+    for msg in turn:
+        if not isinstance(msg, ToolMessage):
+            continue
+        try:
+            docs = ast.literal_eval(str(msg.content))
+        except (ValueError, SyntaxError):
+            continue
+        for doc in docs if isinstance(docs, list) else [docs]:
+            title = (doc.get("title") or doc.get("providence")) if isinstance(doc, dict) else None
+            if title and title not in titles:
+                titles.append(title)
+
+    text = "Lo siento, no alcancé a completar la respuesta en el tiempo disponible."
+    if titles:
+        text += " Documentos relacionados que encontré: " + ", ".join(titles[:5]) + "."
+    text += " Por favor, intenta de nuevo con una pregunta más específica."
+    return AIMessage(content=text)
 
 def agent(state: GraphState) -> GraphState:
-    llm = _model()
+    if is_expired(state.get("deadline")):
+        logger.warning("Request deadline exceeded before calling the LLM")
+        return {"messages": state["messages"] + [_partial_answer(state["messages"])]}
+
+    # Once the tool-round budget is spent the model must answer with what it has
+    llm = _model(_tool_rounds_left(state))
     
     # Get search parameters from state
     top_k = state.get("top_k", 6)
@@ -109,14 +185,14 @@ def agent(state: GraphState) -> GraphState:
         if include_msg:
             valid_messages.append(msg)
         else:
-            logger.warning(f"Skipping message: {type(msg).__name__} - Content: '{getattr(msg, 'content', 'NO_CONTENT')}'")
+            logger.debug("Skipping message: %s - Content: %s", type(msg).__name__, payload(getattr(msg, "content", "NO_CONTENT")))
     
     if not valid_messages:
         # If no valid messages, create a default response
         logger.error("No valid messages found, returning default response")
         return {"messages": state["messages"] + [AIMessage(content="Lo siento, no pude procesar tu consulta. Por favor, intenta reformular tu pregunta.")]}
     
-    logger.info(f"Processing {len(valid_messages)} valid messages")
+    logger.debug("Processing %d valid messages", len(valid_messages))
     
     # Ensure the first message includes context (for initial interactions)
     first_human_msg_idx = None
@@ -138,27 +214,51 @@ def agent(state: GraphState) -> GraphState:
         
         valid_messages[0] = HumanMessage(content=enhanced_content)
     
+    # First turn: search the raw question while the LLM decides which tool to call
+    speculation = state.get("speculation")
+    if state.get("tool_rounds", 0) == 0 and speculation is None and _tool_rounds_left(state):
+        speculation = speculative.start(state["messages"], top_k, filters, state.get("deadline"))
+
     try:
-        resp = llm.invoke(valid_messages)
-        return {"messages": state["messages"] + [resp], "top_k": top_k, "filters": filters}
+        # TPM estimate: prompt size plus the output cap
+        tokens = sum(estimate_tokens(str(m.content)) for m in valid_messages) + 1024
+        with deadline_scope(state.get("deadline")), \
+                span("gemini.chat", model=settings.GEMINI_CHAT_MODEL, messages=len(valid_messages)) as llm_span, \
+                observe(UPSTREAM_LATENCY, provider="gemini_chat"):
+            resp = call_with_deadline(chat_limiter().call, lambda: llm.invoke(valid_messages),
+                                      tokens=tokens, priority=INTERACTIVE, max_wait=upstream_timeout())
+            llm_span.set_attribute("tool_calls", len(getattr(resp, "tool_calls", None) or []))
+        record_token_usage(settings.GEMINI_CHAT_MODEL, resp)
+        return {"messages": state["messages"] + [resp], "top_k": top_k, "filters": filters,
+                "speculation": speculation}
+    except (DeadlineExceeded, RateLimitExceeded) as e:
+        if isinstance(e, RateLimitExceeded):
+            logger.warning("Rate limited while waiting for the LLM: %s", e)
+        else:
+            logger.warning("Request deadline exceeded while waiting for the LLM")
+        return {"messages": state["messages"] + [_partial_answer(state["messages"])], "top_k": top_k, "filters": filters,
+                "speculation": speculation}
     except Exception as e:
-        logger.error(f"Error invoking LLM: {str(e)}")
-        logger.error(f"Valid messages count: {len(valid_messages)}")
-        for i, msg in enumerate(valid_messages):
-            logger.error(f"Message {i}: {type(msg).__name__} - Content length: {len(getattr(msg, 'content', '')) if hasattr(msg, 'content') else 'NO_CONTENT'}")
+        logger.error("Error invoking LLM: %s (%d messages: %s)", e, len(valid_messages),
+                     [(type(m).__name__, len(str(getattr(m, "content", "")))) for m in valid_messages])
         # Return a fallback response
         fallback_response = AIMessage(content="Lo siento, hubo un error procesando tu consulta. Por favor, intenta de nuevo con una pregunta más específica.")
-        return {"messages": state["messages"] + [fallback_response], "top_k": top_k, "filters": filters}
+        return {"messages": state["messages"] + [fallback_response], "top_k": top_k, "filters": filters,
+                "speculation": speculation}
 
 def route_tools(state: GraphState):
     last = state["messages"][-1]
     if isinstance(last, AIMessage) and last.tool_calls:
+        if is_expired(state.get("deadline")):
+            return "final"
         return "call_tools"
     return "final"
 
 def final_answer(state: GraphState) -> GraphState:
     # Get the last AI message directly instead of asking for JSON synthesis
     messages = state["messages"]
+    if state.get("speculation") is not None:
+        state["speculation"].settle("unused")
     
     # Find the last AI message that contains actual content
     last_ai_message = None
@@ -169,9 +269,13 @@ def final_answer(state: GraphState) -> GraphState:
                 last_ai_message = msg
                 break
     
-    if last_ai_message:
+    if last_ai_message and last_ai_message is messages[-1]:
         # Use the existing AI response
         return {"messages": state["messages"]}
+    elif is_expired(state.get("deadline")):
+        return {"messages": state["messages"] + [_partial_answer(messages)]}
+    elif last_ai_message:
+        return {"messages": state["messages"]}
     else:
         # If no suitable AI message found, create a simple fallback
         logger.error("No suitable AI message found for final answer")
@@ -179,10 +283,11 @@ def final_answer(state: GraphState) -> GraphState:
         return {"messages": state["messages"] + [fallback_response]}
 
 def build_graph():
+    from langgraph.graph import StateGraph, END
     g = StateGraph(GraphState)
-    g.add_node("agent", agent)
-    g.add_node("tools", tool_node)
-    g.add_node("final", final_answer)
+    g.add_node("agent", timed_node("agent", traced_node("agent", agent)))
+    g.add_node("tools", timed_node("tools", traced_node("tools", tool_node)))
+    g.add_node("final", timed_node("final", traced_node("final", final_answer)))
 
     g.set_entry_point("agent")
     g.add_conditional_edges("agent", route_tools,
@@ -190,3 +295,8 @@ def build_graph():
     g.add_edge("tools", "agent")
     g.add_edge("final", END)
     return g.compile()
+
+@lru_cache(maxsize=1)
+def get_graph():
+    """Return the process-wide compiled graph, building it on first use."""
+    return build_graph()
@@ -0,0 +1,87 @@
+"""
+Per-request time budget for the agent loop.
+
+The deadline (epoch seconds) travels in GraphState; each node opens a
+`deadline_scope` so tools and providers can read the remaining time from a
+context variable without changing their signatures. Cancellation is
+cooperative: work is checked before it starts and upstream calls receive
+the remaining time as their timeout.
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from config import settings
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+# Threads used to bound calls whose SDK has no per-call timeout (the chat model).
+# A timed-out call keeps its thread until the SDK returns, the request does not wait for it.
+_executor = ThreadPoolExecutor(max_workers=settings.DEADLINE_EXECUTOR_THREADS,
+                               thread_name_prefix="deadline")
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def new_budget(timeout_s: Optional[float] = None, max_tool_rounds: Optional[int] = None) -> Dict[str, Any]:
+    """Budget fields to merge into an initial GraphState"""
+    timeout_s = settings.REQUEST_TIMEOUT_S if timeout_s is None else timeout_s
+    return {
+        "deadline": time.time() + timeout_s if timeout_s else None,
+        "max_tool_rounds": settings.MAX_TOOL_ROUNDS if max_tool_rounds is None else max_tool_rounds,
+        "tool_rounds": 0,
+    }
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time(deadline: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the deadline (None means unbounded)"""
+    deadline = _deadline.get() if deadline is None else deadline
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def is_expired(deadline: Optional[float] = None) -> bool:
+    remaining = remaining_time(deadline)
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline():
+    if is_expired():
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def upstream_timeout() -> Optional[float]:
+    """Timeout to hand to an upstream SDK call, or None when the request has no deadline"""
+    remaining = remaining_time()
+    if remaining is None:
+        return None
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining
+
+
+def call_with_deadline(fn: Callable, *args, **kwargs):
+    """Run fn, giving up (DeadlineExceeded) once the current deadline passes"""
+    timeout = upstream_timeout()
+    if timeout is None:
+        return fn(*args, **kwargs)
+    ctx = contextvars.copy_context()
+    future = _executor.submit(ctx.run, fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise DeadlineExceeded("Request deadline exceeded")
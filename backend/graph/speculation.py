@@ -0,0 +1,123 @@
+"""
+Speculative retrieval for the first agent turn.
+
+The first Gemini call usually just turns the user's question into a
+search_cases call with nearly the same text. With SPECULATIVE_RETRIEVAL on,
+agent() starts that search (query embedding plus hybrid search) on the raw
+user message in a background thread right before the first LLM call, so
+both run at the same time. When the tool call comes back, StatefulToolNode
+reuses the prefetched result if the call asks for the same top_k and
+filters and its query is close enough to the message: a Jaccard
+similarity of at least SPECULATION_MIN_SIMILARITY over the words longer
+than two letters. Otherwise the search runs as usual. Every speculation ends with one outcome on
+speculative_retrieval_total:
+
+  used      the tool call matched and the prefetched result was returned
+  mismatch  search_cases was called with a different query, top_k or filters
+  unused    the turn made no search_cases call (another tool, or a direct answer)
+  failed    the speculative search raised; the tool ran normally
+
+An unused search still fills the embedding and search caches. Speculation
+costs one embedding and one search per request even when it is not used,
+so it is off by default.
+"""
+import contextvars
+import logging
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from observability.metrics import SPECULATION_OUTCOMES, SPECULATION_SAVED
+from observability.tracing import span
+from .budget import deadline_scope, remaining_time
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_executor = ThreadPoolExecutor(max_workers=settings.SPECULATION_THREADS, thread_name_prefix="speculate")
+
+
+def _words(text: str) -> set:
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    # Short words are mostly articles and prepositions the LLM drops when it rewrites the query
+    return {w for w in _WORD.findall("".join(c for c in decomposed if not unicodedata.combining(c))) if len(w) > 2}
+
+
+def similarity(a: str, b: str) -> float:
+    words_a, words_b = _words(a), _words(b)
+    return len(words_a & words_b) / len(words_a | words_b) if words_a and words_b else 0.0
+
+
+class Speculation:
+    """One in-flight search_cases call on the raw user message"""
+
+    def __init__(self, query: str, top_k: int, filters: Optional[Dict[str, Any]]):
+        self.query = query
+        self.top_k = top_k
+        self.filters = filters
+        self.future: Optional[Future] = None
+        self.search_s = 0.0
+        self.outcome: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def settle(self, outcome: str) -> bool:
+        """Record the outcome once; False if it was already settled"""
+        with self._lock:
+            if self.outcome is not None:
+                return False
+            self.outcome = outcome
+        SPECULATION_OUTCOMES.labels(outcome=outcome).inc()
+        return True
+
+    def matches(self, tool_args: Dict[str, Any]) -> bool:
+        return (tool_args.get("top_k") == self.top_k and (tool_args.get("filters") or None) == (self.filters or None)
+                and similarity(tool_args.get("query", ""), self.query) >= float(settings.SPECULATION_MIN_SIMILARITY))
+
+    def take(self, tool_args: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Prefetched result for a search_cases call, or None if the tool should run itself"""
+        if self.outcome is not None:
+            return None
+        if not self.matches(tool_args):
+            self.settle("mismatch")
+            return None
+        start = time.perf_counter()
+        try:
+            result = self.future.result(timeout=remaining_time())
+        except Exception as e:
+            logger.warning("Speculative search failed: %s", e)
+            self.settle("failed")
+            return None
+        self.settle("used")
+        # Search time hidden behind the LLM call: what the tool did not have to wait for
+        SPECULATION_SAVED.observe(max(0.0, self.search_s - (time.perf_counter() - start)))
+        return result
+
+
+def start(messages: List[Any], top_k: int, filters: Optional[Dict[str, Any]],
+          deadline: Optional[float]) -> Optional[Speculation]:
+    """Start search_cases on the last user message when this is the first turn of a request"""
+    from langchain_core.messages import HumanMessage
+    from tools.search_cases import search_cases
+
+    if not settings.SPECULATIVE_RETRIEVAL or not messages or not isinstance(messages[-1], HumanMessage):
+        return None
+    query = str(messages[-1].content).strip()
+    if not query:
+        return None
+    speculation = Speculation(query, top_k, filters)
+
+    def _run():
+        started = time.perf_counter()
+        try:
+            with deadline_scope(deadline), span("speculative.search_cases", chars=len(query)):
+                return search_cases.invoke({"query": query, "top_k": top_k, "filters": filters})
+        finally:
+            speculation.search_s = time.perf_counter() - started
+
+    # Copy the context so the search spans nest under the request trace
+    speculation.future = _executor.submit(contextvars.copy_context().run, _run)
+    return speculation
@@ -5,3 +5,9 @@ class GraphState(TypedDict, total=False):
     messages: List[BaseMessage]
     top_k: Optional[int]
     filters: Optional[Dict[str, Any]]
+    # Request budget (see graph/budget.py)
+    deadline: Optional[float]
+    max_tool_rounds: Optional[int]
+    tool_rounds: int
+    # First-turn speculative search (see graph/speculation.py)
+    speculation: Optional[Any]
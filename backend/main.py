@@ -1,23 +1,67 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from contextlib import asynccontextmanager
+from functools import partial
 from config import settings
-from graph.agent_graph import build_graph
+from graph.agent_graph import get_graph
+from graph.budget import new_budget
 from prompts import SYSTEM_PROMPT
+from providers.index_version import current_index, refresh as refresh_index_version
+from providers import suggestions
+from bot.dedupe import ActivityDeduper
+from bot.lanes import ConversationLanes
+from observability.metrics import HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_PROGRESS, refresh_gauges, render
+from observability.logging_config import configure_logging, log_payload, payload
+from observability.tracing import SpanKind, setup_tracing, span, extract_context, inject_headers, current_trace_id
 from pydantic import BaseModel, Field
 import logging
 import json
 import httpx
 import asyncio
+import time
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title=settings.APP_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per worker: the span exporter thread must start after gunicorn forks
+    setup_tracing()
+    # Build the graph and open upstream connections before accepting traffic
+    if settings.WARMUP_ENABLED:
+        from warmup import warm_up
+        await asyncio.to_thread(warm_up)
+    refreshers = [asyncio.create_task(_refresh_gauges_periodically()),
+                  asyncio.create_task(_refresh_index_version_periodically())]
+    yield
+    for task in refreshers:
+        task.cancel()
+
+async def _refresh_gauges_periodically():
+    # Keeps per-worker gauges fresh even when another worker answers the scrape
+    while True:
+        try:
+            refresh_gauges(conversation_memory)
+        except Exception as e:
+            logger.warning("Could not refresh metrics gauges: %s", e)
+        await asyncio.sleep(settings.METRICS_REFRESH_S)
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 # Simple in-memory conversation store
 conversation_memory = {}
+app.state.conversation_memory = conversation_memory
+conversation_lanes = ConversationLanes(idle_s=settings.BOT_LANE_IDLE_S)
+activity_deduper = ActivityDeduper(settings.BOT_DEDUPE_SIZE, settings.BOT_DEDUPE_TTL_S)
+
+if settings.ADMIN_ENABLED:
+    if settings.ADMIN_TOKEN:
+        from observability.admin import router as admin_router
+        app.include_router(admin_router)
+    else:
+        logger.warning("ADMIN_ENABLED is set but ADMIN_TOKEN is empty: admin endpoints not mounted")
 
 if settings.CORS_ALLOW_ORIGINS:
     app.add_middleware(
@@ -28,7 +72,37 @@ if settings.CORS_ALLOW_ORIGINS:
         allow_headers=["*"],
     )
 
-graph = build_graph()
+async def _refresh_index_version_periodically():
+    # Picks up a blue/green alias switch without restarting the worker
+    while True:
+        await asyncio.sleep(settings.INDEX_REFRESH_S)
+        await asyncio.to_thread(refresh_index_version)
+
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    HTTP_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        with span(f"{request.method} {request.url.path}", kind=SpanKind.SERVER,
+                  context=extract_context(request.headers), **{"http.method": request.method}) as server_span:
+            response = await call_next(request)
+            status = response.status_code
+            route = request.scope.get("route")
+            if route is not None:
+                server_span.update_name(f"{request.method} {route.path}")
+            server_span.set_attribute("http.status_code", status)
+            trace_id = current_trace_id()
+            if trace_id:
+                response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        HTTP_IN_PROGRESS.dec()
+        # Label by route template so ids in the path do not explode cardinality
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        HTTP_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(endpoint=endpoint, method=request.method, status=str(status)).inc()
 
 class ChatRequest(BaseModel):
     message: str = Field(..., description="Pregunta del usuario en español")
@@ -37,7 +111,22 @@ class ChatRequest(BaseModel):
 
 @app.get("/healthz")
 def health():
-    return {"status": "ok", "env": settings.ENV}
+    return {"status": "ok", "env": settings.ENV, "index": current_index()}
+
+@app.get("/suggest")
+async def suggest(q: str = "", limit: int = 10):
+    """Type-ahead for providence identifiers and temas, from memory; no LLM call"""
+    result = suggestions.suggest(q, limit)
+    if result is None:
+        # Prefix unknown to the trie: ask the index's `sg` suggester off the event loop
+        result = await asyncio.to_thread(suggestions.fallback, q, limit)
+    return result
+
+@app.get("/metrics")
+def metrics():
+    refresh_gauges(conversation_memory)
+    content, content_type = render()
+    return Response(content=content, media_type=content_type)
 
 @app.post("/api/messages")
 async def bot_messages(request: Request):
@@ -58,103 +147,33 @@ async def bot_messages(request: Request):
             logger.error("Invalid JSON in request body")
             return Response(status_code=400)
         
-        # Log the complete incoming activity for debugging
-        logger.info(f"Complete incoming activity: {json.dumps(activity_data, indent=2)}")
+        # Full activities only for a sample of requests, truncated
+        if log_payload(logger):
+            logger.debug("Incoming activity: %s", payload(activity_data))
         
         # Handle different activity types
         if activity_data.get("type") == "message" and activity_data.get("text"):
             # Extract the user message and conversation ID
             user_message = activity_data["text"]
             conversation_id = activity_data.get("conversation", {}).get("id", "default")
-            logger.info(f"Bot processing message: {user_message[:100]}...")
             
-            # Get or create conversation history
-            if conversation_id not in conversation_memory:
-                # Initialize with system prompt for new conversations
-                bot_system_prompt = """Eres un asistente legal conversacional. Responde SIEMPRE en español, con precisión y cautela. Tu objetivo es explicar para no abogados, sin jerga innecesaria.
-
-REGLAS DE EVIDENCIA Y CITA
-- Antes de responder, DEBES buscar usando las herramientas disponibles (no inventes información).
-- Cita lo que afirmes añadiendo referencias al final de tu respuesta.
-- Si la evidencia es débil, ambigua u off-topic: di claramente que no hay evidencia suficiente y pide UNA aclaración breve.
-
-HERRAMIENTAS DISPONIBLES Y POLÍTICA DE USO
-- search_by_providence: Úsala cuando el usuario mencione una providencia específica (T-123/2024, C-xxx/AAAA, etc.).
-- search_cases: Úsala para consultas generales sobre casos, demandas o temas legales.
-
-CONDUCTA DE BÚSQUEDA
-1) Si detectas una "providencia" → usa search_by_providence con esa providencia.
-2) Si NO hay providencia → usa search_cases con la consulta del usuario.
-3) Si una llamada devuelve 0 resultados, dilo con claridad y sugiere una aclaración.
-4) IMPORTANTE: Mantén el contexto de la conversación. Si el usuario se refiere a algo mencionado anteriormente ("esa demanda", "ese caso"), busca en el contexto de la conversación para identificar a qué se refiere.
+            # Redelivered activity (the channel did not see our ack in time)
+            dedupe_key = activity_deduper.key(activity_data)
+            if dedupe_key is not None:
+                state = activity_deduper.claim(dedupe_key)
+                if state is not None:
+                    logger.info("Duplicate activity suppressed",
+                                extra={"conversation_id": conversation_id, "state": state})
+                    # Running or done: the reply goes out through the connector, only acknowledge
+                    return Response(status_code=200)
 
-FORMATO DE RESPUESTA
-- Responde de manera natural y conversacional.
-- Sé breve, claro y directo.
-- Estructura tu respuesta de forma fácil de leer.
-- Incluye las fuentes al final si las hay.
-
-LÍMITES Y SEGURIDAD
-- No des asesoría legal formal; menciona: "Esto no constituye asesoría legal".
-- Si no puedes verificar algo, dilo claramente.
-
-ESTILO
-- Lenguaje simple y conversacional.
-- Explica términos legales en palabras cotidianas."""
-
-                conversation_memory[conversation_id] = [SystemMessage(content=bot_system_prompt)]
-            
-            # Add current user message to conversation history
-            conversation_memory[conversation_id].append(HumanMessage(content=user_message))
-            
-            # Keep only last 10 messages to prevent context from growing too large
-            if len(conversation_memory[conversation_id]) > 10:
-                # Keep system message + last 9 messages
-                conversation_memory[conversation_id] = [conversation_memory[conversation_id][0]] + conversation_memory[conversation_id][-9:]
-            
-            initial_state = {
-                "messages": conversation_memory[conversation_id],
-                "top_k": 6,
-                "filters": None
-            }
-            
-            result = graph.invoke(initial_state)
-            final_msg = result["messages"][-1]
-            
-            # Update conversation memory with the bot's response
-            if hasattr(final_msg, 'content') and final_msg.content:
-                conversation_memory[conversation_id].append(AIMessage(content=final_msg.content))
-            
-            if not hasattr(final_msg, 'content') or not final_msg.content:
-                response_text = "Lo siento, no pude generar una respuesta. Por favor, inténtalo de nuevo."
-            else:
-                # Clean up the response - extract just the answer if it's still in JSON format
-                content = str(final_msg.content).strip()
-                
-                # Remove markdown code blocks if present
-                if content.startswith('```json'):
-                    content = content.replace('```json', '').replace('```', '').strip()
-                
-                # Try to parse as JSON and extract just the answer
-                if content.startswith('{') and content.endswith('}'):
-                    try:
-                        response_data = json.loads(content)
-                        if isinstance(response_data, dict) and "answer" in response_data:
-                            response_text = response_data["answer"]
-                            # Add disclaimer if present
-                            if response_data.get("disclaimer"):
-                                response_text += f"\n\n{response_data['disclaimer']}"
-                        else:
-                            response_text = content
-                    except json.JSONDecodeError:
-                        # If JSON parsing fails, use the original content
-                        response_text = content
-                else:
-                    # Use content as-is if it's not JSON
-                    response_text = content
+            logger.info("Bot processing message", extra={"conversation_id": conversation_id, "chars": len(user_message)})
             
-            # Send response back to the emulator
-            await send_response_to_emulator(activity_data, response_text)
+            # Turns of one conversation run in order; different conversations run in parallel
+            # The turn's outcome settles the dedupe entry: it keeps running if this request is cancelled
+            await conversation_lanes.run(
+                conversation_id, lambda: _process_bot_turn(activity_data, user_message, conversation_id),
+                on_done=partial(activity_deduper.settle, dedupe_key) if dedupe_key is not None else None)
             
             # Return 200 to acknowledge receipt
             return Response(status_code=200)
@@ -177,11 +196,11 @@ ESTILO
                         return Response(status_code=200)
         
         # For other activity types, return 200
-        logger.info(f"Unhandled activity type: {activity_data.get('type')}")
+        logger.info("Unhandled activity type: %s", activity_data.get("type"))
         return Response(status_code=200)
         
     except Exception as e:
-        logger.error(f"Error in bot endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in bot endpoint: %s", e, exc_info=True)
         # Return error response instead of 500
         error_response = {
             "type": "message",
@@ -193,6 +212,104 @@ ESTILO
         }
         return error_response
 
+async def _process_bot_turn(activity_data: dict, user_message: str, conversation_id: str):
+    """
+    One bot turn: update the conversation history, run the graph and post the
+    reply. Runs on the conversation's lane, never concurrently with another
+    turn of the same conversation.
+    """
+    # Get or create conversation history
+    if conversation_id not in conversation_memory:
+        # Initialize with system prompt for new conversations
+        bot_system_prompt = """Eres un asistente legal conversacional. Responde SIEMPRE en español, con precisión y cautela. Tu objetivo es explicar para no abogados, sin jerga innecesaria.
+
+REGLAS DE EVIDENCIA Y CITA
+- Antes de responder, DEBES buscar usando las herramientas disponibles (no inventes información).
+- Cita lo que afirmes añadiendo referencias al final de tu respuesta.
+- Si la evidencia es débil, ambigua u off-topic: di claramente que no hay evidencia suficiente y pide UNA aclaración breve.
+
+HERRAMIENTAS DISPONIBLES Y POLÍTICA DE USO
+- search_by_providence: Úsala cuando el usuario mencione una providencia específica (T-123/2024, C-xxx/AAAA, etc.).
+- search_cases: Úsala para consultas generales sobre casos, demandas o temas legales.
+
+CONDUCTA DE BÚSQUEDA
+1) Si detectas una "providencia" → usa search_by_providence con esa providencia.
+2) Si NO hay providencia → usa search_cases con la consulta del usuario.
+3) Si una llamada devuelve 0 resultados, dilo con claridad y sugiere una aclaración.
+4) IMPORTANTE: Mantén el contexto de la conversación. Si el usuario se refiere a algo mencionado anteriormente ("esa demanda", "ese caso"), busca en el contexto de la conversación para identificar a qué se refiere.
+
+FORMATO DE RESPUESTA
+- Responde de manera natural y conversacional.
+- Sé breve, claro y directo.
+- Estructura tu respuesta de forma fácil de leer.
+- Incluye las fuentes al final si las hay.
+
+LÍMITES Y SEGURIDAD
+- No des asesoría legal formal; menciona: "Esto no constituye asesoría legal".
+- Si no puedes verificar algo, dilo claramente.
+
+ESTILO
+- Lenguaje simple y conversacional.
+- Explica términos legales en palabras cotidianas."""
+
+        conversation_memory[conversation_id] = [SystemMessage(content=bot_system_prompt)]
+    
+    # Add current user message to conversation history
+    conversation_memory[conversation_id].append(HumanMessage(content=user_message))
+    
+    # Keep only last 10 messages to prevent context from growing too large
+    if len(conversation_memory[conversation_id]) > 10:
+        # Keep system message + last 9 messages
+        conversation_memory[conversation_id] = [conversation_memory[conversation_id][0]] + conversation_memory[conversation_id][-9:]
+    
+    initial_state = {
+        "messages": conversation_memory[conversation_id],
+        "top_k": 6,
+        "filters": None,
+        **new_budget()
+    }
+    
+    # Off the event loop, so other conversations keep flowing
+    with span("graph.invoke", conversation_id=conversation_id):
+        result = await asyncio.to_thread(get_graph().invoke, initial_state)
+    final_msg = result["messages"][-1]
+    
+    # Update conversation memory with the bot's response
+    if hasattr(final_msg, 'content') and final_msg.content:
+        conversation_memory[conversation_id].append(AIMessage(content=final_msg.content))
+    
+    if not hasattr(final_msg, 'content') or not final_msg.content:
+        response_text = "Lo siento, no pude generar una respuesta. Por favor, inténtalo de nuevo."
+    else:
+        # Clean up the response - extract just the answer if it's still in JSON format
+        content = str(final_msg.content).strip()
+        
+        # Remove markdown code blocks if present
+        if content.startswith('```json'):
+            content = content.replace('```json', '').replace('```', '').strip()
+        
+        # Try to parse as JSON and extract just the answer
+        if content.startswith('{') and content.endswith('}'):
+            try:
+                response_data = json.loads(content)
+                if isinstance(response_data, dict) and "answer" in response_data:
+                    response_text = response_data["answer"]
+                    # Add disclaimer if present
+                    if response_data.get("disclaimer"):
+                        response_text += f"\n\n{response_data['disclaimer']}"
+                else:
+                    response_text = content
+            except json.JSONDecodeError:
+                # If JSON parsing fails, use the original content
+                response_text = content
+        else:
+            # Use content as-is if it's not JSON
+            response_text = content
+    
+    # Send response back to the emulator
+    await send_response_to_emulator(activity_data, response_text)
+    return response_text
+
 async def send_response_to_emulator(original_activity: dict, response_text: str):
     """
     Send a response message back to the Bot Framework Emulator
@@ -202,7 +319,7 @@ async def send_response_to_emulator(original_activity: dict, response_text: str)
         conversation_id = original_activity.get("conversation", {}).get("id")
         
         if not service_url or not conversation_id:
-            logger.error(f"Missing serviceUrl ({service_url}) or conversation ID ({conversation_id})")
+            logger.error("Missing serviceUrl (%s) or conversation ID (%s)", service_url, conversation_id)
             return
         
         # Create response activity
@@ -220,26 +337,27 @@ async def send_response_to_emulator(original_activity: dict, response_text: str)
         # Send to the emulator's conversation endpoint
         url = f"{service_url}/v3/conversations/{conversation_id}/activities"
         
-        logger.info(f"Sending response to: {url}")
-        logger.info(f"Response text: {response_text}")
+        logger.debug("Sending response to %s: %s", url, payload(response_text))
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                json=response_activity,
-                headers={
-                    "Content-Type": "application/json"
-                },
-                timeout=10.0
-            )
+        with span("bot.send_response", kind=SpanKind.CLIENT, conversation_id=conversation_id) as reply_span:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    url,
+                    json=response_activity,
+                    headers=inject_headers({
+                        "Content-Type": "application/json"
+                    }),
+                    timeout=10.0
+                )
+            reply_span.set_attribute("http.status_code", response.status_code)
             
             if response.status_code in [200, 201, 202]:
-                logger.info(f"Successfully sent response to emulator: {response.status_code}")
+                logger.info("Sent response to connector: %s", response.status_code)
             else:
-                logger.error(f"Failed to send response to emulator: {response.status_code} - {response.text}")
+                logger.error("Failed to send response to connector: %s - %s", response.status_code, payload(response.text))
                 
     except Exception as e:
-        logger.error(f"Error sending response to emulator: {str(e)}", exc_info=True)
+        logger.error("Error sending response to emulator: %s", e, exc_info=True)
 
 def format_legal_response(response_data: dict) -> str:
     """
@@ -277,13 +395,13 @@ def format_legal_response(response_data: dict) -> str:
         return formatted.strip() if formatted else str(response_data)
         
     except Exception as e:
-        logger.error(f"Error formatting response: {e}")
+        logger.error("Error formatting response: %s", e)
         return str(response_data)
 
 @app.post("/chat")
 def chat(req: ChatRequest):
     try:
-        logger.info(f"Received chat request: {req.message[:100]}...")
+        logger.info("Received chat request", extra={"chars": len(req.message)})
         
         # Validate input message
         if not req.message or not req.message.strip():
@@ -294,14 +412,15 @@ def chat(req: ChatRequest):
         msgs = [SystemMessage(content=SYSTEM_PROMPT),
                 HumanMessage(content=req.message)]
         
-        logger.info("Invoking graph with messages")
         # Pass search parameters to the graph state
         initial_state = {
             "messages": msgs,
             "top_k": req.top_k,
-            "filters": req.filters
+            "filters": req.filters,
+            **new_budget()
         }
-        result = graph.invoke(initial_state)
+        with span("graph.invoke"):
+            result = get_graph().invoke(initial_state)
         final_msg = result["messages"][-1]
         
         # Ensure we have content to return
@@ -309,14 +428,64 @@ def chat(req: ChatRequest):
             logger.error("No content in final message")
             return {"error": "No se pudo generar una respuesta"}
         
-        logger.info("Successfully generated response")
         return final_msg.content  # Cadena JSON según FINAL_JSON_INSTRUCTIONS
         
     except Exception as e:
         # Log the error for debugging
-        logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
         return {
             "error": "Error interno del servidor",
             "message": "No se pudo procesar la consulta. Por favor, inténtalo de nuevo.",
             "details": str(e) if settings.ENV == "dev" else None
         }
+
+@app.post("/chat/batch")
+async def chat_batch(reqs: list[ChatRequest], concurrency: int | None = None):
+    """
+    Answer many questions in one call. Items run through the graph with bounded
+    concurrency (sharing the embedding/search caches), identical questions are
+    answered once, and results stream back as NDJSON in completion order.
+    """
+    if len(reqs) > settings.BATCH_MAX_ITEMS:
+        return Response(
+            content=json.dumps({"error": f"El lote admite como máximo {settings.BATCH_MAX_ITEMS} preguntas"}),
+            status_code=413, media_type="application/json"
+        )
+
+    limit = max(1, min(concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+
+    # Dedupe: identical (message, top_k, filters) are executed once
+    groups: dict[str, list[int]] = {}
+    for i, req in enumerate(reqs):
+        key = json.dumps([req.message.strip(), req.top_k, req.filters], sort_keys=True, default=str)
+        groups.setdefault(key, []).append(i)
+
+    async def run(indexes: list[int]):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await asyncio.to_thread(chat, reqs[indexes[0]])
+            return indexes, result, (time.perf_counter() - start) * 1000
+
+    async def stream():
+        tasks = [asyncio.create_task(run(indexes)) for indexes in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indexes, result, latency_ms = await next_done
+                for i in indexes:
+                    line = {
+                        "index": i,
+                        "message": reqs[i].message,
+                        "result": result,
+                        "latency_ms": round(latency_ms, 1),
+                    }
+                    if i != indexes[0]:
+                        line["duplicate_of"] = indexes[0]
+                    yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+        finally:
+            # Client went away: stop scheduling the remaining questions
+            for task in tasks:
+                task.cancel()
+
+    logger.info("Batch chat: %d items, %d unique, concurrency %d", len(reqs), len(groups), limit)
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
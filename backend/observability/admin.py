@@ -0,0 +1,65 @@
+"""
+Admin endpoints for profiling a live worker. Only mounted when ADMIN_ENABLED
+is true and ADMIN_TOKEN is set; every call must send the token in the
+X-Admin-Token header. With several gunicorn workers, each call profiles the
+worker that happens to serve it (its pid is returned in X-Worker-Pid).
+
+    GET /admin/profile/cpu?seconds=30      folded stacks (flamegraph.pl, speedscope)
+    GET /admin/profile/heap?seconds=60     tracemalloc growth, top allocators
+"""
+import asyncio
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+
+from config import settings
+from observability import profiling
+
+
+def _require_token(x_admin_token: str = Header(default="")):
+    if not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(_require_token)])
+
+
+def _check_seconds(seconds: float) -> float:
+    if seconds > settings.ADMIN_MAX_PROFILE_S:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.ADMIN_MAX_PROFILE_S}")
+    return seconds
+
+
+async def _exclusive(fn, *args, **kwargs):
+    # The profilers are process-wide: refuse to overlap them
+    if not profiling.profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another profile is already running in this worker")
+    try:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    finally:
+        profiling.profile_lock.release()
+
+
+@router.get("/profile/cpu")
+async def profile_cpu(seconds: float = Query(30, gt=0), interval_ms: float = Query(10, ge=1),
+                      idle: bool = False):
+    folded = await _exclusive(profiling.sample_cpu, _check_seconds(seconds), interval_ms / 1000, idle)
+    return Response(
+        content=folded,
+        media_type="text/plain",
+        headers={
+            "X-Worker-Pid": str(os.getpid()),
+            "Content-Disposition": f'attachment; filename="cpu-{os.getpid()}.folded"',
+        },
+    )
+
+
+@router.get("/profile/heap")
+async def profile_heap(request: Request, response: Response, seconds: float = Query(60, gt=0),
+                       top: int = Query(25, ge=1, le=500), frames: int = Query(1, ge=1, le=50),
+                       group_by: str = Query("lineno", pattern="^(lineno|traceback|filename)$")):
+    result = await _exclusive(profiling.heap_diff, _check_seconds(seconds), top, frames, group_by)
+    result["objects"] = profiling.object_counts(getattr(request.app.state, "conversation_memory", None))
+    response.headers["X-Worker-Pid"] = str(os.getpid())
+    return result
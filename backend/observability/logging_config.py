@@ -0,0 +1,133 @@
+"""
+Process-wide logging setup.
+
+Records go through a QueueHandler to a background QueueListener thread, so
+JSON serialization and stream I/O happen off the request path. Call sites
+should use %-style arguments (logger.info("x=%s", x)) so disabled levels
+cost nothing, and wrap large bodies in `payload()` so they are only
+serialized when the record is emitted, and then truncated.
+
+Settings:
+- LOG_LEVEL: root level (default INFO)
+- LOG_LEVELS: per-module overrides, "graph.agent_graph=DEBUG,httpx=WARNING"
+- LOG_FORMAT: json (one object per line, with trace_id) or text
+- LOG_PAYLOAD_SAMPLE_RATE / LOG_PAYLOAD_MAX_CHARS: see log_payload() / payload()
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from config import settings
+
+_listener: Optional[QueueListener] = None
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "trace_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TraceIdFilter(logging.Filter):
+    """Stamps the current trace id while still on the caller's thread/context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from observability.tracing import current_trace_id
+        record.trace_id = current_trace_id()
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Hands the record over unformatted: the queue is in-process, so the message,
+    arguments and payload() wrappers are rendered on the listener thread.
+    Do not pass arguments that are mutated right after the logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _Payload:
+    """Defers serialization of a large object until the record is formatted"""
+
+    __slots__ = ("obj", "limit")
+
+    def __init__(self, obj: Any, limit: int):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = self.obj if isinstance(self.obj, str) else json.dumps(self.obj, ensure_ascii=False, default=str)
+        return text if len(text) <= self.limit else f"{text[:self.limit]}... [{len(text)} chars]"
+
+
+def payload(obj: Any, limit: Optional[int] = None) -> _Payload:
+    return _Payload(obj, int(limit or settings.LOG_PAYLOAD_MAX_CHARS))
+
+
+def log_payload(logger: logging.Logger, level: int = logging.DEBUG) -> bool:
+    """True when a full payload should be logged: level enabled and this request is sampled"""
+    return logger.isEnabledFor(level) and random.random() < float(settings.LOG_PAYLOAD_SAMPLE_RATE)
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None:
+    """Install the queue handler on the root logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    if (settings.LOG_FORMAT or "json").lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s")
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(_TraceIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in _parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the worker exits
+    atexit.register(_listener.stop)
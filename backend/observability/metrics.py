@@ -0,0 +1,108 @@
+"""
+Prometheus metrics for the API, the agent graph, the tools and the upstream
+providers.
+
+With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py
+does it): every worker writes its samples there and /metrics aggregates all
+of them, whichever worker answers the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+
+# Gemini and Azure calls take from tens of ms to tens of seconds
+_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ["endpoint", "method", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["endpoint"], buckets=_BUCKETS)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served (queue depth)",
+                         multiprocess_mode="livesum")
+
+NODE_LATENCY = Histogram("graph_node_duration_seconds", "Agent graph node latency", ["node"], buckets=_BUCKETS)
+TOOL_LATENCY = Histogram("tool_duration_seconds", "Tool call latency", ["tool", "outcome"], buckets=_BUCKETS)
+UPSTREAM_LATENCY = Histogram("upstream_duration_seconds", "Gemini / Azure call latency",
+                             ["provider", "outcome"], buckets=_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by Gemini", ["model", "kind"])
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Provider cache lookups", ["cache", "result"])
+SINGLEFLIGHT_CALLS = Counter("singleflight_calls_total", "Single-flight calls", ["flight", "result"])
+SPECULATION_OUTCOMES = Counter("speculative_retrieval_total",
+                               "Speculative first-turn searches by outcome (used, mismatch, unused, failed)",
+                               ["outcome"])
+SPECULATION_SAVED = Histogram("speculative_retrieval_saved_seconds",
+                              "Search time hidden behind the first LLM call when a speculation is used",
+                              buckets=_BUCKETS)
+SUGGEST_REQUESTS = Counter("suggest_requests_total", "/suggest answers by source (trie, azure, empty)", ["source"])
+
+CONVERSATIONS = Gauge("conversation_store_conversations", "Conversations held in memory",
+                      multiprocess_mode="livesum")
+CONVERSATION_MESSAGES = Gauge("conversation_store_messages", "Messages held in conversation memory",
+                              multiprocess_mode="livesum")
+BOT_DUPLICATES = Counter("bot_duplicate_activities_total", "Redelivered bot activities suppressed", ["state"])
+BOT_LANES = Gauge("bot_conversation_lanes", "Active per-conversation lanes", multiprocess_mode="livesum")
+BOT_LANE_WAIT = Histogram("bot_lane_wait_seconds", "Time a bot turn waited behind earlier turns of its conversation",
+                          buckets=_BUCKETS)
+LIMITER_QUEUED = Gauge("gemini_limiter_queued", "Calls waiting for the Gemini rate limiter", ["model"],
+                       multiprocess_mode="livesum")
+LIMITER_IN_FLIGHT = Gauge("gemini_limiter_in_flight", "Gemini calls in flight", ["model"],
+                          multiprocess_mode="livesum")
+LIMITER_CONCURRENCY = Gauge("gemini_limiter_concurrency_limit", "AIMD concurrency window", ["model"],
+                            multiprocess_mode="max")
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels):
+    """Time a block; an `outcome` label (if the histogram has one) becomes ok/error"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        if "outcome" in histogram._labelnames:
+            labels["outcome"] = outcome
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def timed_node(name: str, fn: Callable) -> Callable:
+    @wraps(fn)
+    def wrapper(state):
+        with observe(NODE_LATENCY, node=name):
+            return fn(state)
+    return wrapper
+
+
+def record_token_usage(model: str, message) -> None:
+    usage = getattr(message, "usage_metadata", None) or {}
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(model=model, kind=kind.split("_")[0]).inc(usage[kind])
+
+
+def refresh_gauges(conversation_memory: dict) -> None:
+    """Snapshot in-memory state into gauges (called periodically and on scrape)"""
+    from providers.rate_limiter import limiter_stats
+    CONVERSATIONS.set(len(conversation_memory))
+    CONVERSATION_MESSAGES.set(sum(len(m) for m in list(conversation_memory.values())))
+    for model, stats in limiter_stats().items():
+        LIMITER_QUEUED.labels(model=model).set(stats["queued"])
+        LIMITER_IN_FLIGHT.labels(model=model).set(stats["in_flight"])
+        LIMITER_CONCURRENCY.labels(model=model).set(stats["concurrency_limit"])
+
+
+def render() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,106 @@
+"""
+On-demand profilers for a running worker (used by observability/admin.py).
+
+- sample_cpu: samples every thread's stack with sys._current_frames() at a
+  fixed interval and returns the folded format ("frame;frame;frame count")
+  understood by flamegraph.pl, speedscope and inferno.
+- heap_diff: two tracemalloc snapshots N seconds apart, compared by line.
+
+Nothing runs (and tracemalloc stays off) until an endpoint is called.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+# One profile at a time per worker; a second caller gets a 409
+profile_lock = threading.Lock()
+
+
+# Innermost frames of threads parked in a wait/select (not using CPU)
+_IDLE_FUNCTIONS = {
+    "Condition.wait", "Event.wait", "Thread._wait_for_tstate_lock", "_worker",
+    "BaseSelector.select", "EpollSelector.select", "SelectSelector.select", "KqueueSelector.select",
+    "SimpleQueue.get", "Queue.get", "QueueListener.dequeue",
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+def sample_cpu(seconds: float, interval: float = 0.01, idle: bool = False) -> str:
+    """Folded stacks of all threads (root first) sampled for `seconds`"""
+    me = threading.get_ident()
+    names = {}
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if not idle and labels and labels[0].split(":", 1)[1] in _IDLE_FUNCTIONS:
+                continue
+            if ident not in names:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            labels.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def heap_diff(seconds: float, top: int = 25, frames: int = 1, group_by: str = "lineno") -> dict:
+    """Allocation growth over `seconds`; tracemalloc is stopped again if we started it"""
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        before, after = before.filter_traces(filters), after.filter_traces(filters)
+        stats = after.compare_to(before, group_by)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    return {
+        "seconds": seconds,
+        "traced_current_mb": round(current / 2**20, 2),
+        "traced_peak_mb": round(peak / 2**20, 2),
+        "note": "tracemalloc was started for this call: only allocations made during the window are visible"
+        if started_here else None,
+        "top": [
+            {
+                "where": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in stats[:top]
+        ],
+    }
+
+
+def object_counts(conversation_memory: Optional[dict] = None) -> dict:
+    """Cheap sizes of the in-memory structures that usually grow"""
+    from providers.cache import cache_stats
+    counts = {"caches": cache_stats()}
+    if conversation_memory is not None:
+        counts["conversations"] = len(conversation_memory)
+        counts["conversation_messages"] = sum(len(m) for m in list(conversation_memory.values()))
+    return counts
@@ -0,0 +1,103 @@
+"""
+Request tracing with OpenTelemetry.
+
+Every HTTP request gets a server span whose trace ID is returned in the
+X-Trace-Id header. Graph nodes, tool calls, Gemini/Azure calls and the Bot
+Framework reply become child spans. The OpenTelemetry context lives in
+contextvars, so it follows asyncio.to_thread, LangGraph's executor and
+call_with_deadline.
+
+TRACING_EXPORTER selects the backend:
+- none: API only, spans are no-ops (default)
+- console: one JSON span per line on stdout
+- file: same as console, appended to TRACING_FILE
+- otlp: OTLP/HTTP to TRACING_OTLP_ENDPOINT (e.g. a local collector)
+
+TRACE_SAMPLE_RATIO applies to new traces; an incoming traceparent header
+keeps the caller's sampling decision.
+"""
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("legal-bot")
+
+_configured = False
+
+
+def setup_tracing() -> None:
+    """Install the SDK tracer provider once per process (call after the gunicorn fork)"""
+    global _configured
+    exporter_name = (settings.TRACING_EXPORTER or "none").lower()
+    if _configured or exporter_name == "none":
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    elif exporter_name == "file":
+        out = open(settings.TRACING_FILE, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif exporter_name == "console":
+        exporter = ConsoleSpanExporter(formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        logger.warning("Unknown TRACING_EXPORTER '%s', tracing disabled", exporter_name)
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.APP_NAME, "deployment.environment": settings.ENV}),
+        sampler=ParentBased(TraceIdRatioBased(float(settings.TRACE_SAMPLE_RATIO))),
+    )
+    # Spans are exported from a background thread, off the request path
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+    logger.info("Tracing enabled: exporter=%s sample_ratio=%s", exporter_name, settings.TRACE_SAMPLE_RATIO)
+
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, context=None, **attributes):
+    """Child span of the current one; exceptions are recorded and re-raised"""
+    attrs = {k: v for k, v in attributes.items() if v is not None}
+    with tracer.start_as_current_span(name, context=context, kind=kind, attributes=attrs) as current:
+        try:
+            yield current
+        except BaseException as e:
+            current.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    @wraps(fn)
+    def wrapper(state):
+        with span(f"graph.{name}", node=name):
+            return fn(state)
+    return wrapper
+
+
+def extract_context(headers) -> Optional[object]:
+    """Parent context from W3C traceparent/tracestate headers, if present"""
+    return propagate.extract(headers)
+
+
+def inject_headers(headers: dict) -> dict:
+    propagate.inject(headers)
+    return headers
+
+
+def current_trace_id() -> Optional[str]:
+    ctx = trace.get_current_span().get_span_context()
+    return format(ctx.trace_id, "032x") if ctx.is_valid else None
@@ -1,13 +1,43 @@
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from config import settings
 
-def make_search_client() -> SearchClient:
+if TYPE_CHECKING:
+    from azure.search.documents import SearchClient
+    from azure.search.documents.indexes import SearchIndexClient
+
+def make_search_client(index_name: str | None = None) -> "SearchClient":
+    # Queries go to the concrete index version the alias points at (providers/index_version.py)
+    if index_name is None:
+        from providers.index_version import current_index
+        index_name = current_index()
+    return _search_client_for(index_name)
+
+@lru_cache(maxsize=4)
+def _search_client_for(index_name: str) -> "SearchClient":
+    if settings.PROVIDER_MODE != "live":
+        from providers import fake_providers
+        return fake_providers.search_client(lambda: _live_search_client(index_name))
+    return _live_search_client(index_name)
+
+def _credential():
+    from azure.core.credentials import AzureKeyCredential
     if settings.AZURE_SEARCH_USE_MSI:
-        cred = DefaultAzureCredential()
-        return SearchClient(settings.AZURE_SEARCH_ENDPOINT, settings.AZURE_SEARCH_INDEX, cred)
+        from azure.identity import DefaultAzureCredential
+        return DefaultAzureCredential()
     if not settings.AZURE_SEARCH_API_KEY:
         raise RuntimeError("Provide AZURE_SEARCH_API_KEY or set AZURE_SEARCH_USE_MSI=true")
-    return SearchClient(settings.AZURE_SEARCH_ENDPOINT, settings.AZURE_SEARCH_INDEX,
-                        AzureKeyCredential(settings.AZURE_SEARCH_API_KEY))
+    return AzureKeyCredential(settings.AZURE_SEARCH_API_KEY)
+
+def _live_search_client(index_name: str) -> "SearchClient":
+    # Azure SDK clients are thread-safe, so one instance (and its connection pool) is shared
+    from azure.search.documents import SearchClient
+    return SearchClient(settings.AZURE_SEARCH_ENDPOINT, index_name, _credential())
+
+@lru_cache(maxsize=1)
+def make_index_client() -> "SearchIndexClient":
+    if settings.PROVIDER_MODE != "live":
+        from providers import fake_providers
+        return fake_providers.index_client()
+    from azure.search.documents.indexes import SearchIndexClient
+    return SearchIndexClient(settings.AZURE_SEARCH_ENDPOINT, _credential())
@@ -0,0 +1,105 @@
+"""
+Small in-process caches for query-time provider results.
+
+TTLCache is a thread-safe LRU with optional expiry and hit/miss counters.
+The shared instances below are used by the search tools, so /chat,
+/chat/batch and the bot path all benefit from the same entries.
+"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+from config import settings
+from observability.metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+# Optional per-request hit/miss counters, see request_cache_scope()
+_request_counters: contextvars.ContextVar = contextvars.ContextVar("cache_request_counters", default=None)
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    self._count("hits")
+                    return value
+                del self._data[key]
+            self.misses += 1
+            self._count("misses")
+            return default
+
+    def _count(self, field: str):
+        CACHE_REQUESTS.labels(cache=self.name, result="hit" if field == "hits" else "miss").inc()
+        counters = _request_counters.get()
+        if counters is not None:
+            entry = counters.setdefault(self.name, {"hits": 0, "misses": 0})
+            entry[field] += 1
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {"name": self.name, "size": size, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0}
+
+
+# Embeddings are deterministic for a given model, so they only expire by LRU
+embedding_cache = TTLCache("embedding", settings.EMBED_CACHE_SIZE)
+search_cache = TTLCache("search", settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL_S)
+
+
+@contextmanager
+def request_cache_scope():
+    """Collect the cache hits/misses made by the current request (thread/task)"""
+    counters: Dict[str, Dict[str, int]] = {}
+    token = _request_counters.set(counters)
+    try:
+        yield counters
+    finally:
+        _request_counters.reset(token)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {c.name: c.stats() for c in (embedding_cache, search_cache)}
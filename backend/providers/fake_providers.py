@@ -0,0 +1,534 @@
+"""
+Deterministic stand-ins for Gemini and Azure AI Search.
+
+PROVIDER_MODE selects how the chat model, the genai client and the search
+client are built (see chat_model(), gemini_client(), search_client()):
+  live   - real SDK clients (default, this module is not imported)
+  fake   - synthetic providers: the same input always gives the same output
+  record - real clients, every response is appended to FAKE_CASSETTE_PATH
+  replay - responses served from the cassette, synthetic output on a miss
+
+Synthetic and replayed calls sleep according to FAKE_*_LATENCY, so
+benchmarks can model upstream latency while measuring only our overhead.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, message_to_dict, messages_from_dict
+from config import settings
+
+PROVIDENCE_RE = re.compile(r"\b[A-Z]{1,3}-\d{1,5}/\d{4}\b")
+
+_VOCABULARY = (
+    "acoso escolar tutela derecho educación menor colegio redes sociales salud pensión "
+    "despido estabilidad reforzada debido proceso igualdad dignidad intimidad habeas data "
+    "vivienda agua servicios públicos discapacidad ajustes razonables piar desplazamiento "
+    "víctimas reparación consulta previa indígena ambiente trabajo contrato laboral"
+).split()
+_SOURCES = ["Tutela", "Constitucionalidad", "Unificación"]
+
+
+def _seed(*parts: Any) -> int:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class LatencyModel:
+    """
+    Latency distribution in milliseconds, parsed from specs such as
+    "50", "fixed:50", "uniform:20,80", "normal:50,10" or "lognormal:3.9,0.4"
+    (mu/sigma of the underlying normal). Seeded, so runs are repeatable.
+    """
+
+    def __init__(self, spec: str, seed: int = 0):
+        kind, _, params = str(spec).partition(":")
+        if not params:
+            kind, params = "fixed", kind
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_ms(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                value = self._rng.uniform(self.params[0], self.params[1])
+            elif self.kind == "normal":
+                value = self._rng.gauss(self.params[0], self.params[1])
+            elif self.kind == "lognormal":
+                value = self._rng.lognormvariate(self.params[0], self.params[1])
+            else:
+                value = self.params[0] if self.params else 0.0
+        return max(0.0, value)
+
+    def sleep(self):
+        ms = self.sample_ms()
+        if ms:
+            time.sleep(ms / 1000)
+
+
+@lru_cache(maxsize=None)
+def latency(kind: str) -> LatencyModel:
+    """Latency model for "chat", "embed" or "search" (falls back to FAKE_LATENCY_MS)"""
+    spec = getattr(settings, f"FAKE_{kind.upper()}_LATENCY", "") or str(settings.FAKE_LATENCY_MS)
+    return LatencyModel(spec, seed=_seed(settings.FAKE_SEED, kind))
+
+
+def fake_vector(text: str, dim: Optional[int] = None) -> List[float]:
+    """Unit-length pseudo-random vector derived from the text"""
+    rng = random.Random(_seed("vec", text))
+    values = [rng.gauss(0.0, 1.0) for _ in range(int(dim or settings.EMBED_DIM))]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+# -- Gemini -------------------------------------------------------------------
+
+class _FakeModels:
+    def embed_content(self, model: str, contents: Any, config: Any = None):
+        latency("embed").sleep()
+        texts = contents if isinstance(contents, list) else [contents]
+        dim = getattr(config, "output_dimensionality", None) if config is not None else None
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_vector(str(t), dim)) for t in texts])
+
+    def get(self, model: str):
+        return SimpleNamespace(name=model)
+
+
+class FakeGenaiClient:
+    """Mimics the parts of google.genai.Client used by the app"""
+
+    def __init__(self):
+        self.models = _FakeModels()
+
+
+class FakeChatModel:
+    """
+    Mimics ChatGoogleGenerativeAI bound to the app tools: the first turn calls
+    search_by_providence (if the question names a providence) or search_cases,
+    and once tool results are present it writes a short answer citing them.
+    """
+
+    def __init__(self, allow_tool_calls: bool = True):
+        self.allow_tool_calls = allow_tool_calls
+
+    def bind_tools(self, tools, tool_choice: Optional[str] = None, **kwargs):
+        return FakeChatModel(allow_tool_calls=tool_choice != "none")
+
+    def invoke(self, messages: List[Any], **kwargs) -> AIMessage:
+        latency("chat").sleep()
+        question = ""
+        tool_results = []
+        for msg in messages:
+            if isinstance(msg, HumanMessage):
+                # agent() prefixes the first question with the system prompt
+                question = str(msg.content).split("Usuario:", 1)[-1].split("\n[", 1)[0].strip()
+                tool_results = []
+            elif isinstance(msg, ToolMessage):
+                tool_results.append(str(msg.content))
+
+        input_tokens = sum(len(str(m.content)) // 4 for m in messages)
+        if self.allow_tool_calls and not tool_results:
+            match = PROVIDENCE_RE.search(question)
+            if match:
+                call = {"name": "search_by_providence", "args": {"providence": match.group(0)}}
+            else:
+                call = {"name": "search_cases", "args": {"query": question}}
+            call.update({"id": f"call_{_seed(question) % 10**8}", "type": "tool_call"})
+            return AIMessage(content="", tool_calls=[call],
+                             usage_metadata={"input_tokens": input_tokens, "output_tokens": 12,
+                                             "total_tokens": input_tokens + 12})
+
+        titles = re.findall(r"'title': '([^']+)'", " ".join(tool_results))
+        unique = list(dict.fromkeys(titles))[:3]
+        if unique:
+            body = " ".join(f"Ver {t} [{i}]." for i, t in enumerate(unique, 1))
+            sources = "\n".join(f"[{i}] id={t}" for i, t in enumerate(unique, 1))
+            answer = f"Respuesta sobre «{question[:80]}». {body}\n\nFuentes:\n{sources}\n\nEsto no constituye asesoría legal."
+        else:
+            answer = f"No encontré coincidencias para «{question[:80]}». ¿Puedes dar más detalles?"
+        output_tokens = len(answer) // 4
+        return AIMessage(content=answer,
+                         usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                         "total_tokens": input_tokens + output_tokens})
+
+
+# -- Azure AI Search ----------------------------------------------------------
+
+def synthetic_corpus(size: int) -> List[Dict[str, Any]]:
+    """Documents shaped like prepare_docs_legal() output"""
+    docs = []
+    for i in range(size):
+        # Three chunks per providence: metadata comes from the providence, text from the chunk
+        row = random.Random(_seed("row", i // 3))
+        rng = random.Random(_seed("doc", i))
+        year = 2015 + row.randrange(10)
+        prefix = row.choice(["T", "C", "SU"])
+        temas = row.sample(_VOCABULARY, 3)
+        docs.append({
+            "id": f"{i // 3}-{i % 3}",
+            "title": f"{prefix}-{100 + i // 3}/{year}",
+            "content": "Resuelve: " + " ".join(rng.choice(_VOCABULARY) for _ in range(60)),
+            "source": row.choice(_SOURCES),
+            "date": f"{year}-{row.randrange(1, 13):02d}-{row.randrange(1, 29):02d}T00:00:00Z",
+            "year": year,
+            "relevance": round(row.random(), 3),
+            "tema_subtema_raw": " - ".join(temas),
+            "temas": temas,
+        })
+    return docs
+
+
+_CLAUSE_RE = re.compile(r"^\s*(\w+)\s+eq\s+(?:'((?:[^']|'')*)'|(\S+))\s*$")
+
+
+def _parse_filter(filter_str: Optional[str]):
+    """Supports the `field eq value [and ...]` filters built by the tools"""
+    clauses = []
+    for part in (filter_str or "").split(" and "):
+        m = _CLAUSE_RE.match(part)
+        if m:
+            value = m.group(2).replace("''", "'") if m.group(2) is not None else m.group(3)
+            clauses.append((m.group(1), value))
+    return clauses
+
+
+def _matches(doc: Dict[str, Any], clauses) -> bool:
+    for field, value in clauses:
+        actual = doc.get(field)
+        if isinstance(actual, list):
+            if value not in actual:
+                return False
+        elif str(actual).lower() != str(value).lower():
+            return False
+    return True
+
+
+class FakeSearchResults(list):
+    def __init__(self, items, facets=None):
+        super().__init__(items)
+        self._facets = facets or {}
+
+    def get_facets(self):
+        return self._facets
+
+    def by_page(self, page_size: int = 50):
+        return iter([self[i:i + page_size] for i in range(0, len(self), page_size)])
+
+
+class FakeSearchClient:
+    """In-memory index with lexical scoring, OData `eq` filters and title facets"""
+
+    def __init__(self, docs: Optional[List[Dict[str, Any]]] = None):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        for doc in docs if docs is not None else synthetic_corpus(settings.FAKE_CORPUS_SIZE):
+            self.docs[str(doc["id"])] = doc
+
+    def search(self, search_text: Optional[str] = None, filter: Optional[str] = None,
+               top: Optional[int] = None, select: Optional[List[str]] = None,
+               facets: Optional[List[str]] = None, **kwargs) -> FakeSearchResults:
+        latency("search").sleep()
+        clauses = _parse_filter(filter)
+        candidates = [d for d in self.docs.values() if _matches(d, clauses)]
+
+        terms = set((search_text or "").lower().split()) - {"*"}
+        scored = []
+        for doc in candidates:
+            words = f"{doc.get('title', '')} {doc.get('content', '')}".lower().split()
+            score = sum(1 for w in words if w in terms) / (1 + len(words) ** 0.5) if terms else 1.0
+            if terms and score == 0:
+                continue
+            scored.append((score, doc))
+        scored.sort(key=lambda item: (-item[0], item[1]["id"]))
+
+        facet_values = {}
+        for spec in facets or []:
+            # "field" or "field,count:N"; collection fields count every value
+            field, _, options = spec.partition(",")
+            size = int(options.split("count:")[1]) if "count:" in options else 10
+            counts: Dict[Any, int] = {}
+            for _, doc in scored:
+                values = doc.get(field)
+                for value in values if isinstance(values, list) else [values]:
+                    counts[value] = counts.get(value, 0) + 1
+            ranked = sorted(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+            facet_values[field] = [{"value": v, "count": c} for v, c in ranked[:size]]
+
+        # Without top the SDK follows the continuation pages, so every match comes back
+        limit = len(scored) if top is None else top
+        items = []
+        for score, doc in scored[:limit]:
+            item = {k: v for k, v in doc.items() if k != "content_vector" and (not select or k in select)}
+            item["@search.score"] = float(score)
+            items.append(item)
+        return FakeSearchResults(items, facet_values)
+
+    def get_document_count(self) -> int:
+        return len(self.docs)
+
+    def autocomplete(self, search_text: str, suggester_name: str, mode: Optional[str] = None,
+                     top: Optional[int] = None, **kwargs) -> List[Dict[str, str]]:
+        """Completes the last word from the title and content terms, most frequent first"""
+        latency("search").sleep()
+        *context, last = search_text.lower().split() or [""]
+        counts: Dict[str, int] = {}
+        for doc in self.docs.values():
+            for word in f"{doc.get('title', '')} {doc.get('content', '')}".lower().split():
+                if word.startswith(last):
+                    counts[word] = counts.get(word, 0) + 1
+        ranked = sorted(counts, key=lambda w: (-counts[w], w))[:5 if top is None else top]
+        return [{"text": w, "query_plus_text": " ".join([*context, w])} for w in ranked]
+
+    def get_document(self, key: str, selected_fields: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        latency("search").sleep()
+        if str(key) not in self.docs:
+            from azure.core.exceptions import ResourceNotFoundError
+            raise ResourceNotFoundError(f"Document '{key}' not found")
+        doc = self.docs[str(key)]
+        return {k: v for k, v in doc.items() if k != "content_vector" and (not selected_fields or k in selected_fields)}
+
+    def upload_documents(self, documents: List[Dict[str, Any]]):
+        latency("search").sleep()
+        for doc in documents:
+            self.docs[str(doc["id"])] = dict(doc)
+        return [SimpleNamespace(key=str(d["id"]), succeeded=True) for d in documents]
+
+    def merge_or_upload_documents(self, documents: List[Dict[str, Any]]):
+        return self.upload_documents(documents)
+
+    def delete_documents(self, documents: List[Dict[str, Any]]):
+        latency("search").sleep()
+        for doc in documents:
+            self.docs.pop(str(doc["id"]), None)
+        return [SimpleNamespace(key=str(d["id"]), succeeded=True) for d in documents]
+
+
+class FakeIndexClient:
+    """In-memory SearchIndexClient: named indexes and aliases for blue/green runs"""
+
+    def __init__(self):
+        self._indexes: Dict[str, FakeSearchClient] = {}
+        self._aliases: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def create_index(self, index):
+        with self._lock:
+            self._indexes.setdefault(index.name, FakeSearchClient([]))
+        return index
+
+    def delete_index(self, index):
+        name = getattr(index, "name", index)
+        with self._lock:
+            self._indexes.pop(name, None)
+
+    def list_index_names(self) -> List[str]:
+        return list(self._indexes)
+
+    def get_search_client(self, index_name: str) -> FakeSearchClient:
+        with self._lock:
+            return self._indexes.setdefault(index_name, FakeSearchClient([]))
+
+    def create_or_update_alias(self, alias, **kwargs):
+        self._aliases[alias.name] = list(alias.indexes)
+        return alias
+
+    def get_alias(self, name: str):
+        if name not in self._aliases:
+            from azure.core.exceptions import ResourceNotFoundError
+            raise ResourceNotFoundError(f"Alias '{name}' not found")
+        return SimpleNamespace(name=name, indexes=list(self._aliases[name]))
+
+    def list_aliases(self):
+        return [SimpleNamespace(name=n, indexes=list(i)) for n, i in self._aliases.items()]
+
+    def delete_alias(self, alias):
+        self._aliases.pop(getattr(alias, "name", alias), None)
+
+    def create_synonym_map(self, synonym_map):
+        return synonym_map
+
+    def delete_synonym_map(self, name):
+        pass
+
+
+# -- Record / replay ------------------------------------------------------------
+
+class Cassette:
+    """Append-only JSONL store of upstream responses keyed by a request hash"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry["response"]
+
+    @staticmethod
+    def key(kind: str, request: Any) -> str:
+        payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key in self.entries:
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, kind: str, response: Any):
+        with self._lock:
+            self.entries[key] = response
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "kind": kind, "response": response},
+                                   ensure_ascii=False, default=str) + "\n")
+
+
+@lru_cache(maxsize=1)
+def cassette() -> Cassette:
+    return Cassette(settings.FAKE_CASSETTE_PATH)
+
+
+def _chat_request(messages: List[Any], allow_tool_calls: bool) -> Any:
+    return [allow_tool_calls, [[type(m).__name__, str(m.content), getattr(m, "tool_calls", None) or []]
+                               for m in messages]]
+
+
+def _search_request(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # The query vector is derived from search_text, and timeouts vary per call
+    return {k: v for k, v in kwargs.items() if k not in ("vector_queries", "timeout")}
+
+
+def _embed_request(model: str, contents: Any, config: Any) -> Any:
+    return [model, contents if isinstance(contents, list) else [contents],
+            getattr(config, "output_dimensionality", None) if config is not None else None]
+
+
+class _RecordingModels:
+    def __init__(self, models):
+        self._models = models
+
+    def embed_content(self, model: str, contents: Any, config: Any = None):
+        response = self._models.embed_content(model=model, contents=contents, config=config)
+        values = [list(e.values) for e in response.embeddings]
+        cassette().put(Cassette.key("embed", _embed_request(model, contents, config)), "embed", values)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class RecordingGenaiClient:
+    def __init__(self, client):
+        self._client = client
+        self.models = _RecordingModels(client.models)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class _ReplayModels(_FakeModels):
+    def embed_content(self, model: str, contents: Any, config: Any = None):
+        values = cassette().get(Cassette.key("embed", _embed_request(model, contents, config)))
+        if values is None:
+            return super().embed_content(model, contents, config)
+        latency("embed").sleep()
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=v) for v in values])
+
+
+class ReplayGenaiClient(FakeGenaiClient):
+    def __init__(self):
+        self.models = _ReplayModels()
+
+
+class RecordingSearchClient:
+    def __init__(self, client):
+        self._client = client
+
+    def search(self, **kwargs) -> FakeSearchResults:
+        results = self._client.search(**kwargs)
+        items = [dict(r) for r in results]
+        facets = results.get_facets() if kwargs.get("facets") else {}
+        cassette().put(Cassette.key("search", _search_request(kwargs)), "search",
+                       {"items": items, "facets": facets})
+        return FakeSearchResults(items, facets)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class ReplaySearchClient(FakeSearchClient):
+    def search(self, **kwargs) -> FakeSearchResults:
+        recorded = cassette().get(Cassette.key("search", _search_request(kwargs)))
+        if recorded is None:
+            return super().search(**kwargs)
+        latency("search").sleep()
+        return FakeSearchResults(recorded["items"], recorded["facets"])
+
+
+class RecordingChatModel:
+    def __init__(self, llm, allow_tool_calls: bool):
+        self._llm = llm
+        self.allow_tool_calls = allow_tool_calls
+
+    def invoke(self, messages: List[Any], **kwargs) -> AIMessage:
+        response = self._llm.invoke(messages, **kwargs)
+        cassette().put(Cassette.key("chat", _chat_request(messages, self.allow_tool_calls)), "chat",
+                       message_to_dict(response))
+        return response
+
+
+class ReplayChatModel(FakeChatModel):
+    def bind_tools(self, tools, tool_choice: Optional[str] = None, **kwargs):
+        return ReplayChatModel(allow_tool_calls=tool_choice != "none")
+
+    def invoke(self, messages: List[Any], **kwargs) -> AIMessage:
+        recorded = cassette().get(Cassette.key("chat", _chat_request(messages, self.allow_tool_calls)))
+        if recorded is None:
+            return super().invoke(messages, **kwargs)
+        latency("chat").sleep()
+        return messages_from_dict([recorded])[0]
+
+
+# -- Factories used by the provider modules --------------------------------------
+
+def chat_model(live_factory: Callable[[bool], Any], allow_tool_calls: bool, tools: List[Any]):
+    mode = settings.PROVIDER_MODE
+    if mode == "record":
+        return RecordingChatModel(live_factory(allow_tool_calls), allow_tool_calls)
+    model = ReplayChatModel() if mode == "replay" else FakeChatModel()
+    return model.bind_tools(tools, tool_choice=None if allow_tool_calls else "none")
+
+
+def gemini_client(live_factory: Callable[[], Any]):
+    mode = settings.PROVIDER_MODE
+    if mode == "record":
+        return RecordingGenaiClient(live_factory())
+    return ReplayGenaiClient() if mode == "replay" else FakeGenaiClient()
+
+
+@lru_cache(maxsize=1)
+def index_client() -> FakeIndexClient:
+    # Index management is never recorded: every non-live mode shares one in-memory service
+    return FakeIndexClient()
+
+
+def search_client(live_factory: Callable[[], Any], docs: Optional[List[Dict[str, Any]]] = None):
+    mode = settings.PROVIDER_MODE
+    if mode == "record":
+        return RecordingSearchClient(live_factory())
+    return ReplaySearchClient(docs) if mode == "replay" else FakeSearchClient(docs)
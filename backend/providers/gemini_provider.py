@@ -1,6 +1,26 @@
-import google.genai as genai
+from functools import lru_cache
 from config import settings
+from providers.rate_limiter import get_limiter, ModelLimiter
 
+@lru_cache(maxsize=1)
 def get_gemini_client():
-    """Get configured Gemini client"""
+    """Get configured Gemini client (shared per process so HTTP connections are reused)"""
+    if settings.PROVIDER_MODE != "live":
+        from providers import fake_providers
+        return fake_providers.gemini_client(_live_gemini_client)
+    return _live_gemini_client()
+
+def _live_gemini_client():
+    # Imported lazily: google.genai is heavy and not needed until the first call
+    import google.genai as genai
     return genai.Client(api_key=settings.GEMINI_API_KEY)
+
+def chat_limiter() -> ModelLimiter:
+    return get_limiter(settings.GEMINI_CHAT_MODEL, settings.GEMINI_CHAT_RPM, settings.GEMINI_CHAT_TPM,
+                       max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+                       bulk_reserve=settings.GEMINI_BULK_RESERVE)
+
+def embed_limiter() -> ModelLimiter:
+    return get_limiter(settings.GEMINI_EMBED_MODEL, settings.GEMINI_EMBED_RPM, settings.GEMINI_EMBED_TPM,
+                       max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+                       bulk_reserve=settings.GEMINI_BULK_RESERVE)
@@ -0,0 +1,84 @@
+"""
+Which concrete search index the backend queries.
+
+After blue/green reindexing (indexacion/blue_green.py) AZURE_SEARCH_INDEX is
+an index alias pointing at a versioned index such as `legal-index-v3`. The
+backend resolves the alias and queries that version directly, so every
+cache key can carry the version it was computed against. A background task
+(see main.lifespan) re-resolves the alias every INDEX_REFRESH_S seconds;
+when the version changes the query caches are cleared and the registered
+listeners run, without restarting the workers.
+
+If AZURE_SEARCH_INDEX is a plain index (no alias with that name), it is
+used as is.
+"""
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_current: Optional[str] = None
+_warned = False
+_listeners: List[Callable[[str, Optional[str]], None]] = []
+
+
+def _resolve() -> str:
+    name = settings.AZURE_SEARCH_INDEX
+    if not name:
+        return name
+    from azure.core.exceptions import ResourceNotFoundError
+    from providers.bot_search_client import make_index_client
+    try:
+        alias = make_index_client().get_alias(name)
+    except ResourceNotFoundError:
+        return name
+    return alias.indexes[0] if alias.indexes else name
+
+
+def current_index() -> str:
+    """The index queries should go to; resolved once, then kept fresh by refresh()"""
+    if _current is None:
+        refresh()
+    return _current or settings.AZURE_SEARCH_INDEX
+
+
+def resolved_index() -> Optional[str]:
+    """The version current_index() would return, or None before the first refresh(); never resolves"""
+    return _current
+
+
+def refresh() -> str:
+    """Re-resolve the alias; on a version change clear caches and notify listeners"""
+    global _current, _warned
+    try:
+        resolved = _resolve()
+    except Exception as e:
+        # Keep serving the version we know (or the alias itself, e.g. with a query-only key)
+        logger.log(logging.DEBUG if _warned else logging.WARNING,
+                   "Could not resolve search index alias %s: %s", settings.AZURE_SEARCH_INDEX, e)
+        _warned = True
+        with _lock:
+            if _current is None:
+                _current = settings.AZURE_SEARCH_INDEX
+        return _current
+    with _lock:
+        previous, _current = _current, resolved
+    if previous is not None and previous != resolved:
+        logger.info("Search index switched: %s -> %s", previous, resolved)
+        from providers.cache import search_cache
+        search_cache.clear()
+        for listener in list(_listeners):
+            try:
+                listener(resolved, previous)
+            except Exception as e:
+                logger.warning("Index change listener failed: %s", e)
+    return resolved
+
+
+def on_index_change(listener: Callable[[str, Optional[str]], None]):
+    """Call `listener(new_index, old_index)` after every version switch"""
+    _listeners.append(listener)
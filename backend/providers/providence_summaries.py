@@ -0,0 +1,104 @@
+"""
+Per-providence summary records.
+
+get_providence_summary used to fetch up to 100 chunks of a providence and
+aggregate them on every call. Ingestion (indexacion/reindex.py) now computes
+one compact record per providence with summarize() and stores it in a
+companion index, `<index><SUMMARY_INDEX_SUFFIX>`, keyed by summary_key(), so
+the tool is a single key lookup. The same function aggregates chunks read
+page by page when a record is missing (an index built before the summaries
+existed), so both paths return the same shape (to_summary()).
+
+Shared by the backend and indexacion: keep it free of settings and SDK imports.
+"""
+import base64
+from typing import Any, Dict, Iterable, Optional
+
+LEAD_CHARS = 500
+
+# Fields of a stored record, in index order (indexacion/create_index.build_summary_index)
+FIELDS = [
+    "id", "providence", "total_chunks", "sources", "dates", "years", "average_relevance",
+    "max_relevance", "min_relevance", "unique_temas", "tema_count",
+    "lead_content", "lead_relevance", "lead_tema_subtema",
+]
+
+
+def summary_key(providence: str) -> str:
+    # Providences contain "/" and spaces; Azure keys allow letters, digits, "_", "-" and "="
+    return base64.urlsafe_b64encode(providence.encode("utf-8")).decode("ascii")
+
+
+def summarize(providence: str, chunks: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Aggregate the chunks of one providence in a single pass; None when there are none"""
+    total = 0
+    sources, dates, years, temas = set(), set(), set(), set()
+    relevance_sum, relevance_n, low, high = 0.0, 0, None, None
+    lead = None
+    for chunk in chunks:
+        total += 1
+        if chunk.get("source"):
+            sources.add(chunk["source"])
+        if chunk.get("date"):
+            dates.add(str(chunk["date"]))
+        if chunk.get("year"):
+            years.add(int(chunk["year"]))
+        temas.update(chunk.get("temas") or [])
+        relevance = chunk.get("relevance")
+        if relevance:
+            relevance_sum += relevance
+            relevance_n += 1
+            low = relevance if low is None else min(low, relevance)
+            high = relevance if high is None else max(high, relevance)
+            if lead is None or relevance > lead.get("relevance"):
+                lead = chunk
+    if not total:
+        return None
+    content = (lead or {}).get("content") or ""
+    return {
+        "id": summary_key(providence),
+        "providence": providence,
+        "total_chunks": total,
+        "sources": sorted(sources),
+        "dates": sorted(dates),
+        "years": sorted(years),
+        "average_relevance": relevance_sum / relevance_n if relevance_n else 0.0,
+        "max_relevance": high or 0.0,
+        "min_relevance": low or 0.0,
+        "unique_temas": sorted(temas),
+        "tema_count": len(temas),
+        "lead_content": content[:LEAD_CHARS] + "..." if content else "",
+        "lead_relevance": lead.get("relevance") if lead else 0.0,
+        "lead_tema_subtema": (lead.get("tema_subtema_raw") or "") if lead else "",
+    }
+
+
+def summarize_all(docs: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Records for every providence (chunk title) in `docs`"""
+    grouped: Dict[str, list] = {}
+    for doc in docs:
+        if doc.get("title"):
+            grouped.setdefault(doc["title"], []).append(doc)
+    return {providence: summarize(providence, chunks) for providence, chunks in grouped.items()}
+
+
+def to_summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The get_providence_summary result for a stored record"""
+    return {
+        "providence": record["providence"],
+        "found": True,
+        "total_chunks": record["total_chunks"],
+        "sources": list(record.get("sources") or []),
+        "dates": list(record.get("dates") or []),
+        "years": list(record.get("years") or []),
+        "average_relevance": record.get("average_relevance") or 0,
+        "max_relevance": record.get("max_relevance") or 0,
+        "min_relevance": record.get("min_relevance") or 0,
+        "unique_temas": list(record.get("unique_temas") or []),
+        "tema_count": record.get("tema_count") or 0,
+        "most_relevant_content": {
+            "content": record.get("lead_content") or "",
+            "relevance": record.get("lead_relevance") or 0,
+            "tema_subtema": record.get("lead_tema_subtema") or "",
+        } if record.get("lead_relevance") else None,
+    }
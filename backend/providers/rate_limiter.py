@@ -0,0 +1,213 @@
+"""
+Client-side rate limiting and retry scheduling for Gemini calls.
+
+Each model gets its own ModelLimiter with:
+  - token buckets for requests per minute (RPM) and tokens per minute (TPM),
+  - an AIMD concurrency window: +1/window on success, halved on a 429,
+  - priority admission: INTERACTIVE callers are always admitted before BULK
+    callers, and BULK callers may not dip into a reserved share of the budget.
+`call()` wraps an upstream call with admission plus jittered retries that
+honour Retry-After.
+
+Budgets are per process: with several gunicorn workers, configure each
+worker's share of the project quota. This module has no settings import so
+the ingestion scripts can reuse it.
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+
+
+class RateLimitExceeded(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most one minute of budget"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until `amount` units are available while keeping `reserve` units untouched"""
+        self._refill(time.monotonic())
+        # A single request larger than the bucket is allowed once the bucket is full
+        needed = min(amount + reserve, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class ModelLimiter:
+    def __init__(self, name: str, rpm: float, tpm: float,
+                 max_concurrency: int = 8, min_concurrency: int = 1,
+                 bulk_reserve: float = 0.2):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.bulk_reserve = bulk_reserve
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self.throttled = 0
+        self.retries = 0
+
+    # -- admission -------------------------------------------------------
+
+    def _wait_time(self, tokens: float, priority: int) -> Optional[float]:
+        """None if a concurrency slot is missing, otherwise seconds until the buckets allow the call"""
+        if self.in_flight >= max(self.min_concurrency, int(self.limit)):
+            return None
+        share = self.bulk_reserve if priority == BULK else 0.0
+        return max(self.requests.wait_time(1, share * self.requests.capacity),
+                   self.tokens.wait_time(tokens, share * self.tokens.capacity))
+
+    def acquire(self, tokens: float, priority: int = INTERACTIVE, max_wait: Optional[float] = None):
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    wait = None
+                    # Strict priority: only the head of the queue may be admitted
+                    if self._waiters[0] == entry:
+                        wait = self._wait_time(tokens, priority)
+                        if wait == 0.0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            self.in_flight += 1
+                            return
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise RateLimitExceeded(f"Timed out waiting for {self.name} rate limit")
+                    timeout = wait if wait is not None else 0.5
+                    if remaining is not None:
+                        timeout = min(timeout, remaining)
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def release(self, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                # Multiplicative decrease on 429
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.throttled += 1
+            else:
+                # Additive increase: roughly +1 per full window of successful calls
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    # -- retry scheduling -------------------------------------------------
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0, priority: int = INTERACTIVE,
+             max_attempts: int = 4, base_delay: float = 0.5, max_wait: Optional[float] = None) -> Any:
+        """Run fn under the limiter, retrying 429/5xx with full-jitter backoff"""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        for attempt in range(max_attempts):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            self.acquire(tokens, priority, remaining)
+            throttled = False
+            try:
+                return fn()
+            except Exception as e:
+                status = _status_code(e)
+                throttled = status == 429
+                if status not in (429, 500, 502, 503, 504) or attempt == max_attempts - 1:
+                    raise
+                delay = random.uniform(0, base_delay * (2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                self.retries += 1
+                logger.warning("%s: upstream returned %s, retrying in %.2fs (attempt %d/%d, concurrency %.1f)",
+                               self.name, status, delay, attempt + 1, max_attempts, self.limit)
+            finally:
+                self.release(throttled)
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"name": self.name, "concurrency_limit": round(self.limit, 2),
+                    "in_flight": self.in_flight, "queued": len(self._waiters),
+                    "throttled": self.throttled, "retries": self.retries}
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    # google.genai APIError exposes .code, google.api_core exceptions .code / .grpc_status_code,
+    # httpx/azure errors .status_code
+    for attr in ("code", "status_code"):
+        value = getattr(e, attr, None)
+        if isinstance(value, int):
+            return value
+    text = str(e)
+    if "429" in text or "RESOURCE_EXHAUSTED" in text:
+        return 429
+    if "503" in text or "UNAVAILABLE" in text:
+        return 503
+    return None
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for TPM accounting"""
+    return max(1, len(text) // 4)
+
+
+_limiters: Dict[str, ModelLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str, rpm: float, tpm: float, **kwargs) -> ModelLimiter:
+    """Process-wide limiter for a model (the first caller's budget wins)"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(model, rpm, tpm, **kwargs)
+            _limiters[model] = limiter
+        return limiter
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
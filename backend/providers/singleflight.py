@@ -0,0 +1,95 @@
+"""
+Single-flight coalescing for upstream calls.
+
+Identical calls that are in flight at the same time share one upstream
+request: the first caller (the leader) executes it and every other caller
+waits for the same result. Nothing is cached once the call finishes.
+Works for sync callers (threads) and async callers (event loop) alike,
+since both wait on the same concurrent.futures.Future.
+"""
+import asyncio
+import inspect
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, Hashable, Optional
+from observability.metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executed = 0   # calls that reached upstream
+        self.coalesced = 0  # calls answered by another caller's request
+
+    def _join(self, key: Hashable):
+        """Return (future, is_leader) for key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                SINGLEFLIGHT_CALLS.labels(flight=self.name, result="coalesced").inc()
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executed += 1
+            SINGLEFLIGHT_CALLS.labels(flight=self.name, result="executed").inc()
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # Already cancelled by someone else; the leader's own outcome still stands
+            pass
+
+    def do(self, key: Hashable, fn: Callable[[], Any], wait_timeout: Optional[float] = None) -> Any:
+        """Run fn once for all concurrent callers with the same key (blocking)"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(timeout=wait_timeout)
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any], wait_timeout: Optional[float] = None) -> Any:
+        """Async variant: fn may be a coroutine function or a blocking callable (run in a thread)"""
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded: a follower that times out or is cancelled must not cancel the shared future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=wait_timeout)
+        try:
+            if inspect.iscoroutinefunction(fn):
+                result = await fn()
+            else:
+                result = await asyncio.to_thread(fn)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"name": self.name, "executed": self.executed,
+                "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+# Shared instances for the query-time providers
+embedding_flight = SingleFlight("embedding")
+search_flight = SingleFlight("search")
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    return {f.name: f.stats() for f in (embedding_flight, search_flight)}
@@ -0,0 +1,241 @@
+"""
+Type-ahead suggestions for providence identifiers and temas (GET /suggest).
+
+Every providence title and tema of the current index version is loaded
+into an in-memory prefix trie. Entries are reachable from the start of each
+of their words ("423" finds "T-423/2024", "escolar" finds "acoso escolar"),
+matching ignores case and accents, and every trie node keeps its best
+SUGGEST_MAX_RESULTS entries, so a lookup walks the prefix and returns a
+precomputed list: no search request and no LLM call.
+
+The trie is built from the providence summary index (one record per
+providence, see providers/providence_summaries.py), or from title/temas
+facets of the main index when there are no summaries. It loads in a
+background thread on first use (or in the warm-up) and is rebuilt when
+the index version changes; the old trie keeps serving until the new one is
+ready. Prefixes the trie cannot complete, and requests that arrive before
+it is loaded, go to the index's `sg` suggester (Azure autocomplete).
+"""
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from observability.metrics import observe, UPSTREAM_LATENCY, SUGGEST_REQUESTS
+from observability.tracing import span
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()  # no trie / no load running; None is a valid index name (AZURE_SEARCH_INDEX unset)
+MAX_KEY_CHARS = 40  # deeper prefixes are matched by scanning the entries of the last node
+_SEPARATORS = set(" -/.,;:()")
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class PrefixTrie:
+    """Prefix trie whose nodes hold their top `keep` entries by weight"""
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self.size = 0
+        # node: [children by character, entries as (-weight, text, kind)]
+        self._root: List[Any] = [{}, []]
+
+    def add(self, text: str, kind: str, weight: float):
+        entry = (-weight, text, kind)
+        key = normalize(text)
+        starts = [i for i, c in enumerate(key) if c not in _SEPARATORS and (i == 0 or key[i - 1] in _SEPARATORS)]
+        for start in starts:
+            node = self._root
+            for c in key[start:start + MAX_KEY_CHARS]:
+                node = node[0].setdefault(c, [{}, []])
+                node[1].append(entry)
+                if len(node[1]) > 4 * self.keep:
+                    node[1] = self._best(node[1])
+        self.size += 1
+
+    def _best(self, entries: List[Tuple]) -> List[Tuple]:
+        return sorted(set(entries))[:self.keep]
+
+    def freeze(self) -> "PrefixTrie":
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            node[1] = self._best(node[1])
+            stack.extend(node[0].values())
+        return self
+
+    def complete(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        key = normalize(prefix).strip()
+        node = self._root
+        for c in key[:MAX_KEY_CHARS]:
+            node = node[0].get(c)
+            if node is None:
+                return []
+        entries = node[1]
+        if len(key) > MAX_KEY_CHARS:
+            entries = [e for e in entries if key in normalize(e[1])]
+        return [{"text": text, "kind": kind, "count": int(-weight)} for weight, text, kind in entries[:limit]]
+
+
+def _search_kwargs() -> Dict[str, Any]:
+    from graph.budget import upstream_timeout
+    timeout = upstream_timeout()
+    return {"timeout": timeout} if timeout is not None else {}
+
+
+def _from_summaries(index: str, trie: PrefixTrie) -> int:
+    from providers.bot_search_client import make_search_client
+    client = make_search_client(f"{index}{settings.SUMMARY_INDEX_SUFFIX}")
+    results = client.search(search_text="*", select=["providence", "total_chunks", "unique_temas"], **_search_kwargs())
+    temas: Dict[str, int] = {}
+    providences = 0
+    for page in results.by_page():
+        for record in page:
+            if not record.get("providence"):
+                continue
+            providences += 1
+            trie.add(record["providence"], "providence", record.get("total_chunks") or 1)
+            for tema in record.get("unique_temas") or []:
+                temas[tema] = temas.get(tema, 0) + 1
+    for tema, count in temas.items():
+        trie.add(tema, "tema", count)
+    return providences
+
+
+def _from_facets(index: str, trie: PrefixTrie):
+    from providers.bot_search_client import make_search_client
+    count = int(settings.SUGGEST_MAX_TERMS)
+    results = make_search_client(index).search(
+        search_text="*", facets=[f"title,count:{count}", f"temas,count:{count}"], top=0, **_search_kwargs())
+    facets = results.get_facets()
+    for kind, field in (("providence", "title"), ("tema", "temas")):
+        for facet in facets.get(field) or []:
+            if facet.get("value"):
+                trie.add(str(facet["value"]), kind, facet["count"])
+
+
+def build(index: str) -> PrefixTrie:
+    """Trie of the providences and temas of `index`"""
+    from azure.core.exceptions import ResourceNotFoundError
+    trie = PrefixTrie(int(settings.SUGGEST_MAX_RESULTS))
+    with span("suggest.build", index=index), observe(UPSTREAM_LATENCY, provider="azure_search"):
+        try:
+            loaded = _from_summaries(index, trie)
+        except ResourceNotFoundError:
+            loaded = 0
+        if not loaded:
+            # Index built before the summaries existed
+            _from_facets(index, trie)
+    return trie.freeze()
+
+
+class Suggester:
+    """The trie of the current index version, loaded and swapped in the background"""
+
+    def __init__(self):
+        self._trie: Optional[PrefixTrie] = None
+        self._index: Any = _UNSET
+        self._loading: Any = _UNSET
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, index: str):
+        """Build synchronously and swap in (warm-up, index version change)"""
+        with self._lock:
+            if self._index == index or self._loading == index:
+                return
+            self._loading = index
+        self._swap(index)
+
+    def _swap(self, index: Optional[str]):
+        from providers.index_version import current_index
+        start = time.perf_counter()
+        try:
+            # None: first use before the alias was resolved, resolve it here off the request path
+            index = current_index() if index is None else index
+            trie = build(index)
+        except Exception as e:
+            logger.warning("Could not load suggestions for %s: %s", index, e)
+            with self._lock:
+                self._failed_at = time.monotonic()
+                self._loading = _UNSET
+            return
+        with self._lock:
+            self._trie, self._index, self._loading = trie, index, _UNSET
+        logger.info("Suggestions loaded for %s: %d entries in %.0f ms",
+                    index, trie.size, (time.perf_counter() - start) * 1000)
+
+    def trie(self) -> Optional[PrefixTrie]:
+        """Current trie, or None while it loads; never blocks on the index or its alias"""
+        from providers.index_version import resolved_index
+        index = resolved_index()
+        with self._lock:
+            idle = self._loading is _UNSET and time.monotonic() - self._failed_at >= float(settings.INDEX_REFRESH_S)
+            if idle and (self._index is _UNSET or index is not None and index != self._index):
+                self._loading = index
+                threading.Thread(target=self._swap, args=(index,), name="suggest-load", daemon=True).start()
+            # A trie of the previous version is better than none during a switch
+            return self._trie
+
+
+suggester = Suggester()
+
+
+def _limit(limit: int) -> int:
+    return max(1, min(limit, int(settings.SUGGEST_MAX_RESULTS)))
+
+
+def suggest(prefix: str, limit: int) -> Optional[Dict[str, Any]]:
+    """Suggestions from the trie, in memory; None when the prefix needs the Azure fallback"""
+    prefix = prefix.strip()
+    if not prefix:
+        SUGGEST_REQUESTS.labels(source="empty").inc()
+        return {"query": prefix, "source": "empty", "suggestions": []}
+    trie = suggester.trie()
+    found = trie.complete(prefix, _limit(limit)) if trie is not None else []
+    if found or not settings.SUGGEST_FALLBACK:
+        SUGGEST_REQUESTS.labels(source="trie" if found else "empty").inc()
+        return {"query": prefix, "source": "trie" if found else "empty", "suggestions": found}
+    return None
+
+
+def fallback(prefix: str, limit: int) -> Dict[str, Any]:
+    """Azure autocomplete on the `sg` suggester (title and content terms); blocks on the index"""
+    prefix = prefix.strip()
+    SUGGEST_REQUESTS.labels(source="azure").inc()
+    return {"query": prefix, "source": "azure", "suggestions": [dict(s) for s in _autocomplete(prefix, _limit(limit))]}
+
+
+def _autocomplete(prefix: str, limit: int) -> List[Dict[str, Any]]:
+    from providers.bot_search_client import make_search_client
+    from providers.cache import search_cache
+    from providers.index_version import current_index
+    index = current_index()
+
+    def _run():
+        with span("azure_search.autocomplete", index=index), observe(UPSTREAM_LATENCY, provider="azure_search"):
+            results = make_search_client(index).autocomplete(
+                search_text=prefix, suggester_name="sg", mode="oneTermWithContext", top=limit, **_search_kwargs())
+        return [{"text": r["query_plus_text"] if "query_plus_text" in r else r["text"], "kind": "term"}
+                for r in results]
+
+    return search_cache.get_or_compute(("suggest", index, normalize(prefix), limit), _run)
+
+
+def _on_index_change(new: str, old: Optional[str]):
+    suggester.load(new)
+
+
+def _register():
+    from providers.index_version import on_index_change
+    on_index_change(_on_index_change)
+
+
+_register()
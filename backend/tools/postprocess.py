@@ -0,0 +1,129 @@
+"""
+Post-retrieval processing for search_cases.
+
+Chunks of one providence row share ids `<row>-0`, `<row>-1`, ... and
+consecutive chunks repeat 40 words (ingest_excel.chunk). merge_adjacent()
+joins contiguous chunks of the same row and title into one result, dropping
+the repeated words. mmr() then picks the final top_k by maximal marginal
+relevance: search score against similarity to what is already picked,
+using the chunk vectors returned with the results (word overlap when the
+index does not return vectors).
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_CHUNK_ID = re.compile(r"^(.*)-(\d+)$")
+MAX_OVERLAP = 40
+
+
+def _split_id(doc_id: str) -> Tuple[str, Optional[int]]:
+    match = _CHUNK_ID.match(doc_id or "")
+    return (match.group(1), int(match.group(2))) if match else (doc_id, None)
+
+
+def _overlap(previous: List[str], following: List[str]) -> int:
+    for n in range(min(MAX_OVERLAP, len(previous), len(following)), 0, -1):
+        if previous[-n:] == following[:n]:
+            return n
+    return 0
+
+
+def normalized(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def merge_adjacent(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join contiguous chunks of the same row and title; results keep the rank of their best chunk"""
+    groups: Dict[Tuple[Any, ...], List[Tuple[int, int, Dict[str, Any]]]] = {}
+    for position, doc in enumerate(docs):
+        row, n = _split_id(doc["id"])
+        key = (row, doc.get("title")) if n is not None else (None, position)
+        groups.setdefault(key, []).append((n or 0, position, doc))
+
+    merged: List[Tuple[int, Dict[str, Any]]] = []
+    for items in groups.values():
+        run: List[Tuple[int, int, Dict[str, Any]]] = []
+        for item in sorted(items, key=lambda item: item[0]):
+            if run and item[0] != run[-1][0] + 1:
+                merged.append(_join(run))
+                run = []
+            run.append(item)
+        merged.append(_join(run))
+    return [doc for _, doc in sorted(merged, key=lambda item: item[0])]
+
+
+def _join(run: List[Tuple[int, int, Dict[str, Any]]]) -> Tuple[int, Dict[str, Any]]:
+    position = min(p for _, p, _ in run)
+    docs = [doc for _, _, doc in run]
+    if len(docs) == 1:
+        return position, docs[0]
+    words = docs[0]["content"].split()
+    for doc in docs[1:]:
+        following = doc["content"].split()
+        words += following[_overlap(words, following):]
+    vectors = [d["_vector"] for d in docs if d.get("_vector")]
+    return position, {
+        **docs[0],
+        "content": " ".join(words),
+        "score": max(d["score"] for d in docs),
+        "chunks": [d["id"] for d in docs],
+        "_vector": normalized([sum(col) for col in zip(*vectors)]) if len(vectors) == len(docs) else None,
+    }
+
+
+def _similarity(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    # Vectors are unit length (normalized when the results are read)
+    if a.get("_vector") and b.get("_vector"):
+        return sum(x * y for x, y in zip(a["_vector"], b["_vector"]))
+    words_a, words_b = set(a["content"].lower().split()), set(b["content"].lower().split())
+    return len(words_a & words_b) / len(words_a | words_b) if words_a and words_b else 0.0
+
+
+def mmr(docs: List[Dict[str, Any]], k: int, lambda_: float) -> List[Dict[str, Any]]:
+    """Greedy maximal marginal relevance on min-max normalized search scores"""
+    if lambda_ >= 1 or len(docs) <= 1:
+        return docs[:k]
+    scores = [d["score"] for d in docs]
+    low, high = min(scores), max(scores)
+    relevance = [(s - low) / (high - low) if high > low else 1.0 for s in scores]
+    redundancy = [0.0] * len(docs)  # max similarity to the picked results
+    remaining = list(range(len(docs)))
+    picked: List[int] = []
+    while remaining and len(picked) < k:
+        best = max(remaining, key=lambda i: lambda_ * relevance[i] - (1 - lambda_) * redundancy[i])
+        picked.append(best)
+        remaining.remove(best)
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _similarity(docs[i], docs[best]))
+    return [docs[i] for i in picked]
+
+
+def postprocess(docs: List[Dict[str, Any]], k: int, lambda_: float) -> List[Dict[str, Any]]:
+    """Merge adjacent chunks, diversify, and drop the internal fields"""
+    selected = mmr(merge_adjacent(docs), k, lambda_)
+    return [{key: value for key, value in doc.items() if not key.startswith("_")} for doc in selected]
+
+
+if __name__ == "__main__":
+    # Self-check: python -m tools.postprocess (from backend/)
+    words = [f"w{i}" for i in range(300)]
+    # Chunks of 100 words repeating the previous chunk's last 40, as ingest_excel.chunk does
+    chunks = [words[start:start + 100] for start in range(0, 240, 60)]
+    docs = [{"id": f"book-7-{j}", "title": "T-1/23", "content": " ".join(c), "score": 1.0 - j / 10}
+            for j, c in reversed(list(enumerate(chunks)))]
+    docs.append({"id": "book-8-0", "title": "T-1/23", "content": "otra fila", "score": 0.1})
+    merged = merge_adjacent(docs)
+    assert len(merged) == 2, merged
+    assert merged[0]["content"].split() == words[:280], merged[0]["content"][:80]
+    assert merged[0]["chunks"] == [f"book-7-{j}" for j in range(4)] and merged[0]["score"] == 1.0
+    # A gap splits the run: 0 and 2 without 1 stay separate
+    assert len(merge_adjacent([d for d in docs if d["id"] != "book-7-1"])) == 3
+    assert _split_id("book-7-12") == ("book-7", 12)
+    near = {"id": "a-0", "title": "A", "content": "acoso escolar colegio", "score": 1.0}
+    same = {"id": "b-0", "title": "B", "content": "acoso escolar colegio", "score": 0.9}
+    different = {"id": "c-0", "title": "C", "content": "pensión de vejez", "score": 0.8}
+    assert [d["id"] for d in mmr([near, same, different], 2, 0.5)] == ["a-0", "c-0"]
+    assert [d["id"] for d in mmr([near, same, different], 2, 1.0)] == ["a-0", "b-0"]
+    print("postprocess: ok")
@@ -1,6 +1,18 @@
 from typing import List, Dict, Any, Optional
-from langchain.tools import tool
+from langchain_core.tools import tool
 from providers.bot_search_client import make_search_client
+from providers.index_version import current_index
+from providers.singleflight import search_flight
+from providers.cache import search_cache
+from providers.providence_summaries import FIELDS, summarize, summary_key, to_summary
+from observability.metrics import observe, UPSTREAM_LATENCY
+from observability.tracing import span
+from graph.budget import upstream_timeout
+from config import settings
+
+
+def _summary_index_name(index: str) -> str:
+    return f"{index}{settings.SUMMARY_INDEX_SUFFIX}"
 
 
 @tool("search_by_providence", return_direct=False)
@@ -19,7 +31,8 @@ def search_by_providence(providence: str,
     Returns:
       Lista de documentos con todos los campos disponibles excepto content_vector
     """
-    client = make_search_client()
+    index = current_index()
+    client = make_search_client(index)
     
     # Build filters including title now that it's filterable
     filter_parts = [f"title eq '{providence}'"]  # Main providence filter
@@ -50,25 +63,38 @@ def search_by_providence(providence: str,
         if filter_str:
             search_params["filter"] = filter_str
             
-        results = client.search(**search_params)
-        
-        documents = []
-        for result in results:
-            doc = {
-                "id": result.get("id"),
-                "title": result.get("title"),
-                "content": result.get("content"),
-                "source": result.get("source"),
-                "date": result.get("date"),
-                "year": result.get("year"),
-                "relevance": result.get("relevance"),
-                "tema_subtema_raw": result.get("tema_subtema_raw"),
-                "temas": result.get("temas", []),
-                "search_score": float(result.get("@search.score", 0.0))
-            }
-            documents.append(doc)
-        
-        return documents
+        timeout = upstream_timeout()
+        if timeout is not None:
+            search_params["timeout"] = timeout
+
+        def _run():
+            with span("azure_search.search", filter=filter_str, top=top_k), \
+                    observe(UPSTREAM_LATENCY, provider="azure_search"):
+                return _collect(client.search(**search_params))
+
+        def _collect(results):
+            documents = []
+            for result in results:
+                doc = {
+                    "id": result.get("id"),
+                    "title": result.get("title"),
+                    "content": result.get("content"),
+                    "source": result.get("source"),
+                    "date": result.get("date"),
+                    "year": result.get("year"),
+                    "relevance": result.get("relevance"),
+                    "tema_subtema_raw": result.get("tema_subtema_raw"),
+                    "temas": result.get("temas", []),
+                    "search_score": float(result.get("@search.score", 0.0))
+                }
+                documents.append(doc)
+            return documents
+
+        # Concurrent lookups of the same providence share one upstream request
+        key = ("search_by_providence", index, filter_str, top_k)
+        documents = search_cache.get_or_compute(
+            key, lambda: search_flight.do(key, _run, wait_timeout=timeout))
+        return [dict(d) for d in documents]
         
     except Exception as e:
         # Return detailed error information for debugging
@@ -95,51 +121,46 @@ def get_providence_summary(providence: str) -> Dict[str, Any]:
     Returns:
       Diccionario con resumen de la providencia
     """
-    documents = search_by_providence(providence, top_k=100)
-    
-    if not documents or (len(documents) == 1 and "error" in documents[0]):
-        return {
-            "providence": providence,
-            "found": False,
-            "error": documents[0].get("error") if documents else "No documents found"
-        }
-    
-    # Calculate summary statistics
-    total_chunks = len(documents)
-    sources = set(doc.get("source") for doc in documents if doc.get("source"))
-    dates = [doc.get("date") for doc in documents if doc.get("date")]
-    years = [doc.get("year") for doc in documents if doc.get("year")]
-    relevances = [doc.get("relevance") for doc in documents if doc.get("relevance")]
-    all_temas = []
-    for doc in documents:
-        if doc.get("temas"):
-            all_temas.extend(doc.get("temas"))
-    
-    unique_temas = list(set(all_temas))
-    
-    # Get the most relevant content (highest relevance score)
-    most_relevant = max(documents, key=lambda x: x.get("relevance", 0)) if relevances else None
-    
-    summary = {
-        "providence": providence,
-        "found": True,
-        "total_chunks": total_chunks,
-        "sources": list(sources),
-        "dates": list(set(dates)) if dates else [],
-        "years": list(set(years)) if years else [],
-        "average_relevance": sum(relevances) / len(relevances) if relevances else 0,
-        "max_relevance": max(relevances) if relevances else 0,
-        "min_relevance": min(relevances) if relevances else 0,
-        "unique_temas": unique_temas,
-        "tema_count": len(unique_temas),
-        "most_relevant_content": {
-            "content": most_relevant.get("content", "")[:500] + "..." if most_relevant and most_relevant.get("content") else "",
-            "relevance": most_relevant.get("relevance") if most_relevant else 0,
-            "tema_subtema": most_relevant.get("tema_subtema_raw") if most_relevant else ""
-        } if most_relevant else None
-    }
-    
-    return summary
+    index = current_index()
+    timeout = upstream_timeout()
+    key = ("get_providence_summary", index, providence)
+    try:
+        summary = search_cache.get_or_compute(
+            key, lambda: search_flight.do(key, lambda: _summary(index, providence, timeout), wait_timeout=timeout))
+    except Exception as e:
+        print(f"Azure Search Error: Error summarizing providence '{providence}': {e}")
+        return {"providence": providence, "found": False, "error": str(e)}
+    if summary is None:
+        return {"providence": providence, "found": False, "error": "No documents found"}
+    return dict(summary)
+
+
+def _summary(index: str, providence: str, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Stored record by key; aggregate the chunks when the index has no summary for it"""
+    from azure.core.exceptions import ResourceNotFoundError
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    try:
+        with span("azure_search.get_document", index=_summary_index_name(index)), \
+                observe(UPSTREAM_LATENCY, provider="azure_search"):
+            record = make_search_client(_summary_index_name(index)).get_document(
+                summary_key(providence), selected_fields=FIELDS, **kwargs)
+        return to_summary(record)
+    except ResourceNotFoundError:
+        # Missing record, or an index built before summaries existed
+        pass
+    summary = summarize(providence, _chunks(index, providence, kwargs))
+    return to_summary(summary) if summary else None
+
+
+def _chunks(index: str, providence: str, kwargs: Dict[str, Any]):
+    """Every chunk of the providence, page by page: no `top`, so the SDK follows the continuation links"""
+    filter_str = f"title eq '{providence}'"
+    with span("azure_search.search", filter=filter_str), observe(UPSTREAM_LATENCY, provider="azure_search"):
+        results = make_search_client(index).search(
+            search_text="*", filter=filter_str,
+            select=["content", "source", "date", "year", "relevance", "tema_subtema_raw", "temas"], **kwargs)
+        for page in results.by_page():
+            yield from page
 
 
 @tool("list_providences", return_direct=False)
@@ -178,11 +199,16 @@ def list_providences(limit: int = 50,
         
         if filter_str:
             search_params["filter"] = filter_str
+
+        timeout = upstream_timeout()
+        if timeout is not None:
+            search_params["timeout"] = timeout
             
-        results = client.search(**search_params)
+        with span("azure_search.facets", filter=filter_str), observe(UPSTREAM_LATENCY, provider="azure_search"):
+            results = client.search(**search_params)
+            facets = results.get_facets()
         
         providences = []
-        facets = results.get_facets()
         
         if "title" in facets:
             for facet in facets["title"][:limit]:
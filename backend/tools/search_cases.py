@@ -1,18 +1,59 @@
 from typing import Optional, List, Dict, Any
-from langchain.tools import tool
+from langchain_core.tools import tool
+from azure.core.exceptions import HttpResponseError
 from providers.bot_search_client import make_search_client
-import google.genai as genai
+from providers.index_version import current_index
+from providers.gemini_provider import get_gemini_client, embed_limiter
+from providers.rate_limiter import estimate_tokens, INTERACTIVE
+from providers.singleflight import embedding_flight, search_flight
+from providers.cache import embedding_cache, search_cache
+from graph.budget import upstream_timeout
+from observability.metrics import observe, UPSTREAM_LATENCY
+from observability.tracing import span
+from tools.postprocess import postprocess, normalized
 from config import settings
 
+# Indexes whose content_vector cannot be selected (built with VECTOR_STORED=false)
+_unretrievable_vectors = set()
+
 def _embed_query(text: str) -> List[float]:
-    # Create client with API key
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    
-    # Use the genai client for embeddings with correct API
-    result = client.models.embed_content(
-        model=settings.GEMINI_EMBED_MODEL,
-        contents=text
-    )
+    key = (settings.GEMINI_EMBED_MODEL, settings.EMBED_DIM, text)
+    # Concurrent requests for the same text share one upstream embedding call
+    return embedding_cache.get_or_compute(
+        key, lambda: embedding_flight.do(key, lambda: _embed_query_upstream(text),
+                                         wait_timeout=upstream_timeout()))
+
+def _embed_config(timeout: Optional[float]):
+    # Same dimensionality as the indexed vectors (indexacion ingest_excel._embed_config)
+    if settings.PROVIDER_MODE in ("fake", "replay"):
+        # The fakes only read the attribute; skips the slow google.genai.types import
+        from types import SimpleNamespace
+        return SimpleNamespace(output_dimensionality=int(settings.EMBED_DIM))
+    from google.genai import types
+    config = types.EmbedContentConfig(output_dimensionality=int(settings.EMBED_DIM))
+    if timeout is not None:
+        # Inherit the remaining request time (HttpOptions timeout is in milliseconds)
+        config.http_options = types.HttpOptions(timeout=int(timeout * 1000))
+    return config
+
+def _embed_query_upstream(text: str) -> List[float]:
+    # Shared client: avoids a new TLS handshake per query
+    client = get_gemini_client()
+
+    timeout = upstream_timeout()
+    config = _embed_config(timeout)
+
+    # Use the genai client for embeddings with correct API (live queries get priority over ingestion)
+    with span("gemini.embed", model=settings.GEMINI_EMBED_MODEL, chars=len(text)), \
+            observe(UPSTREAM_LATENCY, provider="gemini_embed"):
+        result = embed_limiter().call(
+            lambda: client.models.embed_content(
+                model=settings.GEMINI_EMBED_MODEL,
+                contents=text,
+                config=config
+            ),
+            tokens=estimate_tokens(text), priority=INTERACTIVE, max_wait=timeout
+        )
     return result.embeddings[0].values
 
 @tool("search_cases", return_direct=False)
@@ -24,9 +65,8 @@ def search_cases(query: str,
       query: texto de la consulta
       top_k: número de resultados
       filters: dict OData simple, e.g., {"providencia":"CO","year":2024}
+    Los fragmentos contiguos de una misma providencia llegan unidos (sus ids en "chunks").
     """
-    client = make_search_client()
-    vec = _embed_query(query)
     filter_str = None
     if filters:
         parts = []
@@ -39,13 +79,41 @@ def search_cases(query: str,
                 parts.append(f"{k} eq {v}")
         filter_str = " and ".join(parts)
 
+    # Identical searches in flight at the same time share one upstream request;
+    # the index version in the key keeps results from before a reindex apart
+    index = current_index()
+    key = ("search_cases", index, query, top_k, filter_str, settings.USE_SEMANTIC_RANKER)
+    out = search_cache.get_or_compute(
+        key, lambda: search_flight.do(key, lambda: _hybrid_search(query, top_k, filter_str, index),
+                                      wait_timeout=upstream_timeout()))
+    # Each caller gets its own copies of the shared result
+    return [dict(d) for d in out]
+
+def _hybrid_search(query: str, top_k: int, filter_str: Optional[str],
+                   index: Optional[str] = None) -> List[Dict[str, Any]]:
+    client = make_search_client(index)
+    vec = _embed_query(query)
+    # Extra candidates for merging adjacent chunks and MMR, which cut back to top_k
+    fetch = top_k * settings.SEARCH_CANDIDATE_FACTOR if settings.SEARCH_POSTPROCESS else top_k
+    select = ["id", "title", "content", "source", "date"]
+    if settings.SEARCH_POSTPROCESS and settings.SEARCH_MMR_VECTORS and index not in _unretrievable_vectors:
+        select.append("content_vector")
+    vector_query = {"vector": vec, "fields": "content_vector", "k": fetch, "kind": "vector"}
+    if settings.VECTOR_QUERY_OVERSAMPLING:
+        # Only valid on a compressed vector field (indexacion VECTOR_COMPRESSION)
+        vector_query["oversampling"] = settings.VECTOR_QUERY_OVERSAMPLING
     kwargs = {
-        "top": top_k,
+        "top": fetch,
         "search_text": query,
-        "vector_queries": [{"vector": vec, "fields": "content_vector", "k": top_k, "kind": "vector"}],
-        "filter": filter_str
+        "vector_queries": [vector_query],
+        "filter": filter_str,
+        "select": select
     }
 
+    timeout = upstream_timeout()
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
     if settings.USE_SEMANTIC_RANKER:
         kwargs.update({
             "query_type": "semantic",
@@ -53,15 +121,42 @@ def search_cases(query: str,
             "query_language": "es",  # Spanish language
         })
 
-    results = client.search(**kwargs)
-    out = []
-    for r in results:
-        out.append({
-            "id": str(r["id"]),
-            "score": float(r["@search.score"]),
-            "title": r.get("title"),
-            "content": r.get("content"),
-            "source": r.get("source"),
-            "date": r.get("date"),
-        })
+    try:
+        out = _read_results(client, kwargs)
+    except HttpResponseError as e:
+        # Any other 400 (e.g. a malformed filter) is the caller's error: raise it and remember nothing
+        if "content_vector" not in kwargs["select"] or not _vectors_not_retrievable(e):
+            raise
+        # The index does not return its vectors: MMR falls back to word overlap from now on
+        _unretrievable_vectors.add(index)
+        kwargs["select"] = [f for f in kwargs["select"] if f != "content_vector"]
+        out = _read_results(client, kwargs)
+    if settings.SEARCH_POSTPROCESS:
+        return postprocess(out, top_k, settings.SEARCH_MMR_LAMBDA)
+    return [{k: v for k, v in d.items() if k != "_vector"} for d in out]
+
+def _vectors_not_retrievable(error: HttpResponseError) -> bool:
+    # Azure rejects a hidden field in $select with a 400 naming the field:
+    # "The field 'content_vector' in the select list is not retrievable" or
+    # "Could not find a property named 'content_vector' ... Parameter name: $select"
+    message = str(error.message or error)
+    return error.status_code == 400 and "content_vector" in message and (
+        "retrievable" in message or "select" in message.lower())
+
+def _read_results(client, kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Results are paged lazily, so the timing covers iteration as well
+    with span("azure_search.search", top=kwargs["top"], filter=kwargs["filter"], semantic=settings.USE_SEMANTIC_RANKER), \
+            observe(UPSTREAM_LATENCY, provider="azure_search"):
+        results = client.search(**kwargs)
+        out = []
+        for r in results:
+            out.append({
+                "id": str(r["id"]),
+                "score": float(r["@search.score"]),
+                "title": r.get("title"),
+                "content": r.get("content"),
+                "source": r.get("source"),
+                "date": r.get("date"),
+                "_vector": normalized(r["content_vector"]) if r.get("content_vector") else None,
+            })
     return out
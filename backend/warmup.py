@@ -0,0 +1,43 @@
+import logging
+import time
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def warm_up() -> dict:
+    """
+    Pre-build the compiled graph and pre-open the Gemini and Azure Search
+    connections so the first real request does not pay for them.
+    Failures are logged and never block startup.
+    """
+    timings = {}
+
+    def _step(name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.warning("Warm-up step '%s' failed: %s", name, e)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    from graph.agent_graph import get_graph, _model
+    from providers.gemini_provider import get_gemini_client
+    from providers.bot_search_client import make_search_client
+
+    _step("graph", get_graph)
+    _step("chat_model", _model)
+    # Cheap metadata calls that force the TLS handshake on the shared clients
+    _step("gemini", lambda: get_gemini_client().models.get(model=settings.GEMINI_EMBED_MODEL))
+    _step("search", lambda: make_search_client().get_document_count())
+
+    # Load the /suggest trie now instead of on the first keystroke
+    from providers.index_version import current_index
+    from providers.suggestions import suggester
+    _step("suggest", lambda: suggester.load(current_index()))
+
+    if settings.WARMUP_QUERY:
+        from tools.search_cases import search_cases
+        _step("dry_run", lambda: search_cases.invoke({"query": settings.WARMUP_QUERY, "top_k": 1}))
+
+    logger.info("Warm-up finished (ms): %s", timings)
+    return timings
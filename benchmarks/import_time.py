@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold-start report for the backend, based on `python -X importtime`.
+
+Runs a fresh interpreter that imports `main` (and optionally builds the graph),
+parses the importtime trace and prints the slowest top-level imports.
+Exits with status 1 when the measured startup exceeds --target-ms, so it can
+guard autoscaling cold starts in CI.
+
+Usage:
+    python benchmarks/import_time.py --target-ms 1500
+    python benchmarks/import_time.py --with-graph --json report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def run_importtime(with_graph: bool) -> tuple[list[dict], float]:
+    code = "import main"
+    if with_graph:
+        code += "; main.get_graph()"
+    env = dict(os.environ, WARMUP_ENABLED="false")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"Import failed with exit code {proc.returncode}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_part, cumulative_part, raw_name = line.split(":", 1)[1].split("|", 2)
+        self_us, cumulative_us = int(self_part), int(cumulative_part)
+        depth = (len(raw_name) - len(raw_name.lstrip())) // 2
+        entries.append({
+            "module": raw_name.strip(),
+            "self_ms": self_us / 1000,
+            "cumulative_ms": cumulative_us / 1000,
+            "depth": depth,
+        })
+    return entries, wall_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend cold-start import report")
+    parser.add_argument("--target-ms", type=float, default=float(os.getenv("STARTUP_TARGET_MS", 0)),
+                        help="Fail if total startup (wall clock) exceeds this value")
+    parser.add_argument("--top", type=int, default=20, help="Number of slow imports to show")
+    parser.add_argument("--with-graph", action="store_true", help="Also build the compiled graph")
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    entries, wall_ms = run_importtime(args.with_graph)
+    # Depth 0: imported by the interpreter (site, `main`); depth 1: imported directly by those
+    top_level = [e for e in entries if e["depth"] <= 1]
+    slowest = sorted(top_level, key=lambda e: e["cumulative_ms"], reverse=True)[:args.top]
+    # Depth 1 times are already part of their depth-0 parent's cumulative time
+    imports_ms = sum(e["cumulative_ms"] for e in entries if e["depth"] == 0)
+
+    print(f"Startup wall time: {wall_ms:.0f} ms (imports: {imports_ms:.0f} ms, {len(entries)} modules)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for e in slowest:
+        print(f"{e['cumulative_ms']:>14.1f} {e['self_ms']:>9.1f}  {e['module']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"wall_ms": wall_ms, "imports_ms": imports_ms,
+                       "with_graph": args.with_graph, "modules": entries}, f, indent=2)
+
+    if args.target_ms and wall_ms > args.target_ms:
+        print(f"Startup {wall_ms:.0f} ms exceeds target {args.target_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Ingestion micro-benchmarks on synthetic legal workbooks.
+
+For each corpus size a fresh subprocess loads the workbook (parsing it,
+then again from the Arrow workbook cache), chunks the text, runs
+prepare_docs_legal, collapses near-duplicate chunks and uploads through
+the fake embedding and search backends (PROVIDER_MODE=fake, no rate
+limits). It records wall time
+and peak RSS per stage. Results are written as JSON; pass --compare with a
+previous result file to spot regressions between commits.
+
+Usage:
+    python benchmarks/ingest_bench.py --sizes 1000 10000 100000 --out bench_ingest.json
+    python benchmarks/ingest_bench.py --sizes 1000 --compare bench_ingest.json
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+INDEXACION_DIR = ROOT / "indexacion"
+DEFAULT_CACHE_DIR = ROOT / "benchmarks" / ".data"
+
+
+class RssSampler:
+    """Samples the process RSS in a background thread to find the peak of a stage"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # Lifetime peak (kilobytes on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current_rss())
+
+
+def timed(stages: dict, name: str, fn, *args, **kwargs):
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        # upload_docs prints one line per batch
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    stages[name] = {"seconds": round(elapsed, 4), "peak_rss_mb": round(rss.peak / 2**20, 1)}
+    return result
+
+
+def run_size(rows: int, seed: int, cache_dir: Path, upload_limit: int | None) -> dict:
+    """Benchmark one corpus size (runs inside a dedicated subprocess)"""
+    os.environ["PROVIDER_MODE"] = "fake"
+    # Measure our own overhead, not the client-side quota
+    os.environ.setdefault("GEMINI_INGEST_RPM", "1e12")
+    os.environ.setdefault("GEMINI_INGEST_TPM", "1e15")
+    os.environ.setdefault("GEMINI_INGEST_CONCURRENCY", "64")
+    # Empty parsed-workbook cache: load_excel parses and converts, load_cached reads the Arrow file
+    os.environ["WORKBOOK_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_workbook_cache_")
+    atexit.register(shutil.rmtree, os.environ["WORKBOOK_CACHE_DIR"], True)
+    sys.path.insert(0, str(INDEXACION_DIR))
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import ingest_excel
+    from near_duplicates import deduplicate
+    from synthetic_workbook import write_workbook
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f"sentencias_{rows}_{seed}.xlsx"
+    if not path.exists():
+        write_workbook(str(path), rows, seed)
+
+    stages = {}
+    df = timed(stages, "load_excel", ingest_excel.load_excel, str(path))
+    df = timed(stages, "load_cached", ingest_excel.load_excel, str(path))
+    texts = [f"Resuelve: {r} Síntesis: {s}" for r, s in zip(df["resuelve"].astype(str), df["sintesis"].astype(str))]
+    chunks = timed(stages, "chunk", lambda: [c for t in texts for c in ingest_excel.chunk(t)])
+    docs = timed(stages, "prepare_docs_legal", ingest_excel.prepare_docs_legal, df)
+    kept, dedupe_stats = timed(stages, "dedupe", deduplicate, docs)
+    upload = kept if upload_limit is None else kept[:upload_limit]
+    timed(stages, "upload_docs", ingest_excel.upload_docs, upload)
+
+    for name, count in (("load_excel", rows), ("load_cached", rows), ("chunk", len(chunks)),
+                        ("prepare_docs_legal", rows), ("dedupe", len(docs)), ("upload_docs", len(upload))):
+        seconds = stages[name]["seconds"]
+        stages[name]["items_per_s"] = round(count / seconds, 1) if seconds else None
+
+    return {
+        "rows": rows,
+        "chunks": len(docs),
+        "near_duplicates": dedupe_stats["duplicates"],
+        "dedupe_reduction": dedupe_stats["reduction"],
+        "uploaded": len(upload),
+        "workbook_mb": round(path.stat().st_size / 2**20, 2),
+        "stages": stages,
+        "peak_rss_mb": max(s["peak_rss_mb"] for s in stages.values()),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float):
+    print(f"\nComparison with baseline ({baseline.get('commit')}):")
+    old_by_rows = {r["rows"]: r for r in baseline.get("results", [])}
+    regressions = 0
+    for result in current["results"]:
+        old = old_by_rows.get(result["rows"])
+        if not old:
+            continue
+        for stage, values in result["stages"].items():
+            before = old["stages"].get(stage, {}).get("seconds")
+            if not before:
+                continue
+            delta = (values["seconds"] - before) / before * 100
+            flag = "  <-- regression" if delta > threshold else ""
+            regressions += bool(flag)
+            print(f"  {result['rows']:>7} rows  {stage:<20} {before:>9.3f}s -> {values['seconds']:>9.3f}s ({delta:+.1f}%){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion stage benchmarks on synthetic workbooks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Where generated workbooks are kept")
+    parser.add_argument("--upload-limit", type=int, help="Upload at most this many chunks per size")
+    parser.add_argument("--out", default="bench_ingest.json")
+    parser.add_argument("--compare", help="Previous result file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_size(args.single, args.seed, Path(args.cache_dir), args.upload_limit)))
+        return
+
+    results = []
+    for rows in args.sizes:
+        cmd = [sys.executable, __file__, "--single", str(rows), "--seed", str(args.seed),
+               "--cache-dir", args.cache_dir]
+        if args.upload_limit:
+            cmd += ["--upload-limit", str(args.upload_limit)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:], file=sys.stderr)
+            raise SystemExit(f"Benchmark for {rows} rows failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        stages = ", ".join(f"{k} {v['seconds']:.2f}s" for k, v in result["stages"].items())
+        print(f"{rows:>7} rows -> {result['chunks']} chunks ({result['dedupe_reduction']:.1%} near-duplicates) | "
+              f"{stages} | peak {result['peak_rss_mb']} MB")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            if compare(report, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for /chat and /api/messages.
+
+Virtual users send questions at increasing concurrency levels. In bot mode
+every user owns a conversation and posts Bot Framework activities whose
+serviceUrl points at a local mock connector. The end-to-end latency is
+measured until send_response_to_emulator's reply reaches that connector.
+Each level reports throughput, latency percentiles, and error and timeout
+rates.
+
+The target can be an already running server (--url) or a gunicorn instance
+started with gunicorn.conf.py (--spawn), using the fake providers by default
+so only our own stack is measured.
+
+Usage:
+    python benchmarks/load_test.py --spawn --mode bot --levels 1 4 16 32 --duration 20
+    python benchmarks/load_test.py --url http://localhost:8000 --mode chat --levels 8
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_QUESTIONS = [
+    "¿Qué casos hay sobre acoso escolar en redes sociales?",
+    "Resume la providencia T-105/2019",
+    "¿Qué dijo la corte sobre estabilidad laboral reforzada?",
+    "Casos de tutela por derecho a la educación de menores con discapacidad",
+    "¿Hay sentencias sobre habeas data y centrales de riesgo?",
+    "¿Qué es el PIAR y cuándo se exige?",
+]
+
+
+class MockConnector:
+    """Minimal Bot Connector: records replies posted to /v3/conversations/{id}/activities"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.waiters: dict[str, asyncio.Future] = {}
+        self.unexpected = 0
+        self.app = FastAPI()
+
+        @self.app.post("/v3/conversations/{conversation_id}/activities")
+        async def activities(conversation_id: str, request: Request):
+            activity = await request.json()
+            waiter = self.waiters.pop(conversation_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result((time.perf_counter(), activity))
+            else:
+                self.unexpected += 1
+            return {"id": str(uuid.uuid4())}
+
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+
+    def expect(self, conversation_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[conversation_id] = future
+        return future
+
+    async def start(self):
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        self.server.should_exit = True
+        await self.task
+
+
+def activity(text: str, conversation_id: str, user_id: str, service_url: str) -> dict:
+    return {
+        "type": "message",
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "serviceUrl": service_url,
+        "channelId": "emulator",
+        "from": {"id": user_id, "name": f"Usuario {user_id[-4:]}", "role": "user"},
+        "conversation": {"id": conversation_id},
+        "recipient": {"id": "bot", "name": "Legal Bot", "role": "bot"},
+        "textFormat": "plain",
+        "locale": "es-CO",
+        "text": text,
+        "channelData": {"clientActivityID": str(uuid.uuid4())},
+    }
+
+
+async def virtual_user(n: int, args, client: httpx.AsyncClient, connector: MockConnector | None,
+                       questions: list[str], stop_at: float, samples: list[dict]):
+    rng = random.Random(n)
+    conversation_id = f"load-{n}-{uuid.uuid4().hex[:8]}"
+    user_id = f"user-{n:04d}"
+    while time.perf_counter() < stop_at:
+        text = rng.choice(questions)
+        sample = {"ok": False, "timeout": False}
+        start = time.perf_counter()
+        try:
+            if args.mode == "chat":
+                resp = await client.post(f"{args.url}/chat", json={"message": text}, timeout=args.timeout)
+                sample["ok"] = resp.status_code == 200 and "error" not in resp.text[:50]
+                sample["latency_ms"] = (time.perf_counter() - start) * 1000
+            else:
+                reply = connector.expect(conversation_id)
+                resp = await client.post(f"{args.url}/api/messages",
+                                         json=activity(text, conversation_id, user_id, connector.url),
+                                         timeout=args.timeout)
+                sample["ack_ms"] = (time.perf_counter() - start) * 1000
+                if resp.status_code not in (200, 201, 202):
+                    connector.waiters.pop(conversation_id, None)
+                else:
+                    remaining = args.timeout - (time.perf_counter() - start)
+                    received_at, _ = await asyncio.wait_for(reply, timeout=max(remaining, 0.01))
+                    sample["ok"] = True
+                    sample["latency_ms"] = (received_at - start) * 1000
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            sample["timeout"] = True
+            if connector:
+                connector.waiters.pop(conversation_id, None)
+        except httpx.HTTPError as e:
+            sample["error"] = type(e).__name__
+        samples.append(sample)
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100)))]
+
+
+def report(level: int, samples: list[dict], elapsed: float) -> dict:
+    latencies = [s["latency_ms"] for s in samples if s["ok"]]
+    total = len(samples) or 1
+    return {
+        "concurrency": level,
+        "requests": len(samples),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {"p50": round(percentile(latencies, 50), 1), "p95": round(percentile(latencies, 95), 1),
+                       "p99": round(percentile(latencies, 99), 1),
+                       "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0},
+        "error_rate": round(sum(1 for s in samples if not s["ok"] and not s["timeout"]) / total, 4),
+        "timeout_rate": round(sum(1 for s in samples if s["timeout"]) / total, 4),
+    }
+
+
+def spawn_gunicorn(args) -> subprocess.Popen:
+    env = dict(os.environ, PROVIDER_MODE=args.providers)
+    cmd = [sys.executable, "-m", "gunicorn", "-c", str(ROOT / "gunicorn.conf.py"),
+           "--chdir", str(ROOT / "backend"), "main:app"]
+    proc = subprocess.Popen(cmd, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{args.url}/healthz", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit("gunicorn did not become healthy within 60 s")
+
+
+async def run(args):
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [json.loads(line).get("message") for line in f if line.strip()]
+
+    connector = None
+    if args.mode == "bot":
+        connector = MockConnector(args.connector_port)
+        await connector.start()
+
+    results = []
+    limits = httpx.Limits(max_connections=max(args.levels) * 2)
+    async with httpx.AsyncClient(limits=limits) as client:
+        counter = itertools.count()
+        for level in args.levels:
+            samples: list[dict] = []
+            start = time.perf_counter()
+            stop_at = start + args.duration
+            await asyncio.gather(*(virtual_user(next(counter), args, client, connector, questions, stop_at, samples)
+                                   for _ in range(level)))
+            result = report(level, samples, time.perf_counter() - start)
+            results.append(result)
+            lat = result["latency_ms"]
+            print(f"c={level:<4} req={result['requests']:<6} {result['throughput_rps']:>8.2f} rps  "
+                  f"p50={lat['p50']:>8.1f}  p95={lat['p95']:>8.1f}  p99={lat['p99']:>8.1f} ms  "
+                  f"err={result['error_rate']:.1%}  timeout={result['timeout_rate']:.1%}")
+
+    if connector:
+        if connector.unexpected:
+            print(f"Connector received {connector.unexpected} unmatched replies (late or duplicated)")
+        await connector.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /chat and /api/messages")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mode", choices=["chat", "bot"], default="bot")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request end-to-end timeout")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between user messages (s)")
+    parser.add_argument("--questions", help="JSONL file with {\"message\": ...} lines")
+    parser.add_argument("--connector-port", type=int, default=3979)
+    parser.add_argument("--spawn", action="store_true", help="Start gunicorn with gunicorn.conf.py")
+    parser.add_argument("--providers", default="fake", help="PROVIDER_MODE for the spawned server")
+    parser.add_argument("--out", help="Write the per-level results as JSON")
+    args = parser.parse_args()
+
+    server = spawn_gunicorn(args) if args.spawn else None
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "url": args.url, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
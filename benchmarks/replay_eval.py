@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Offline replay / evaluation of a JSONL question set through build_graph().
+
+Each input line is a JSON object with the question in "message" (or
+"question", "text", "body") and optional "id", "top_k" and "filters".
+Questions run with N concurrent workers against the live providers or the
+deterministic fakes (--providers fake). The tool writes one JSON line per
+question (latency, LLM rounds, tool calls, tokens, cache hits) plus a summary
+with p50/p95/p99, and can diff the summary against a previous run.
+
+Usage:
+    python benchmarks/replay_eval.py questions.jsonl --providers fake -c 8 --out run.jsonl
+    python benchmarks/replay_eval.py questions.jsonl --baseline baseline.summary.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def load_questions(path: str) -> list[dict]:
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            text = next((item[k] for k in ("message", "question", "text", "body") if item.get(k)), None)
+            if not text:
+                print(f"Skipping line {n}: no question text", file=sys.stderr)
+                continue
+            questions.append({
+                "id": item.get("id") or item.get("request_id") or str(n),
+                "message": text,
+                "top_k": item.get("top_k", 6),
+                "filters": item.get("filters"),
+            })
+    return questions
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = int(rank), min(int(rank) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_question(graph, question: dict) -> dict:
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    from graph.budget import new_budget
+    from prompts import SYSTEM_PROMPT
+    from providers.cache import request_cache_scope
+
+    state = {
+        "messages": [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=question["message"])],
+        "top_k": question["top_k"],
+        "filters": question["filters"],
+        **new_budget(),
+    }
+    error = None
+    start = time.perf_counter()
+    with request_cache_scope() as cache_counters:
+        try:
+            result = graph.invoke(state)
+        except Exception as e:
+            result, error = {"messages": state["messages"]}, str(e)
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    new_messages = result["messages"][len(state["messages"]):]
+    ai_messages = [m for m in new_messages if isinstance(m, AIMessage)]
+    tokens = {"input": 0, "output": 0, "total": 0}
+    for m in ai_messages:
+        usage = getattr(m, "usage_metadata", None) or {}
+        tokens["input"] += usage.get("input_tokens", 0)
+        tokens["output"] += usage.get("output_tokens", 0)
+        tokens["total"] += usage.get("total_tokens", 0)
+
+    final = result["messages"][-1]
+    return {
+        "id": question["id"],
+        "message": question["message"],
+        "latency_ms": round(latency_ms, 1),
+        "llm_rounds": len([m for m in ai_messages if getattr(m, "usage_metadata", None) or m.tool_calls]),
+        "tool_calls": sum(len(m.tool_calls) for m in ai_messages),
+        "tokens": tokens,
+        "cache": cache_counters,
+        "answer_chars": len(str(getattr(final, "content", ""))),
+        "error": error,
+    }
+
+
+def summarize(results: list[dict], wall_s: float) -> dict:
+    latencies = [r["latency_ms"] for r in results]
+    hits = {}
+    for r in results:
+        for name, c in r["cache"].items():
+            agg = hits.setdefault(name, {"hits": 0, "misses": 0})
+            agg["hits"] += c["hits"]
+            agg["misses"] += c["misses"]
+    return {
+        "questions": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "wall_s": round(wall_s, 2),
+        "throughput_qps": round(len(results) / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+        },
+        "llm_rounds_mean": round(statistics.fmean(r["llm_rounds"] for r in results), 2) if results else 0.0,
+        "tool_calls_mean": round(statistics.fmean(r["tool_calls"] for r in results), 2) if results else 0.0,
+        "tokens_total": sum(r["tokens"]["total"] for r in results),
+        "cache_hit_ratio": {
+            name: round(c["hits"] / (c["hits"] + c["misses"]), 4) if c["hits"] + c["misses"] else 0.0
+            for name, c in hits.items()
+        },
+    }
+
+
+def compare(summary: dict, baseline: dict):
+    print("\nComparison with baseline:")
+    rows = [("p50 ms", ("latency_ms", "p50")), ("p95 ms", ("latency_ms", "p95")),
+            ("p99 ms", ("latency_ms", "p99")), ("throughput qps", ("throughput_qps",)),
+            ("llm rounds", ("llm_rounds_mean",)), ("tool calls", ("tool_calls_mean",)),
+            ("tokens", ("tokens_total",))]
+    for label, path in rows:
+        new, old = summary, baseline
+        for key in path:
+            new, old = new.get(key, 0), old.get(key, 0)
+        delta = (new - old) / old * 100 if old else 0.0
+        print(f"  {label:<16} {old:>10} -> {new:>10} ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a JSONL question set through the agent graph")
+    parser.add_argument("questions", help="JSONL file with one question per line")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Concurrent workers")
+    parser.add_argument("--providers", choices=["live", "fake", "record", "replay"],
+                        default=os.getenv("PROVIDER_MODE", "live"), help="Upstream providers to use")
+    parser.add_argument("--limit", type=int, help="Only replay the first N questions")
+    parser.add_argument("--out", help="Write per-question results (JSONL); the summary goes to <out>.summary.json")
+    parser.add_argument("--baseline", help="Summary JSON of a previous run to compare against")
+    args = parser.parse_args()
+
+    # Must be set before the backend settings are imported
+    os.environ["PROVIDER_MODE"] = args.providers
+    os.environ.setdefault("WARMUP_ENABLED", "false")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from graph.agent_graph import build_graph
+
+    questions = load_questions(args.questions)[:args.limit]
+    graph = build_graph()
+    print(f"Replaying {len(questions)} questions with {args.concurrency} workers ({args.providers} providers)")
+
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_question, graph, q) for q in questions]
+        for future in as_completed(futures):
+            results.append(future.result())
+    wall_s = time.perf_counter() - start
+
+    summary = summarize(results, wall_s)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for r in sorted(results, key=lambda r: str(r["id"])):
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        with open(f"{args.out}.summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(summary, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
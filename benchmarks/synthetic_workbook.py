@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Synthetic legal workbook generator.
+
+Produces Excel files with the columns expected by
+indexacion.ingest_excel.prepare_docs_legal: Relevancia, Providencia, Tipo,
+Fecha Sentencia, Tema - subtema, resuelve, sintesis. Text lengths and the
+repeated "Resuelve" boilerplate roughly follow the real corpus, so chunking
+and deduplication behave realistically. Output is deterministic per seed.
+
+Usage:
+    python benchmarks/synthetic_workbook.py --rows 10000 --out sentencias_10k.xlsx
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+COLUMNS = ["Relevancia", "Providencia", "Tipo", "Fecha Sentencia", "Tema - subtema", "resuelve", "sintesis"]
+
+_TIPOS = ["Tutela", "Constitucionalidad", "Unificación", "Auto"]
+_PREFIX = {"Tutela": "T", "Constitucionalidad": "C", "Unificación": "SU", "Auto": "A"}
+_TEMAS = [
+    "Derecho a la educación", "Acoso escolar", "Redes sociales", "Derecho a la salud",
+    "Estabilidad laboral reforzada", "Debido proceso", "Habeas data", "Derecho a la vivienda",
+    "Servicios públicos", "Ajustes razonables", "PIAR", "Consulta previa", "Víctimas del conflicto",
+    "Pensión de invalidez", "Mínimo vital", "Igualdad", "Libre desarrollo de la personalidad",
+]
+_WORDS = (
+    "accionante entidad accionada derecho fundamental vulneración amparo juez primera instancia "
+    "segunda instancia impugnación fallo sentencia corte constitucional sala revisión menor de edad "
+    "institución educativa rector docente padres familia estudiante discapacidad acompañamiento "
+    "protocolo convivencia escolar manual comité ruta atención integral plataforma publicación "
+    "contenido mensaje agresión hostigamiento intimidación salud mental psicológico medidas "
+    "protección garantía reparación improcedencia carencia actual de objeto hecho superado"
+).split()
+_RESUELVE_BOILERPLATE = [
+    "PRIMERO.- REVOCAR la sentencia proferida en primera instancia y, en su lugar, CONCEDER el amparo de los derechos fundamentales invocados.",
+    "SEGUNDO.- ORDENAR a la entidad accionada que, dentro de las cuarenta y ocho (48) horas siguientes a la notificación de esta providencia, adopte las medidas necesarias.",
+    "TERCERO.- Por Secretaría General, LÍBRENSE las comunicaciones previstas en el artículo 36 del Decreto 2591 de 1991.",
+    "PRIMERO.- CONFIRMAR la sentencia de segunda instancia que declaró la carencia actual de objeto por hecho superado.",
+    "SEGUNDO.- PREVENIR a la institución educativa para que en lo sucesivo se abstenga de incurrir en conductas como las que dieron origen a esta acción.",
+]
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def generate_dataframe(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    start = datetime(2010, 1, 1)
+    records = []
+    for i in range(rows):
+        tipo = rng.choice(_TIPOS)
+        fecha = start + timedelta(days=rng.randrange(15 * 365))
+        temas = rng.sample(_TEMAS, rng.randint(1, 3))
+        resuelve = " ".join(rng.sample(_RESUELVE_BOILERPLATE, rng.randint(2, 4)))
+        if rng.random() < 0.6:
+            resuelve += " " + _text(rng, 20, 120)
+        records.append({
+            "Relevancia": rng.randint(1, 5) if rng.random() > 0.02 else None,
+            "Providencia": f"{_PREFIX[tipo]}-{i % 1000 + 1:03d}/{fecha.year}",
+            "Tipo": tipo,
+            "Fecha Sentencia": fecha,
+            "Tema - subtema": f"{temas[0]} - " + ", ".join(temas[1:] or [rng.choice(_TEMAS)]),
+            "resuelve": resuelve,
+            "sintesis": _text(rng, 60, 420),
+        })
+    return pd.DataFrame.from_records(records, columns=COLUMNS)
+
+
+def write_workbook(path: str, rows: int, seed: int = 0) -> str:
+    generate_dataframe(rows, seed).to_excel(path, index=False, engine="openpyxl")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic legal workbook")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Output .xlsx path (default: sentencias_<rows>.xlsx)")
+    args = parser.parse_args()
+    path = write_workbook(args.out or f"sentencias_{args.rows}.xlsx", args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
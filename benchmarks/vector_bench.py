@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Recall@k and latency of compact vector settings against the current setup.
+
+Offline (default): embeds the chunks of a synthetic workbook at full size
+(EMBED_DIM) and a set of queries, then simulates every combination of
+output dimensionality (Matryoshka truncation, what output_dimensionality
+does upstream), storage type (float32, float16, int8 scalar quantization,
+binary) and oversampling with rescoring against the full-precision vectors
+of the same dimensionality. Recall@k is measured against exact float32
+search at full size; latency is brute-force numpy scoring, a relative proxy
+for the index cost, not Azure's HNSW latency. Bytes per vector and the
+JSON upload size per vector are reported too.
+
+Live (--live): the same queries against real index versions built with
+different settings (e.g. with blue_green.py build --no-promote). The first
+index is the baseline and is queried exhaustively for the ground truth.
+
+With --providers fake the embeddings are pseudo-random, so recall numbers
+only exercise the tool; use live embeddings for decisions.
+
+Usage:
+    python benchmarks/vector_bench.py --providers fake --docs 2000
+    python benchmarks/vector_bench.py --providers live --dims 768 512 256 --oversampling 1 4 10
+    python benchmarks/vector_bench.py --providers live --live legal-index-v3:768 legal-index-v4:256:4
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+INDEXACION_DIR = ROOT / "indexacion"
+DEFAULT_CACHE_DIR = ROOT / "benchmarks" / ".data"
+BYTES_PER_COMPONENT = {"float32": 4, "float16": 2, "int8": 1, "binary": 1 / 8}
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def corpus(rows: int, docs: int, queries: int, seed: int, cache_dir: Path):
+    """Chunk texts of a synthetic workbook and query texts (a few leading words of random chunks)"""
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import ingest_excel
+    from synthetic_workbook import write_workbook
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f"sentencias_{rows}_{seed}.xlsx"
+    if not path.exists():
+        write_workbook(str(path), rows, seed)
+    texts = [d["content"] for d in ingest_excel.prepare_docs_legal(ingest_excel.load_excel(str(path)))][:docs]
+    rng = random.Random(seed)
+    query_texts = [" ".join(rng.choice(texts).split()[2:14]) for _ in range(queries)]
+    return texts, query_texts
+
+
+def embed_cached(texts: list, cache_dir: Path) -> np.ndarray:
+    """Full-size embeddings; cached on disk because live embedding costs quota"""
+    import ingest_excel
+    from embedder import settings
+    digest = hashlib.sha256("\n".join([settings.PROVIDER_MODE, settings.GEMINI_EMBED_MODEL,
+                                       str(settings.OUTPUT_DIM), *texts]).encode()).hexdigest()[:16]
+    path = cache_dir / f"vectors_{digest}.npy"
+    if path.exists():
+        return np.load(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectors = np.asarray(ingest_excel.embed(texts), dtype=np.float32)
+    np.save(path, vectors)
+    return vectors
+
+
+def quantize(x: np.ndarray, kind: str, lo=None, hi=None) -> np.ndarray:
+    if kind == "float32":
+        return x
+    if kind == "float16":
+        return x.astype(np.float16)
+    if kind == "int8":
+        # Per-dimension min/max of the corpus, as scalar quantization does
+        scale = np.where(hi > lo, (hi - lo) / 255.0, 1.0)
+        return (np.clip(np.round((x - lo) / scale), 0, 255) - 128).astype(np.int8)
+    if kind == "binary":
+        return np.packbits(x > 0, axis=-1)
+    raise ValueError(kind)
+
+
+def scores(q: np.ndarray, d: np.ndarray, kind: str) -> np.ndarray:
+    if kind == "binary":
+        # Negative Hamming distance
+        return -np.unpackbits(np.bitwise_xor(q[None, :], d), axis=-1).sum(axis=-1)
+    return d @ q.astype(np.float32)
+
+
+def run_offline(doc_vecs: np.ndarray, query_vecs: np.ndarray, dims: list, kinds: list,
+                oversampling: list, k: int) -> list:
+    truth = [set(np.argsort(-(doc_vecs @ q))[:k]) for q in normalize(query_vecs)]
+    results = []
+    for dim in dims:
+        docs_f = normalize(doc_vecs[:, :dim])
+        queries_f = normalize(query_vecs[:, :dim])
+        lo, hi = docs_f.min(axis=0), docs_f.max(axis=0)
+        json_bytes = statistics.mean(len(json.dumps([round(float(v), 8) for v in row])) for row in docs_f[:50])
+        for kind in kinds:
+            docs_q = quantize(docs_f, kind, lo, hi)
+            if kind != "binary":
+                # Score in float32 from the rounded values (numpy has no fast float16/int8 matmul)
+                docs_q = docs_q.astype(np.float32)
+            # Only the quantized (compressed) types are oversampled and rescored
+            for factor in oversampling if kind in ("int8", "binary") else [1]:
+                recalls, latencies = [], []
+                for q_f, gt in zip(queries_f, truth):
+                    start = time.perf_counter()
+                    s = scores(quantize(q_f[None, :], kind, lo, hi)[0], docs_q, kind)
+                    candidates = np.argpartition(-s, min(len(s) - 1, int(k * factor)))[:int(k * factor)]
+                    if factor > 1:
+                        # Rescore the oversampled candidates with the original vectors
+                        candidates = candidates[np.argsort(-(docs_f[candidates] @ q_f))]
+                    else:
+                        candidates = candidates[np.argsort(-s[candidates])]
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    recalls.append(len(gt & set(candidates[:k].tolist())) / k)
+                results.append({
+                    "dim": dim, "type": kind, "oversampling": factor,
+                    f"recall@{k}": round(statistics.mean(recalls), 4),
+                    "p50_ms": round(statistics.median(latencies), 3),
+                    "bytes_per_vector": int(dim * BYTES_PER_COMPONENT[kind]),
+                    "upload_json_bytes": int(json_bytes),
+                })
+    return results
+
+
+def run_live(targets: list, query_texts: list, k: int) -> list:
+    """targets: [(index_name, dim, oversampling)]; the first one is the exact-search baseline"""
+    from google.genai import types
+    import ingest_excel
+    from azure.search.documents.models import VectorizedQuery
+    from search_client import make_search_client
+
+    client = ingest_excel._gemini_client()
+    truth, results = None, []
+    for n, (index, dim, oversampling) in enumerate(targets):
+        search = make_search_client(index)
+        config = types.EmbedContentConfig(output_dimensionality=dim)
+        found, latencies = [], []
+        for text in query_texts:
+            vec = client.models.embed_content(model=ingest_excel.settings.GEMINI_EMBED_MODEL,
+                                              contents=text, config=config).embeddings[0].values
+            query = VectorizedQuery(vector=vec, fields="content_vector", k_nearest_neighbors=k,
+                                    exhaustive=n == 0 or None, oversampling=oversampling)
+            start = time.perf_counter()
+            ids = [r["id"] for r in search.search(search_text=None, vector_queries=[query], top=k, select=["id"])]
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(set(ids))
+        truth = truth or found
+        results.append({
+            "index": index, "dim": dim, "oversampling": oversampling,
+            f"recall@{k}": round(statistics.mean(len(f & t) / k for f, t in zip(found, truth)), 4),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 1),
+            "documents": search.get_document_count(),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and latency of compact vector settings")
+    parser.add_argument("--providers", choices=["fake", "live"], default="fake")
+    parser.add_argument("--rows", type=int, default=1000, help="Synthetic workbook rows")
+    parser.add_argument("--docs", type=int, default=2000, help="Chunks to embed")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", help="Default: EMBED_DIM, 512, 256")
+    parser.add_argument("--types", nargs="+", default=list(BYTES_PER_COMPONENT), choices=list(BYTES_PER_COMPONENT))
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--live", nargs="+", metavar="INDEX:DIM[:OVERSAMPLING]",
+                        help="Compare real index versions instead (oversampling only on compressed indexes)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--out", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    os.environ["PROVIDER_MODE"] = args.providers
+    if args.providers == "fake":
+        os.environ.setdefault("GEMINI_INGEST_RPM", "1e12")
+        os.environ.setdefault("GEMINI_INGEST_TPM", "1e15")
+    sys.path.insert(0, str(INDEXACION_DIR))
+    from embedder import settings
+
+    cache_dir = Path(args.cache_dir)
+    texts, query_texts = corpus(args.rows, args.docs, args.queries, args.seed, cache_dir)
+
+    if args.live:
+        targets = []
+        for spec in args.live:
+            index, dim, *factor = spec.split(":")
+            targets.append((index, int(dim), float(factor[0]) if factor else None))
+        results = run_live(targets, query_texts, args.k)
+        for r in results:
+            print(f"{r['index']:<28} dim {r['dim']:>5}  recall@{args.k} {r[f'recall@{args.k}']:.3f}  "
+                  f"p50 {r['p50_ms']:>7.1f} ms  p95 {r['p95_ms']:>7.1f} ms  {r['documents']} docs")
+    else:
+        dims = sorted(args.dims or {settings.OUTPUT_DIM, 512, 256}, reverse=True)
+        doc_vecs = embed_cached(texts, cache_dir)
+        query_vecs = embed_cached(query_texts, cache_dir)
+        results = run_offline(doc_vecs, query_vecs, [d for d in dims if d <= doc_vecs.shape[1]],
+                              args.types, args.oversampling, args.k)
+        print(f"{len(texts)} chunks, {len(query_texts)} queries, exact float32 at {doc_vecs.shape[1]} dims as truth")
+        for r in results:
+            print(f"dim {r['dim']:>5}  {r['type']:<8} x{r['oversampling']:<5g} recall@{args.k} "
+                  f"{r[f'recall@{args.k}']:.3f}  p50 {r['p50_ms']:>7.3f} ms  {r['bytes_per_vector']:>6} B/vector  "
+                  f"{r['upload_json_bytes']:>6} B JSON")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"providers": args.providers, "k": args.k, "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
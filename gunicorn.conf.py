@@ -1,4 +1,23 @@
+import os
+import shutil
+import tempfile
+
 bind = "0.0.0.0:8000"
 workers = 2
 worker_class = "uvicorn.workers.UvicornWorker"
 timeout = 120
+
+# Each worker writes its Prometheus samples here; /metrics aggregates them
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus_multiproc"))
+
+
+def on_starting(server):
+    # Stale files from a previous run would be summed into the new counters
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
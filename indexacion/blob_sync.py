@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Incremental sync of the workbook container into the search index.
+
+Each run lists the blobs with their ETag and last-modified date and
+compares them with a local state file (SYNC_STATE_FILE). Only new or
+modified workbooks are downloaded, chunked and uploaded (through the
+reindex.py pipeline), so an unchanged corpus costs one list call. The state
+file also records the chunk ids each workbook produced: chunks of deleted
+workbooks are removed from the index, and so are leftover chunks when a
+modified workbook now yields fewer of them. The state also lists the
+providences of each workbook: unchanged workbooks sharing a providence with
+a changed or deleted one are parsed again (not uploaded) so its summary
+record covers all of its chunks, and a summary record is deleted once no
+workbook lists its providence. A providence a modified workbook adds to an
+unchanged one is only known after parsing, so that summary misses the
+unchanged workbook's chunks until it changes too. Workbooks that had chunks
+collapsed onto a near-duplicate in another workbook are reprocessed when
+that workbook changes or is deleted.
+
+A workbook whose upload fails keeps its previous state entry, so the next
+run retries it.
+
+Usage:
+    python blob_sync.py                       # one pass (cron / Task Scheduler)
+    python blob_sync.py --watch               # keep syncing every SYNC_INTERVAL_S seconds
+    python blob_sync.py --local ../data       # local directory, modification time instead of ETag
+    python blob_sync.py --dry-run             # only show what would change
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import reindex
+from embedder import settings
+from search_client import make_search_client
+
+DELETE_BATCH = 1000
+
+
+def list_blob_versions() -> Dict[str, Dict]:
+    """Workbooks in the container: state key -> {workbook, etag, last_modified}"""
+    from azure.storage.blob import BlobServiceClient
+    service = BlobServiceClient(
+        account_url=f"https://{settings.AZURE_BLOB_ACCOUNT_NAME}.blob.core.windows.net",
+        credential=settings.AZURE_BLOB_ACCOUNT_KEY
+    )
+    container = service.get_container_client(settings.AZURE_BLOB_CONTAINER_NAME)
+    found = {}
+    for blob in container.list_blobs():
+        if blob.name.lower().endswith(reindex.EXCEL_SUFFIXES):
+            workbook = reindex.Workbook(blob.name, blob.name, "blob")
+            found[workbook.key] = {
+                "workbook": workbook,
+                "etag": blob.etag,
+                "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+            }
+    return found
+
+
+def list_local_versions(paths: List[str]) -> Dict[str, Dict]:
+    """Local workbooks, versioned by modification time and size"""
+    found = {}
+    for workbook in reindex.discover(paths):
+        stat = os.stat(workbook.location)
+        found[workbook.key] = {
+            "workbook": workbook,
+            "etag": f"{stat.st_mtime_ns}-{stat.st_size}",
+            "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+        }
+    return found
+
+
+def load_state(path: str) -> Dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"workbooks": {}}
+
+
+def save_state(path: str, state: Dict):
+    # Write then rename, so a crash mid-write never leaves a truncated state file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def delete_ids(client, ids: List[str]) -> int:
+    deleted = 0
+    for i in range(0, len(ids), DELETE_BATCH):
+        results = client.delete_documents([{"id": doc_id} for doc_id in ids[i:i + DELETE_BATCH]])
+        deleted += sum(1 for r in results if getattr(r, "succeeded", True))
+    return deleted
+
+
+def sync_once(listing: Dict[str, Dict], state: Dict, client, workers: int, concurrency: int,
+              dry_run: bool = False, summary_client=None) -> Dict[str, int]:
+    """Bring the index in line with `listing`; updates `state` in place and returns counts"""
+    known = state.setdefault("workbooks", {})
+    changed = [key for key, entry in listing.items() if known.get(key, {}).get("etag") != entry["etag"]]
+    removed = [key for key in known if key not in listing]
+    # Chunks collapsed onto a near-duplicate in another workbook come back when that workbook changes or goes
+    while True:
+        gone = set(changed + removed)
+        dependents = [key for key, entry in known.items() if key in listing and key not in changed
+                      and gone.intersection(entry.get("depends_on", []))]
+        if not dependents:
+            break
+        changed += dependents
+    # Providences spread over a changed or deleted workbook and unchanged ones: summarize them over all of them
+    affected = {k for key in changed + removed for k in known.get(key, {}).get("summaries", [])}
+    context = [key for key, entry in known.items() if key in listing and key not in changed
+               and affected.intersection(entry.get("summaries", []))] if summary_client is not None else []
+    counts = {"unchanged": len(listing) - len(changed), "changed": len(changed), "removed": len(removed),
+              "uploaded": 0, "deleted": 0, "failed": 0}
+    for key in changed:
+        print(f"{'+' if key not in known else '~'} {key}")
+    for key in removed:
+        print(f"- {key} ({len(known[key].get('ids', []))} chunks)")
+    for key in context:
+        print(f"= {key} (summaries only)")
+    if dry_run or not (changed or removed):
+        return counts
+
+    if changed or context:
+        totals = reindex.run([listing[key]["workbook"] for key in changed], client, workers, concurrency,
+                             summary_client, {listing[key]["workbook"]: known[key].get("ids", []) for key in context})
+        counts["uploaded"] = totals["uploaded"]
+        for key in changed:
+            entry = listing[key]
+            progress = totals["per_file"].get(entry["workbook"].key)
+            if progress is None or progress.failed:
+                # Unreadable or partly uploaded: keep the old entry so the next run retries
+                counts["failed"] += 1
+                continue
+            stale = sorted(set(known.get(key, {}).get("ids", [])) - set(progress.ids))
+            counts["deleted"] += delete_ids(client, stale)
+            known[key] = {"name": entry["workbook"].name, "etag": entry["etag"],
+                          "last_modified": entry["last_modified"], "ids": progress.ids,
+                          "summaries": progress.summaries, "depends_on": progress.depends_on,
+                          "synced_at": datetime.now(timezone.utc).isoformat()}
+
+    for key in removed:
+        counts["deleted"] += delete_ids(client, known[key].get("ids", []))
+        del known[key]
+    if summary_client is not None:
+        # Other workbooks may still hold chunks of a providence this one no longer has
+        listed = {k for entry in known.values() for k in entry.get("summaries", [])}
+        delete_ids(summary_client, sorted(affected - listed))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync new, modified and deleted workbooks into the index")
+    parser.add_argument("--local", nargs="*", help="Sync local files/directories instead of the blob container")
+    parser.add_argument("--state", default=settings.SYNC_STATE_FILE, help="State file (default: SYNC_STATE_FILE)")
+    parser.add_argument("--index", help="Target index (default: AZURE_SEARCH_INDEX)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parsing processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batches embedded/uploaded at once")
+    parser.add_argument("--watch", action="store_true", help="Keep running, one pass every --interval seconds")
+    parser.add_argument("--interval", type=float, default=settings.SYNC_INTERVAL_S)
+    parser.add_argument("--dry-run", action="store_true", help="Show the changes without applying them")
+    args = parser.parse_args()
+
+    client = make_search_client(args.index)
+    Path(args.state).parent.mkdir(parents=True, exist_ok=True)
+
+    while True:
+        started = time.perf_counter()
+        try:
+            listing = list_local_versions(args.local) if args.local is not None else list_blob_versions()
+            state = load_state(args.state)
+            # Resolved every pass: after a blue/green switch the summaries belong to the new version
+            summary_client = None if args.dry_run else reindex.summary_client_for(args.index)
+            counts = sync_once(listing, state, client, args.workers, args.concurrency, args.dry_run, summary_client)
+            if not args.dry_run:
+                save_state(args.state, state)
+            print(f"Sync: {counts['changed']} changed, {counts['removed']} removed, {counts['unchanged']} unchanged"
+                  f" | {counts['uploaded']} chunks uploaded, {counts['deleted']} deleted, {counts['failed']} failed"
+                  f" ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            if not args.watch:
+                raise
+            print(f"Sync failed, retrying in {args.interval:.0f}s: {e}")
+        if not args.watch:
+            return 1 if counts["failed"] else 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
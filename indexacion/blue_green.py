@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Blue/green reindexing for Azure AI Search.
+
+AZURE_SEARCH_INDEX is used as an index alias that points at one versioned
+index, `<alias>-v<n>`. A reindex builds the next version next to the live
+one, validates it (document count and a smoke query) and only then switches
+the alias, so search never goes down. Each version has its own providence
+summary index, `<version>-summaries`, built and pruned with it. Older versions are kept for rollback
+until pruned. The backend re-resolves the alias every INDEX_REFRESH_S
+seconds and picks up the new version without a restart.
+
+Usage:
+    python blue_green.py build --excel sentencias.xlsx          # new version, validate, promote
+    python blue_green.py build --blob                           # every workbook in the container
+    python blue_green.py list
+    python blue_green.py promote legal-index-v3
+    python blue_green.py rollback
+    python blue_green.py prune --keep 2
+
+The first promotion needs AZURE_SEARCH_INDEX to be free as an alias name. If
+a plain index with that name still serves traffic, either point the backend
+at a new alias name, or pass --replace-plain-index to delete it right before
+the alias is created (a few seconds without search, once).
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import List, Optional
+
+from create_index import create_index, settings as index_settings, summary_index_name
+from search_client import make_index_client, make_search_client
+
+ALIAS = index_settings.AZURE_SEARCH_INDEX
+
+
+class ValidationError(Exception):
+    pass
+
+
+def version_of(name: str) -> Optional[int]:
+    match = re.fullmatch(rf"{re.escape(ALIAS)}-v(\d+)", name)
+    return int(match.group(1)) if match else None
+
+
+def versions(ic) -> List[str]:
+    """Versioned indexes of this alias, oldest first"""
+    names = [n for n in ic.list_index_names() if version_of(n) is not None]
+    return sorted(names, key=version_of)
+
+
+def live_version(ic) -> Optional[str]:
+    from azure.core.exceptions import ResourceNotFoundError
+    try:
+        alias = ic.get_alias(ALIAS)
+    except ResourceNotFoundError:
+        return None
+    return alias.indexes[0] if alias.indexes else None
+
+
+def next_version_name(ic) -> str:
+    existing = [version_of(n) for n in versions(ic)]
+    return f"{ALIAS}-v{max(existing, default=0) + 1}"
+
+
+def validate(name: str, expected: int, smoke_query: str, timeout_s: float = 120.0):
+    """Document count must reach `expected` (counts lag behind uploads) and the smoke query must hit"""
+    client = make_search_client(name)
+    deadline = time.monotonic() + timeout_s
+    count = client.get_document_count()
+    while count != expected and time.monotonic() < deadline:
+        time.sleep(2)
+        count = client.get_document_count()
+    if count != expected:
+        raise ValidationError(f"{name}: {count} documents, expected {expected}")
+    hits = list(client.search(search_text=smoke_query, top=3, select=["id", "title"]))
+    if not hits:
+        raise ValidationError(f"{name}: smoke query '{smoke_query}' returned no results")
+    print(f"Validated {name}: {count} documents, smoke query -> {[h.get('title') for h in hits]}")
+
+
+def promote(ic, name: str, replace_plain_index: bool = False):
+    """Atomically point the alias at `name`"""
+    from azure.search.documents.indexes.models import SearchAlias
+    if name not in ic.list_index_names():
+        raise SystemExit(f"Index {name} does not exist")
+    if ALIAS in ic.list_index_names():
+        if not replace_plain_index:
+            raise SystemExit(f"A plain index named '{ALIAS}' exists, so the alias cannot be created. "
+                             "Re-run with --replace-plain-index or use a new alias name.")
+        print(f"Deleting plain index {ALIAS} to free the alias name")
+        ic.delete_index(ALIAS)
+    previous = live_version(ic)
+    ic.create_or_update_alias(SearchAlias(name=ALIAS, indexes=[name]))
+    print(f"Alias {ALIAS}: {previous or '(none)'} -> {name}")
+
+
+def rollback(ic):
+    current = live_version(ic)
+    if current is None:
+        raise SystemExit(f"Alias {ALIAS} does not exist")
+    older = [n for n in versions(ic) if version_of(n) < (version_of(current) or 0)]
+    if not older:
+        raise SystemExit(f"No version older than {current} to roll back to")
+    promote(ic, older[-1])
+
+
+def prune(ic, keep: int):
+    """Delete old versions, keeping the newest `keep` and always the live one"""
+    current = live_version(ic)
+    names = versions(ic)
+    for name in names[:-keep] if keep > 0 else names:
+        if name != current:
+            ic.delete_index(name)
+            if summary_index_name(name) in ic.list_index_names():
+                ic.delete_index(summary_index_name(name))
+            print(f"Deleted {name}")
+
+
+def build(ic, workbooks, smoke_query: str = "tutela", validate_timeout: float = 120.0, workers: int = 2,
+          concurrency: int = 8, promote_after: bool = True, keep: int = 3, replace_plain_index: bool = False) -> str:
+    """Create the next version, load it with the parallel reindex pipeline, validate, promote"""
+    from reindex import run
+    name = next_version_name(ic)
+    create_index(name, ic)
+    totals = run(workbooks, make_search_client(name), workers, concurrency,
+                 summary_client=make_search_client(summary_index_name(name)))
+    if totals["failed"] or totals["parse_errors"]:
+        raise SystemExit(f"{name} is incomplete ({totals['failed']} chunks failed, {totals['parse_errors']} "
+                         f"unreadable files); the alias still points at {live_version(ic)}")
+    try:
+        validate(name, totals["uploaded"], smoke_query, validate_timeout)
+    except ValidationError as e:
+        raise SystemExit(f"Validation failed, the alias still points at {live_version(ic)}: {e}")
+
+    if not promote_after:
+        print(f"Built {name}; promote it with: python blue_green.py promote {name}")
+        return name
+    promote(ic, name, replace_plain_index)
+    if keep:
+        prune(ic, keep)
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blue/green reindexing with an index alias")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="Build, validate and promote a new index version")
+    p.add_argument("--excel", nargs="*", default=[], help="Workbook files, directories, globs or URLs")
+    p.add_argument("--blob", nargs="*", help="Blob names; no names = every workbook in the container")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parsing processes")
+    p.add_argument("--concurrency", type=int, default=8, help="Batches embedded/uploaded at once")
+    p.add_argument("--smoke-query", default="tutela")
+    p.add_argument("--validate-timeout", type=float, default=120.0)
+    p.add_argument("--no-promote", action="store_true", help="Build and validate only")
+    p.add_argument("--keep", type=int, default=3, help="Versions to keep after promotion (0 = no pruning)")
+    p.add_argument("--replace-plain-index", action="store_true")
+
+    sub.add_parser("list", help="Show versions and the live one")
+
+    p = sub.add_parser("validate", help="Check a version's document count and smoke query")
+    p.add_argument("name")
+    p.add_argument("--expected", type=int, required=True)
+    p.add_argument("--smoke-query", default="tutela")
+    p.add_argument("--validate-timeout", type=float, default=120.0)
+
+    p = sub.add_parser("promote", help="Point the alias at a version")
+    p.add_argument("name")
+    p.add_argument("--replace-plain-index", action="store_true")
+
+    sub.add_parser("rollback", help="Point the alias at the previous version")
+
+    p = sub.add_parser("prune", help="Delete old versions")
+    p.add_argument("--keep", type=int, default=2)
+
+    args = parser.parse_args()
+    ic = make_index_client()
+
+    if args.command == "build":
+        from reindex import discover
+        workbooks = discover(args.excel, args.blob)
+        if not workbooks:
+            raise SystemExit("No workbooks given (use --excel and/or --blob)")
+        build(ic, workbooks, args.smoke_query, args.validate_timeout, args.workers, args.concurrency,
+              promote_after=not args.no_promote, keep=args.keep, replace_plain_index=args.replace_plain_index)
+    elif args.command == "list":
+        current = live_version(ic)
+        for name in versions(ic):
+            count = make_search_client(name).get_document_count()
+            print(f"{'*' if name == current else ' '} {name:<30} {count:>8} docs")
+        if current is None:
+            print(f"Alias {ALIAS} does not exist yet")
+    elif args.command == "validate":
+        try:
+            validate(args.name, args.expected, args.smoke_query, args.validate_timeout)
+        except ValidationError as e:
+            raise SystemExit(str(e))
+    elif args.command == "promote":
+        promote(ic, args.name, args.replace_plain_index)
+    elif args.command == "rollback":
+        rollback(ic)
+    elif args.command == "prune":
+        prune(ic, args.keep)
+
+
+if __name__ == "__main__":
+    main()
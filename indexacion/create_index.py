@@ -4,7 +4,8 @@ from azure.search.documents.indexes.models import (
     SearchIndex, SimpleField, SearchableField, VectorSearch,
     HnswAlgorithmConfiguration, VectorSearchProfile, SearchField,
     SemanticConfiguration, SemanticPrioritizedFields,
-    SemanticField, SemanticSearch, SynonymMap, SearchSuggester
+    SemanticField, SemanticSearch, SynonymMap, SearchSuggester,
+    ScalarQuantizationCompressionConfiguration, ScalarQuantizationParameters
 )
 from azure.core.credentials import AzureKeyCredential
 from azure.identity import DefaultAzureCredential
@@ -15,11 +16,22 @@ load_dotenv()
 
 class settings:
     EMBED_DIM: int = int(os.getenv("EMBED_DIM", "768"))
+    # Vector storage: single | half (float16), none | scalar (int8 quantization of the HNSW graph)
+    VECTOR_TYPE: str = os.getenv("VECTOR_TYPE", "single")
+    VECTOR_COMPRESSION: str = os.getenv("VECTOR_COMPRESSION", "none")
+    # With compression: candidates fetched per k, rescored with the full-precision vectors
+    VECTOR_OVERSAMPLING: float = float(os.getenv("VECTOR_OVERSAMPLING", "4"))
+    # false drops the retrievable copy of the vectors (they cannot be returned by queries any more)
+    VECTOR_STORED: bool = os.getenv("VECTOR_STORED", "true").lower() == "true"
     AZURE_SEARCH_USE_MSI: bool = os.getenv("AZURE_SEARCH_USE_MSI", "false").lower() == "true"
     AZURE_SEARCH_API_KEY: str | None = os.getenv("AZURE_SEARCH_API_KEY")
     AZURE_SEARCH_ENDPOINT: str | None = os.getenv("AZURE_SEARCH_ENDPOINT")
     AZURE_SEARCH_INDEX: str = os.getenv("AZURE_SEARCH_INDEX", "legal-index")
     SEMANTIC_CONFIG_NAME: str = "legal-semantic"
+    # Companion index with one summary record per providence (backend/providers/providence_summaries.py)
+    SUMMARY_INDEX_SUFFIX: str = os.getenv("SUMMARY_INDEX_SUFFIX", "-summaries")
+
+VECTOR_TYPES = {"single": "Collection(Edm.Single)", "half": "Collection(Edm.Half)"}
 
 
 def client():
@@ -29,10 +41,11 @@ def client():
         cred = AzureKeyCredential(settings.AZURE_SEARCH_API_KEY)
     return SearchIndexClient(settings.AZURE_SEARCH_ENDPOINT, credential=cred)
 
-def create_or_replace():
+def build_index(name: str):
+    """Index definition (fields, vector/semantic config, suggester) and its synonym map"""
     fields = [
         SimpleField(name="id", type="Edm.String", key=True, filterable=True, sortable=True),
-        SearchableField(name="title", type="Edm.String", analyzer_name="es.microsoft", filterable=True),
+        SearchableField(name="title", type="Edm.String", analyzer_name="es.microsoft", filterable=True, facetable=True),
         SearchableField(name="content", type="Edm.String", analyzer_name="es.microsoft", synonym_map_names=["es-legal-syn"]),
         SimpleField(name="source", type="Edm.String", filterable=True, facetable=True),
         
@@ -45,13 +58,26 @@ def create_or_replace():
         # se genera al tokenizar la columna "Tema - subtema"
         SimpleField(name="temas", type="Collection(Edm.String)", filterable=True, facetable=True),
 
-        SearchField(name="content_vector", type="Collection(Edm.Single)", searchable=True,
-                    vector_search_dimensions=settings.EMBED_DIM, vector_search_profile_name="vprofile"),
+        SearchField(name="content_vector", type=VECTOR_TYPES[settings.VECTOR_TYPE], searchable=True,
+                    vector_search_dimensions=settings.EMBED_DIM, vector_search_profile_name="vprofile",
+                    stored=settings.VECTOR_STORED, hidden=not settings.VECTOR_STORED),
     ]
 
+    compressions = []
+    if settings.VECTOR_COMPRESSION == "scalar":
+        compressions.append(ScalarQuantizationCompressionConfiguration(
+            name="sq-int8",
+            rerank_with_original_vectors=True,
+            default_oversampling=settings.VECTOR_OVERSAMPLING,
+            parameters=ScalarQuantizationParameters(quantized_data_type="int8"),
+        ))
+    elif settings.VECTOR_COMPRESSION != "none":
+        raise ValueError(f"Unsupported VECTOR_COMPRESSION: {settings.VECTOR_COMPRESSION}")
     vector = VectorSearch(
-        profiles=[VectorSearchProfile(name="vprofile", algorithm_configuration_name="hnsw")],
-        algorithms=[HnswAlgorithmConfiguration(name="hnsw")]
+        profiles=[VectorSearchProfile(name="vprofile", algorithm_configuration_name="hnsw",
+                                      compression_configuration_name=compressions[0].name if compressions else None)],
+        algorithms=[HnswAlgorithmConfiguration(name="hnsw")],
+        compressions=compressions,
     )
 
     semantic = SemanticSearch(
@@ -95,7 +121,7 @@ def create_or_replace():
     suggester = SearchSuggester(name="sg", source_fields=["title", "content"])
 
     idx = SearchIndex(
-        name=settings.AZURE_SEARCH_INDEX,
+        name=name,
         fields=fields,
         vector_search=vector,
         semantic_search=semantic,
@@ -104,15 +130,41 @@ def create_or_replace():
         #default_scoring_profile="recency",
         synonym_maps=[synonyms]
     )
+    return idx, synonyms
 
-    ic = client()
-    
-    # Delete existing index if it exists
-    try:
-        ic.delete_index(settings.AZURE_SEARCH_INDEX)
-    except Exception:
-        pass
+def summary_index_name(name: str) -> str:
+    return f"{name}{settings.SUMMARY_INDEX_SUFFIX}"
 
+def build_summary_index(name: str):
+    """Summary index of `name`: looked up by key only, so nothing is searchable"""
+    fields = [
+        SimpleField(name="id", type="Edm.String", key=True),
+        SimpleField(name="providence", type="Edm.String", filterable=True),
+        SimpleField(name="total_chunks", type="Edm.Int32"),
+        SimpleField(name="sources", type="Collection(Edm.String)"),
+        SimpleField(name="dates", type="Collection(Edm.String)"),
+        SimpleField(name="years", type="Collection(Edm.Int32)"),
+        SimpleField(name="average_relevance", type="Edm.Double"),
+        SimpleField(name="max_relevance", type="Edm.Double"),
+        SimpleField(name="min_relevance", type="Edm.Double"),
+        SimpleField(name="unique_temas", type="Collection(Edm.String)"),
+        SimpleField(name="tema_count", type="Edm.Int32"),
+        SimpleField(name="lead_content", type="Edm.String"),
+        SimpleField(name="lead_relevance", type="Edm.Double"),
+        SimpleField(name="lead_tema_subtema", type="Edm.String"),
+    ]
+    return SearchIndex(name=summary_index_name(name), fields=fields)
+
+def ensure_summary_index(name: str, ic=None):
+    """Create the summary index of `name` if it is missing (indexes built before it existed)"""
+    ic = ic or client()
+    summary = build_summary_index(name)
+    if summary.name not in ic.list_index_names():
+        ic.create_index(summary)
+        print("Summary index created:", summary.name)
+    return summary
+
+def ensure_synonym_map(ic, idx, synonyms):
     # Create or replace synonym map first
     try:
         ic.create_synonym_map(synonyms)
@@ -125,12 +177,41 @@ def create_or_replace():
         except Exception as e:
             print(f"Warning: Could not create synonym map: {e}")
             # Remove synonym map reference from content field if creation failed
-            for field in fields:
+            for field in idx.fields:
                 if hasattr(field, 'name') and field.name == 'content':
                     field.synonym_map_names = []
 
+def create_index(name: str, ic=None):
+    """Create a new index next to the live one (blue/green); fails if it already exists"""
+    ic = ic or client()
+    idx, synonyms = build_index(name)
+    # The synonym map is shared by every version; it is only recreated if missing
+    try:
+        ic.create_synonym_map(synonyms)
+    except Exception:
+        pass
+    ic.create_index(idx)
+    ic.create_index(build_summary_index(name))
+    print("Index created:", name)
+    return idx
+
+def create_or_replace():
+    """Drop and recreate AZURE_SEARCH_INDEX (search is down until re-ingested; see blue_green.py)"""
+    idx, synonyms = build_index(settings.AZURE_SEARCH_INDEX)
+    ic = client()
+    
+    # Delete existing index (and its summaries) if it exists
+    for name in (settings.AZURE_SEARCH_INDEX, summary_index_name(settings.AZURE_SEARCH_INDEX)):
+        try:
+            ic.delete_index(name)
+        except Exception:
+            pass
+
+    ensure_synonym_map(ic, idx, synonyms)
+
     # Create the index
     ic.create_index(idx)
+    ic.create_index(build_summary_index(settings.AZURE_SEARCH_INDEX))
     print("Index created:", settings.AZURE_SEARCH_INDEX)
 
 if __name__ == "__main__":
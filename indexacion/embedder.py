@@ -1,24 +1,43 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Shared helpers (rate limiter, fake providers) live in backend/providers
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
 class Settings(BaseSettings):
     # Gemini settings
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
-    GEMINI_EMBED_MODEL: str = os.getenv("GEMINI_EMBED_MODEL")
+    GEMINI_API_KEY: str | None = os.getenv("GEMINI_API_KEY")
+    GEMINI_EMBED_MODEL: str = os.getenv("GEMINI_EMBED_MODEL", "text-embedding-004")
     OUTPUT_DIM: int = int(os.getenv("EMBED_DIM", 768))
+    # Ingestion only gets part of the project quota so live traffic keeps headroom
+    GEMINI_INGEST_RPM: float = float(os.getenv("GEMINI_INGEST_RPM", 600))
+    GEMINI_INGEST_TPM: float = float(os.getenv("GEMINI_INGEST_TPM", 400000))
+    GEMINI_INGEST_CONCURRENCY: int = int(os.getenv("GEMINI_INGEST_CONCURRENCY", 4))
     
     # Azure AI Search settings
-    AZURE_SEARCH_ENDPOINT: str = os.getenv("AZURE_SEARCH_ENDPOINT")
-    AZURE_SEARCH_INDEX: str = os.getenv("AZURE_SEARCH_INDEX")
+    AZURE_SEARCH_ENDPOINT: str | None = os.getenv("AZURE_SEARCH_ENDPOINT")
+    AZURE_SEARCH_INDEX: str | None = os.getenv("AZURE_SEARCH_INDEX")
     AZURE_SEARCH_API_KEY: str = os.getenv("AZURE_SEARCH_API_KEY", "")
     AZURE_SEARCH_USE_MSI: bool = os.getenv("AZURE_SEARCH_USE_MSI", "false").lower() == "true"
     
     # Azure Blob Storage settings
-    AZURE_BLOB_ACCOUNT_NAME: str = os.getenv("AZURE_BLOB_ACCOUNT_NAME")
-    AZURE_BLOB_ACCOUNT_KEY: str = os.getenv("AZURE_BLOB_ACCOUNT_KEY")
-    AZURE_BLOB_CONTAINER_NAME: str = os.getenv("AZURE_BLOB_CONTAINER_NAME")
+    AZURE_BLOB_ACCOUNT_NAME: str | None = os.getenv("AZURE_BLOB_ACCOUNT_NAME")
+    AZURE_BLOB_ACCOUNT_KEY: str | None = os.getenv("AZURE_BLOB_ACCOUNT_KEY")
+    AZURE_BLOB_CONTAINER_NAME: str | None = os.getenv("AZURE_BLOB_CONTAINER_NAME")
+    # blob_sync.py: what was already indexed, and how often --watch polls the container
+    SYNC_STATE_FILE: str = os.getenv("SYNC_STATE_FILE", "sync_state.json")
+    SYNC_INTERVAL_S: float = float(os.getenv("SYNC_INTERVAL_S", 300))
+    # Parsed workbooks as Arrow files keyed by content hash (workbook_cache.py); empty disables it
+    WORKBOOK_CACHE_DIR: str = os.getenv("WORKBOOK_CACHE_DIR", str(Path(__file__).resolve().parent / ".workbook_cache"))
+    # Near-duplicate chunks (near_duplicates.py): estimated Jaccard at or above this is collapsed; 0 disables
+    DEDUPE_THRESHOLD: float = float(os.getenv("DEDUPE_THRESHOLD", 0.8))
+
+    # live | fake | record | replay, same meaning as in the backend (providers/fake_providers.py)
+    PROVIDER_MODE: str = os.getenv("PROVIDER_MODE", "live")
 
 settings = Settings()
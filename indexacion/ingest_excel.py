@@ -4,17 +4,48 @@ import json, io, requests
 from typing import List, Dict
 from embedder import settings
 from search_client import make_search_client
+from workbook_cache import read_workbook
 from azure.storage.blob import BlobServiceClient
-import google.genai as genai
+from providers.rate_limiter import get_limiter, estimate_tokens, BULK
+
+def _gemini_client():
+    if settings.PROVIDER_MODE != "live":
+        from providers import fake_providers
+        return fake_providers.gemini_client(_live_gemini_client)
+    return _live_gemini_client()
+
+def _live_gemini_client():
+    import google.genai as genai
+    return genai.Client(api_key=settings.GEMINI_API_KEY)
+
+def _ingest_limiter():
+    # Bulk priority: keeps a reserve of the budget and backs off (AIMD) on 429
+    return get_limiter(settings.GEMINI_EMBED_MODEL, settings.GEMINI_INGEST_RPM, settings.GEMINI_INGEST_TPM,
+                       max_concurrency=settings.GEMINI_INGEST_CONCURRENCY)
+
+def _embed_config():
+    # Must match the index field (EMBED_DIM) and the query side (backend search_cases)
+    if settings.PROVIDER_MODE in ("fake", "replay"):
+        # The fakes only read the attribute; skips the slow google.genai.types import
+        from types import SimpleNamespace
+        return SimpleNamespace(output_dimensionality=settings.OUTPUT_DIM)
+    from google.genai import types
+    return types.EmbedContentConfig(output_dimensionality=settings.OUTPUT_DIM)
 
 def embed(texts: List[str]) -> List[List[float]]:
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    client = _gemini_client()
+    limiter = _ingest_limiter()
+    config = _embed_config()
     vecs = []
     for t in texts:
         # Using the correct API from google-genai documentation
-        response = client.models.embed_content(
-            model=settings.GEMINI_EMBED_MODEL,
-            contents=str(t)  # The parameter is 'contents', not 'content' or 'input'
+        response = limiter.call(
+            lambda: client.models.embed_content(
+                model=settings.GEMINI_EMBED_MODEL,
+                contents=str(t),  # The parameter is 'contents', not 'content' or 'input'
+                config=config
+            ),
+            tokens=estimate_tokens(str(t)), priority=BULK, max_attempts=6
         )
         vecs.append(response.embeddings[0].values)
     return vecs
@@ -49,7 +80,7 @@ def load_excel_from_azure_storage(blob_name: str = "sentencias_pasadas.xlsx") ->
         )
         
         blob_data = blob_client.download_blob().readall()
-        return pd.read_excel(io.BytesIO(blob_data))
+        return read_workbook(blob_data)
         
     except Exception as e:
         print(f"Error loading Excel from Azure Storage: {e}")
@@ -58,8 +89,8 @@ def load_excel_from_azure_storage(blob_name: str = "sentencias_pasadas.xlsx") ->
 def load_excel(path_or_sas: str) -> pd.DataFrame:
     if path_or_sas.lower().startswith("http"):
         data = requests.get(path_or_sas, timeout=60).content
-        return pd.read_excel(io.BytesIO(data))
-    return pd.read_excel(path_or_sas)
+        return read_workbook(data)
+    return read_workbook(path_or_sas)
 
 def chunk(text: str, max_words=180, overlap=40) -> List[str]:
     words = str(text).split()
@@ -70,8 +101,9 @@ def chunk(text: str, max_words=180, overlap=40) -> List[str]:
         i = j - overlap if j - overlap > i else j
     return chunks
 
-def prepare_docs_legal(df: pd.DataFrame) -> List[Dict]:
-    """Prepare documents from legal Excel with specific column structure"""
+def prepare_docs_legal(df: pd.DataFrame, id_prefix: str = "") -> List[Dict]:
+    """Prepare documents from legal Excel with specific column structure.
+    id_prefix keeps chunk ids unique when several workbooks share one index."""
     docs = []
     for i, row in df.iterrows():
         # Extract and clean data from specific columns
@@ -125,7 +157,7 @@ def prepare_docs_legal(df: pd.DataFrame) -> List[Dict]:
         chunks = chunk(full_content)
         for j, c in enumerate(chunks):
             docs.append({
-                "id": f"{i}-{j}",
+                "id": f"{id_prefix}{i}-{j}",
                 "title": providencia,
                 "content": c,
                 "source": tipo,
@@ -162,15 +194,20 @@ def prepare_docs(df: pd.DataFrame, text_col: str, title_col: str | None,
             })
     return docs
 
-def upload_docs(docs: List[Dict]):
-    client = make_search_client()
+def upload_batch(page: List[Dict], client) -> int:
+    """Embed and upload one batch; returns how many documents the index accepted"""
+    vecs = embed([d["content"] for d in page])
+    for d, v in zip(page, vecs):
+        d["content_vector"] = v
+    results = client.upload_documents(page)
+    return sum(1 for r in results if getattr(r, "succeeded", True))
+
+def upload_docs(docs: List[Dict], client=None):
+    client = client or make_search_client()
     batch = 32
     for i in range(0, len(docs), batch):
         page = docs[i:i+batch]
-        vecs = embed([d["content"] for d in page])
-        for d, v in zip(page, vecs):
-            d["content_vector"] = v
-        client.upload_documents(page)
+        upload_batch(page, client)
         print(f"Uploaded {i + len(page)}/{len(docs)}")
 
 if __name__ == "__main__":
@@ -187,34 +224,14 @@ if __name__ == "__main__":
         print("No Excel files found in the container.")
         exit(1)
         
-    # Use the first Excel file found, or specify the correct name
-    excel_file = excel_files[0] if excel_files else "sentencias_pasadas.xlsx"
-    print(f"Using Excel file: {excel_file}")
-    
-    print("Loading Excel from Azure Storage...")
-    
-    # Load Excel file from Azure Storage
-    df = load_excel_from_azure_storage(excel_file)
-    print(f"Loaded {len(df)} rows")
-    print(f"Columns: {list(df.columns)}")
-    
-    # Check if required columns exist for legal format
-    required_cols = ['Relevancia', 'Providencia', 'Tipo', 'Fecha Sentencia', 
-                    'Tema - subtema', 'resuelve', 'sintesis']
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    if missing_cols:
-        print(f"Error: Missing required columns for legal format: {missing_cols}")
-        print(f"Available columns: {list(df.columns)}")
+    # Same ids, deduplication and summaries as reindex.py / blob_sync.py, so the
+    # entry points can be mixed on one index without storing chunks twice
+    import os
+    import reindex
+    workbooks = [reindex.Workbook(name, name, "blob") for name in excel_files]
+    print(f"Indexing {len(workbooks)} workbooks: {[wb.name for wb in workbooks]}")
+    totals = reindex.run(workbooks, make_search_client(), os.cpu_count() or 2, 8, reindex.summary_client_for())
+    print(f"Uploaded {totals['uploaded']} chunks, {totals['failed']} failed, {totals['parse_errors']} unreadable files, "
+          f"{totals['duplicates']} near-duplicates skipped ({totals['reduction']:.1%})")
+    if totals["failed"] or totals["parse_errors"]:
         exit(1)
-    
-    print("Processing documents...")
-    docs = prepare_docs_legal(df)
-    
-    print(f"Prepared {len(docs)} document chunks")
-    if docs:
-        print(f"Sample document: {docs[0]}")
-        print("Starting upload to Azure AI Search...")
-        upload_docs(docs)
-        print("Upload completed successfully!")
-    else:
-        print("No documents to upload")
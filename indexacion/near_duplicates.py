@@ -0,0 +1,103 @@
+"""
+Near-duplicate chunk detection with MinHash and LSH banding.
+
+Many sentencias repeat the same boilerplate ("Resuelve: ..."), so many
+chunks are near-identical. Each chunk's word 5-gram set gets a MinHash
+signature (deterministic across processes, so signatures can be computed
+in the parsing workers). Signatures are split into bands: chunks sharing a
+band are candidates, and a candidate is a duplicate when the estimated
+Jaccard similarity reaches DEDUPE_THRESHOLD. Only chunks of the same
+providence (title) are compared: a chunk dropped from another sentencia
+would take that sentencia out of the index, since search_by_providence and
+the citations work on the chunk's own title. Duplicates are collapsed onto
+the first chunk seen (the canonical one) and are neither embedded nor
+uploaded; the duplicate -> canonical links are kept for the report.
+"""
+import re
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from embedder import settings
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs at Jaccard 0.8 become candidates with probability > 0.999
+SHINGLE = 5
+
+_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+
+
+def signature(text: str) -> np.ndarray:
+    words = _WORD.findall(str(text).lower())
+    shingles = {" ".join(words[i:i + SHINGLE]) for i in range(max(1, len(words) - SHINGLE + 1))}
+    x = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*x + b) mod p per permutation; the uint64 product wraps, which only adds mixing
+    return (((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME) & _MAX_HASH).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """Incremental LSH index: find_or_add returns the canonical id of a near-duplicate in the same group, or None"""
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self.rows = NUM_PERM // BANDS
+        self._buckets: List[Dict[Tuple[Hashable, bytes], str]] = [{} for _ in range(BANDS)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self.duplicates: Dict[str, str] = {}
+
+    def find_or_add(self, doc_id: str, sig: np.ndarray, group: Hashable = None) -> Optional[str]:
+        keys = [(group, sig[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(BANDS)]
+        seen = set()
+        for band, key in enumerate(keys):
+            candidate = self._buckets[band].get(key)
+            if candidate is None or candidate in seen:
+                continue
+            seen.add(candidate)
+            if np.mean(self._signatures[candidate] == sig) >= self.threshold:
+                self.duplicates[doc_id] = candidate
+                return candidate
+        self._signatures[doc_id] = sig
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, doc_id)
+        return None
+
+    def stats(self, total: int) -> Dict:
+        return {"chunks": total, "duplicates": len(self.duplicates),
+                "reduction": round(len(self.duplicates) / total, 4) if total else 0.0}
+
+
+def deduplicate(docs: List[Dict], threshold: Optional[float] = None) -> Tuple[List[Dict], Dict]:
+    """Drop near-duplicate chunks of the same title; returns the kept docs and stats (with the duplicate -> canonical links)"""
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    index = NearDuplicateIndex(threshold)
+    if not threshold:
+        return docs, index.stats(len(docs))
+    kept = [d for d in docs if index.find_or_add(d["id"], signature(d["content"]), d.get("title")) is None]
+    return kept, {**index.stats(len(docs)), "links": index.duplicates}
+
+
+if __name__ == "__main__":
+    # Self-check: python near_duplicates.py
+    text = ("Se resuelve confirmar la sentencia de primera instancia y ordenar a la entidad accionada que en el "
+            "término de cuarenta y ocho horas garantice el derecho fundamental a la salud del accionante")
+    other = ("La Corte estudia la estabilidad laboral reforzada de una trabajadora despedida durante el embarazo "
+             "sin autorización del inspector de trabajo y ordena su reintegro con el pago de salarios")
+    assert (signature(text) == signature(text)).all(), "signatures must be deterministic"
+    index = NearDuplicateIndex(0.8)
+    assert index.find_or_add("a-0", signature(text), "T-1/23") is None
+    assert index.find_or_add("a-1", signature(text), "T-1/23") == "a-0", "identical chunk not collapsed"
+    assert index.find_or_add("a-2", signature(text + " de manera inmediata"), "T-1/23") == "a-0", \
+        "near-identical chunk not collapsed"
+    assert index.find_or_add("a-3", signature(other), "T-1/23") is None, "distinct chunk collapsed"
+    assert index.find_or_add("b-0", signature(text), "T-2/23") is None, "collapsed across providences"
+    kept, stats = deduplicate([{"id": "x-0", "title": "T-1/23", "content": text},
+                               {"id": "x-1", "title": "T-1/23", "content": text},
+                               {"id": "y-0", "title": "T-2/23", "content": text}], threshold=0.8)
+    assert [d["id"] for d in kept] == ["x-0", "y-0"] and stats["links"] == {"x-1": "x-0"}, stats
+    print("near_duplicates: ok")
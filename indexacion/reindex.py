@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Parallel reindex of every legal workbook.
+
+Workbooks are discovered locally (files, directories or glob patterns)
+and/or in the blob container. Each one is loaded and chunked in a process
+pool (pandas parsing and chunking are CPU-bound). Every file's chunks then
+feed one shared embed/upload pipeline whose thread pool is the global
+concurrency limit; Gemini calls additionally go through the ingestion rate
+limiter. Progress and throughput are printed per file as it completes.
+Unchanged workbooks are read from the Arrow cache (workbook_cache.py)
+instead of being parsed again.
+
+Chunk ids are prefixed with the workbook name and a short hash of its
+location, so several workbooks (even with the same file name in different
+directories) can share an index without overwriting each other. Near-duplicate chunks of the
+same providence are collapsed across all workbooks of the run (near_duplicates.py) before
+anything is embedded. With a summary client, one summary record per
+providence (backend/providers/providence_summaries.py) is computed once all
+workbooks are parsed, from the chunks of that providence the index holds
+(near-duplicates dropped, so it agrees with aggregating the chunks at query
+time), and stored in the companion summary index so
+get_providence_summary is a key lookup. Workbooks passed as `context` are
+parsed for the summaries only, limited to the chunk ids they have in the
+index (blob_sync: unchanged workbooks sharing a providence with a changed
+one).
+
+Usage:
+    python reindex.py --local ../data --workers 4 --concurrency 8
+    python reindex.py --blob                      # every workbook in the container
+    python reindex.py --blob --blue-green         # new index version, validate, switch alias
+    python reindex.py --local sentencias.xlsx --recreate   # drop and recreate AZURE_SEARCH_INDEX first
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import ingest_excel
+from embedder import settings
+from near_duplicates import NearDuplicateIndex, signature
+from providers.providence_summaries import summarize_all, summary_key
+from search_client import make_index_client, make_search_client
+
+BATCH_SIZE = 32
+SUMMARY_BATCH = 1000  # Azure's limit of documents per indexing request
+EXCEL_SUFFIXES = (".xlsx", ".xls")
+
+
+@dataclass(frozen=True)
+class Workbook:
+    name: str
+    location: str
+    kind: str  # "local" | "blob"
+
+    @property
+    def key(self) -> str:
+        """Unique per workbook: the local path as discovered, or `blob:<name>` (blob_sync state keys)"""
+        return f"blob:{self.location}" if self.kind == "blob" else self.location
+
+    @property
+    def id_prefix(self) -> str:
+        # Same file name in two directories (or blob folders) must not share ids; the hash uses the
+        # absolute path, so the ids do not depend on the directory the tool runs from
+        where = self.key if self.kind == "blob" or self.location.lower().startswith("http") \
+            else str(Path(self.location).resolve())
+        digest = hashlib.sha1(where.encode("utf-8")).hexdigest()[:8]
+        # Azure keys allow letters, digits, "_", "-" and "="
+        return f"{re.sub(r'[^A-Za-z0-9_=-]', '_', Path(self.name).stem)}-{digest}-"
+
+
+@dataclass
+class FileProgress:
+    total: int
+    parse_s: float
+    uploaded: int = 0
+    failed: int = 0
+    done_batches: int = 0
+    batches: int = 0
+    ids: List[str] = field(default_factory=list)
+    duplicates: int = 0
+    # Keys of other workbooks holding the canonical copy of chunks dropped from this one
+    depends_on: List[str] = field(default_factory=list)
+    # Summary record keys of the providences in this workbook (records are uploaded once per run)
+    summaries: List[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+
+def discover(paths: List[str], blobs: Optional[List[str]] = None) -> List[Workbook]:
+    """Local files/dirs/globs, plus blob names (an empty list means every workbook in the container)"""
+    found: Dict[str, Workbook] = {}
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [str(p) for p in sorted(Path(path).rglob("*")) if p.suffix.lower() in EXCEL_SUFFIXES]
+        elif path.lower().startswith("http"):
+            candidates = [path]
+        else:
+            candidates = sorted(glob.glob(path)) or [path]
+        for candidate in candidates:
+            if Path(candidate).name.startswith("~$"):  # Excel lock files
+                continue
+            found[candidate] = Workbook(Path(candidate.split("?")[0]).name, candidate, "local")
+    if blobs is not None:
+        names = blobs or [b for b in ingest_excel.list_blobs_in_container() if b.lower().endswith(EXCEL_SUFFIXES)]
+        for name in names:
+            found[f"blob:{name}"] = Workbook(name, name, "blob")
+    return list(found.values())
+
+
+def parse_workbook(workbook: Workbook):
+    """Runs in a worker process: load and chunk one workbook, with MinHash signatures for deduplication"""
+    start = time.perf_counter()
+    if workbook.kind == "blob":
+        df = ingest_excel.load_excel_from_azure_storage(workbook.location)
+    else:
+        df = ingest_excel.load_excel(workbook.location)
+    docs = ingest_excel.prepare_docs_legal(df, id_prefix=workbook.id_prefix)
+    signatures = [signature(d["content"]) for d in docs] if settings.DEDUPE_THRESHOLD else None
+    return workbook, docs, signatures, len(df), time.perf_counter() - start
+
+
+class UploadPipeline:
+    """Shared embed/upload stage: at most `concurrency` batches in flight across all files"""
+
+    def __init__(self, client, concurrency: int, batch_size: int = BATCH_SIZE, summary_client=None):
+        self.client = client
+        self.summary_client = summary_client
+        self.batch_size = batch_size
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="upload")
+        self.futures = []
+        self.progress: Dict[str, FileProgress] = {}
+        self.workbooks: Dict[str, Workbook] = {}
+        self.summaries = 0
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def submit(self, workbook: Workbook, docs: List[Dict], parse_s: float, duplicates: int = 0,
+               depends_on: Optional[List[str]] = None, summaries: Optional[List[str]] = None):
+        """Upload the chunks; the summaries listed here count as one more batch, see submit_summaries()"""
+        batches = [docs[i:i + self.batch_size] for i in range(0, len(docs), self.batch_size)]
+        summaries = summaries if self.summary_client is not None else None
+        self.workbooks[workbook.key] = workbook
+        self.progress[workbook.key] = FileProgress(total=len(docs), parse_s=parse_s,
+                                                    batches=len(batches) + (1 if summaries else 0),
+                                                    ids=[d["id"] for d in docs], duplicates=duplicates,
+                                                    depends_on=depends_on or [],
+                                                    summaries=summaries or [])
+        if not batches and not summaries:
+            self._report(workbook)
+        for batch in batches:
+            self.futures.append(self.pool.submit(self._upload, workbook, batch))
+
+    def submit_summaries(self, records: List[Dict], error: Optional[str] = None):
+        """Upload the summary records of the run, after every submit(); `error` fails them without uploading"""
+        waiting = [key for key, p in self.progress.items() if p.summaries]
+        if records or waiting:
+            self.futures.append(self.pool.submit(self._upload_summaries, records, waiting, error))
+
+    def _upload(self, workbook: Workbook, batch: List[Dict]):
+        try:
+            ok = ingest_excel.upload_batch(batch, self.client)
+            error = None
+        except Exception as e:
+            ok, error = 0, e
+        with self._lock:
+            progress = self.progress[workbook.key]
+            progress.uploaded += ok
+            progress.failed += len(batch) - ok
+            finished = self._batch_done(progress)
+        if error is not None:
+            print(f"  {workbook.location}: batch of {len(batch)} failed: {error}")
+        if finished:
+            self._report(workbook)
+
+    def _upload_summaries(self, records: List[Dict], waiting: List[str], error: Optional[str]):
+        # Small records without vectors: nothing to embed, up to SUMMARY_BATCH per request
+        failed = set() if error is None else {r["id"] for r in records}
+        for i in range(0, len(records) if error is None else 0, SUMMARY_BATCH):
+            batch = records[i:i + SUMMARY_BATCH]
+            try:
+                results = self.summary_client.merge_or_upload_documents(batch)
+                failed.update(r.key for r in results if not getattr(r, "succeeded", True))
+            except Exception as e:
+                failed.update(r["id"] for r in batch)
+                error = error or str(e)
+        if error is not None:
+            print(f"  {len(failed)} of {len(records)} providence summaries failed: {error}")
+        finished = []
+        with self._lock:
+            self.summaries += len(records) - len(failed)
+            for key in waiting:
+                progress = self.progress[key]
+                # A workbook whose providences did not all get their summary is retried as a whole
+                progress.failed += len(failed.intersection(progress.summaries))
+                if self._batch_done(progress):
+                    finished.append(self.workbooks[key])
+        for workbook in finished:
+            self._report(workbook)
+
+    @staticmethod
+    def _batch_done(progress: FileProgress) -> bool:
+        progress.done_batches += 1
+        return progress.done_batches == progress.batches
+
+    def _report(self, workbook: Workbook):
+        p = self.progress[workbook.key]
+        elapsed = time.perf_counter() - p.started
+        rate = p.uploaded / elapsed if elapsed else 0.0
+        failed = f", {p.failed} failed" if p.failed else ""
+        print(f"✔ {workbook.location}: {p.uploaded}/{p.total} chunks{failed} | parse {p.parse_s:.1f}s, "
+              f"upload {elapsed:.1f}s ({rate:.1f} chunks/s)")
+
+    def wait(self) -> Dict:
+        for future in as_completed(self.futures):
+            future.result()
+        self.pool.shutdown()
+        uploaded = sum(p.uploaded for p in self.progress.values())
+        failed = sum(p.failed for p in self.progress.values())
+        duplicates = sum(p.duplicates for p in self.progress.values())
+        chunks = sum(p.total for p in self.progress.values()) + duplicates
+        return {"files": len(self.progress), "uploaded": uploaded, "failed": failed, "duplicates": duplicates,
+                "summaries": self.summaries,
+                "reduction": round(duplicates / chunks, 4) if chunks else 0.0,
+                "seconds": round(time.perf_counter() - self.started, 1)}
+
+
+def summary_client_for(index: Optional[str] = None, ic=None):
+    """Client for the summary index of `index` (default: the version AZURE_SEARCH_INDEX points at), created if missing"""
+    from blue_green import live_version
+    from create_index import ensure_summary_index
+    ic = ic or make_index_client()
+    if index is None:
+        try:
+            index = live_version(ic)
+        except Exception:  # no permission to read aliases: treat AZURE_SEARCH_INDEX as a plain index
+            index = None
+        index = index or settings.AZURE_SEARCH_INDEX
+    return make_search_client(ensure_summary_index(index, ic).name)
+
+
+def run(workbooks: List[Workbook], client, workers: int, concurrency: int, summary_client=None,
+        context: Optional[Dict[Workbook, List[str]]] = None) -> Dict:
+    """Parse in processes, upload through one shared pipeline; returns totals (and per-file progress)
+
+    `context` maps workbooks that are parsed but not uploaded to the ids of their chunks already in
+    the index: only those chunks count towards the summaries.
+    """
+    pipeline = UploadPipeline(client, concurrency, summary_client=summary_client)
+    dedupe = NearDuplicateIndex(settings.DEDUPE_THRESHOLD) if settings.DEDUPE_THRESHOLD else None
+    owner: Dict[str, str] = {}  # canonical chunk id -> workbook key
+    summarized: List[Dict] = []  # every chunk the index holds after the run, for the summaries
+    context = {wb: set(ids) for wb, ids in (context or {}).items() if wb not in workbooks} \
+        if summary_client is not None else {}
+    parse_errors, context_errors = 0, 0
+    everything = workbooks + list(context)
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(everything)))) as pool:
+        futures = {pool.submit(parse_workbook, wb): wb for wb in everything}
+        for future in as_completed(futures):
+            try:
+                workbook, docs, signatures, rows, parse_s = future.result()
+            except Exception as e:
+                if futures[future] in context:
+                    context_errors += 1
+                else:
+                    parse_errors += 1
+                print(f"✘ {futures[future].location}: {e}")
+                continue
+            if workbook in context:
+                summarized.extend(d for d in docs if d["id"] in context[workbook])
+                print(f"  {workbook.location}: {rows} rows -> {len(docs)} chunks ({parse_s:.1f}s), summaries only")
+                continue
+            chunks, depends_on = len(docs), set()
+            providences = sorted({summary_key(d["title"]) for d in docs if d.get("title")})
+            if dedupe is not None:
+                kept = []
+                for doc, sig in zip(docs, signatures):
+                    canonical = dedupe.find_or_add(doc["id"], sig, doc.get("title"))
+                    if canonical is None:
+                        owner[doc["id"]] = workbook.key
+                        kept.append(doc)
+                    elif owner[canonical] != workbook.key:
+                        depends_on.add(owner[canonical])
+                docs = kept
+            if summary_client is not None:
+                # Only the chunks that get uploaded, as the query-time aggregation would see them
+                summarized.extend(docs)
+            print(f"  {workbook.location}: {rows} rows -> {chunks} chunks, {chunks - len(docs)} near-duplicates "
+                  f"({parse_s:.1f}s), uploading")
+            pipeline.submit(workbook, docs, parse_s, chunks - len(docs), sorted(depends_on), providences)
+    if summary_client is not None:
+        # A providence can span several workbooks: summarize only once all of them are parsed
+        records = list(summarize_all(summarized).values())
+        pipeline.submit_summaries(records, f"{context_errors} context workbooks unreadable" if context_errors else None)
+    totals = pipeline.wait()
+    totals["parse_errors"] = parse_errors + context_errors
+    totals["per_file"] = pipeline.progress
+    totals["chunks_per_s"] = round(totals["uploaded"] / totals["seconds"], 1) if totals["seconds"] else 0.0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reindex every legal workbook in parallel")
+    parser.add_argument("--local", nargs="*", default=[], help="Workbook files, directories or glob patterns")
+    parser.add_argument("--blob", nargs="*", help="Blob names; no names = every workbook in the container")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parsing processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batches embedded/uploaded at once, all files")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--index", help="Upload into this index (default: AZURE_SEARCH_INDEX)")
+    target.add_argument("--blue-green", action="store_true", help="Build a new version and switch the alias")
+    target.add_argument("--recreate", action="store_true", help="Drop and recreate AZURE_SEARCH_INDEX first")
+    args = parser.parse_args()
+
+    workbooks = discover(args.local, args.blob)
+    if not workbooks:
+        raise SystemExit("No workbooks found (use --local and/or --blob)")
+    print(f"Reindexing {len(workbooks)} workbooks with {args.workers} parsers and {args.concurrency} uploaders")
+
+    if args.blue_green:
+        from blue_green import build
+        from search_client import make_index_client
+        build(make_index_client(), workbooks, workers=args.workers, concurrency=args.concurrency)
+        return
+
+    if args.recreate:
+        from create_index import create_or_replace
+        create_or_replace()
+
+    totals = run(workbooks, make_search_client(args.index), args.workers, args.concurrency,
+                 summary_client_for(args.index))
+    print(f"Done: {totals['uploaded']} chunks from {totals['files']} files in {totals['seconds']}s "
+          f"({totals['chunks_per_s']} chunks/s), {totals['failed']} failed, {totals['parse_errors']} unreadable files, "
+          f"{totals['duplicates']} near-duplicates skipped ({totals['reduction']:.1%}), "
+          f"{totals['summaries']} providence summaries")
+    if totals["failed"] or totals["parse_errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
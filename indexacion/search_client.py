@@ -1,13 +1,37 @@
+from functools import lru_cache
 from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from azure.identity import DefaultAzureCredential
 from embedder import settings
 
-def make_search_client() -> SearchClient:
+def make_search_client(index_name: str | None = None) -> SearchClient:
+    """Client for AZURE_SEARCH_INDEX, or for a specific (versioned) index"""
+    if settings.PROVIDER_MODE != "live":
+        return _fake_search_client(index_name)
+    return _live_search_client(index_name or settings.AZURE_SEARCH_INDEX)
+
+def make_index_client():
+    if settings.PROVIDER_MODE != "live":
+        from providers import fake_providers
+        return fake_providers.index_client()
+    from azure.search.documents.indexes import SearchIndexClient
+    return SearchIndexClient(settings.AZURE_SEARCH_ENDPOINT, _credential())
+
+@lru_cache(maxsize=None)
+def _fake_search_client(index_name: str | None):
+    from providers import fake_providers
+    if index_name is not None:
+        # Versioned indexes live in the in-memory index service
+        return fake_providers.index_client().get_search_client(index_name)
+    # One in-memory index per process, starting empty so uploads can be inspected
+    return fake_providers.search_client(lambda: _live_search_client(settings.AZURE_SEARCH_INDEX), docs=[])
+
+def _credential():
     if settings.AZURE_SEARCH_USE_MSI:
-        cred = DefaultAzureCredential()
-        return SearchClient(settings.AZURE_SEARCH_ENDPOINT, settings.AZURE_SEARCH_INDEX, cred)
+        return DefaultAzureCredential()
     if not settings.AZURE_SEARCH_API_KEY:
         raise RuntimeError("Provide AZURE_SEARCH_API_KEY or set AZURE_SEARCH_USE_MSI=true")
-    return SearchClient(settings.AZURE_SEARCH_ENDPOINT, settings.AZURE_SEARCH_INDEX,
-                        AzureKeyCredential(settings.AZURE_SEARCH_API_KEY))
+    return AzureKeyCredential(settings.AZURE_SEARCH_API_KEY)
+
+def _live_search_client(index_name: str) -> SearchClient:
+    return SearchClient(settings.AZURE_SEARCH_ENDPOINT, index_name, _credential())
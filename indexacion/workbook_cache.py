@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Columnar cache of parsed workbooks.
+
+pd.read_excel (openpyxl) dominates local ingestion time, and the same
+workbooks are parsed again on every experiment. The first parse of a
+workbook is stored as an uncompressed Arrow IPC file named after the
+SHA-256 of the workbook bytes (WORKBOOK_CACHE_DIR). Later loads memory-map
+that file instead of parsing, so the column buffers come straight from the
+page cache, and a modified workbook gets a new hash and is parsed again.
+
+Without pyarrow, or with WORKBOOK_CACHE_DIR empty, workbooks are parsed
+every time as before. Sheets Arrow cannot represent (mixed-type columns)
+are parsed and not cached.
+
+Usage:
+    python workbook_cache.py ../data/*.xlsx      # convert ahead of time
+    python workbook_cache.py --list
+    python workbook_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from embedder import settings
+
+Source = Union[str, bytes]
+
+
+def cache_dir() -> Optional[Path]:
+    if not settings.WORKBOOK_CACHE_DIR:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return Path(settings.WORKBOOK_CACHE_DIR)
+
+
+def content_hash(source: Source) -> str:
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    with open(source, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _load(path: Path) -> pd.DataFrame:
+    import pyarrow as pa
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def _store(df: pd.DataFrame, path: Path) -> bool:
+    import pyarrow as pa
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        print(f"Not caching {path.stem[:12]}: {e}")
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique temp name, then rename: parallel parsers may convert the same workbook
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return True
+
+
+def read_workbook(source: Source) -> pd.DataFrame:
+    """Parsed sheet for a workbook path or its bytes, from the cache when the content is unchanged"""
+    directory = cache_dir()
+    if directory is None:
+        return pd.read_excel(io.BytesIO(source) if isinstance(source, bytes) else source)
+    path = directory / f"{content_hash(source)}.arrow"
+    if path.exists():
+        try:
+            return _load(path)
+        except Exception as e:  # truncated or written by an incompatible pyarrow
+            print(f"Discarding unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+    df = pd.read_excel(io.BytesIO(source) if isinstance(source, bytes) else source)
+    _store(df, path)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert workbooks to the Arrow cache")
+    parser.add_argument("paths", nargs="*", help="Workbooks to convert")
+    parser.add_argument("--list", action="store_true", help="Show cache entries")
+    parser.add_argument("--clear", action="store_true", help="Delete every cache entry")
+    args = parser.parse_args()
+
+    directory = cache_dir()
+    if directory is None:
+        raise SystemExit("Cache disabled: set WORKBOOK_CACHE_DIR and install pyarrow")
+    if args.clear:
+        entries = list(directory.glob("*.arrow"))
+        for entry in entries:
+            entry.unlink()
+        print(f"Deleted {len(entries)} entries from {directory}")
+    if args.list:
+        for entry in sorted(directory.glob("*.arrow")):
+            print(f"{entry.name}  {entry.stat().st_size / 2**20:8.1f} MB")
+    for path in args.paths:
+        start = time.perf_counter()
+        df = read_workbook(path)
+        parsed = time.perf_counter() - start
+        start = time.perf_counter()
+        read_workbook(path)
+        print(f"{path}: {len(df)} rows, first load {parsed:.2f}s, cached load {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()